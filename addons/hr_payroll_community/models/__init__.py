@@ -27,6 +27,7 @@ from . import hr_employee
 from . import hr_leave_type
 from . import hr_payroll_structure
 from . import hr_payslip
+from . import hr_payslip_history
 from . import hr_payslip_input
 from . import hr_salary_rule
 from . import hr_payslip_line
@@ -20,17 +20,138 @@
 #    If not, see <http://www.gnu.org/licenses/>.
 #
 #############################################################################
-from datetime import date, datetime, time
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
 import babel
 from dateutil.relativedelta import relativedelta
-from pytz import timezone
+from pytz import timezone, utc
+import logging
+
 from odoo import api, fields, models, tools, _
 from odoo.exceptions import UserError, ValidationError
+from odoo.tools import float_utils
+
+_logger = logging.getLogger(__name__)
 
 # This will generate 16th of days
 ROUNDING_FACTOR = 16
 
 
+def _sum_salary_rule_category(localdict, category, amount):
+    """Function for getting total sum of Salary Rule Category"""
+    if category.parent_id:
+        localdict = _sum_salary_rule_category(localdict,
+                                              category.parent_id,
+                                              amount)
+    localdict['categories'].dict[category.code] \
+        = category.code in localdict[
+        'categories'].dict and localdict['categories'].dict[
+        category.code] + amount or amount
+    return localdict
+
+
+class BrowsableObject(object):
+    """Class for Browsable Object"""
+
+    def __init__(self, employee_id, dict, env):
+        """Function for getting employee_id,dict and env"""
+        self.employee_id = employee_id
+        self.dict = dict
+        self.env = env
+
+    def __getattr__(self, attr):
+        """Function for return dict"""
+        return attr in self.dict and self.dict.__getitem__(attr) or 0.0
+
+
+class InputLine(BrowsableObject):
+    """a class that will be used into the python code, mainly for
+    usability purposes"""
+
+    def sum(self, code, from_date, to_date=None):
+        """Function for getting sum of Payslip with respect to
+         from_date,to_date fields"""
+        if to_date is None:
+            to_date = fields.Date.today()
+        res = self.env['hr.payslip.history']._get_totals(
+            'input', self.employee_id, code, from_date, to_date)
+        if res is None:
+            self.env.cr.execute("""
+                SELECT sum(amount) as sum
+                FROM hr_payslip as hp, hr_payslip_input as pi
+                WHERE hp.employee_id = %s AND hp.state = 'done'
+                AND hp.date_from >= %s AND hp.date_to <= %s AND hp.id = 
+                pi.payslip_id AND pi.code = %s""",
+                                (
+                                    self.employee_id, from_date, to_date,
+                                    code))
+            res = self.env.cr.fetchone()
+        return res[0] or 0.0
+
+
+class WorkedDays(BrowsableObject):
+    """a class that will be used into the python code, mainly for
+    usability purposes"""
+
+    def _sum(self, code, from_date, to_date=None):
+        """Function for getting sum of Payslip days with respect to
+         from_date,to_date fields"""
+        if to_date is None:
+            to_date = fields.Date.today()
+        res = self.env['hr.payslip.history']._get_totals(
+            'worked_days', self.employee_id, code, from_date, to_date)
+        if res is not None:
+            return res[1:]
+        self.env.cr.execute("""
+            SELECT sum(number_of_days) as number_of_days, 
+            sum(number_of_hours) as number_of_hours
+            FROM hr_payslip as hp, hr_payslip_worked_days as pi
+            WHERE hp.employee_id = %s AND hp.state = 'done'
+            AND hp.date_from >= %s AND hp.date_to <= %s AND hp.id = 
+            pi.payslip_id AND pi.code = %s""",
+                            (
+                                self.employee_id, from_date, to_date,
+                                code))
+        return self.env.cr.fetchone()
+
+    def sum(self, code, from_date, to_date=None):
+        """Function for getting sum of Payslip with respect to
+         from_date,to_date fields"""
+        res = self._sum(code, from_date, to_date)
+        return res and res[0] or 0.0
+
+    def sum_hours(self, code, from_date, to_date=None):
+        """Function for getting sum of Payslip hours with respect to
+         from_date,to_date fields"""
+        res = self._sum(code, from_date, to_date)
+        return res and res[1] or 0.0
+
+
+class Payslips(BrowsableObject):
+    """a class that will be used into the python code, mainly for
+    usability purposes"""
+
+    def sum(self, code, from_date, to_date=None):
+        """Function for getting sum of Payslip with respect to
+         from_date,to_date fields"""
+        if to_date is None:
+            to_date = fields.Date.today()
+        res = self.env['hr.payslip.history']._get_totals(
+            'line', self.employee_id, code, from_date, to_date)
+        if res is None:
+            self.env.cr.execute("""SELECT sum(case when hp.credit_note = 
+            False then (pl.total) else (-pl.total) end)
+            FROM hr_payslip as hp, hr_payslip_line as pl
+            WHERE hp.employee_id = %s AND hp.state = 'done'
+            AND hp.date_from >= %s AND hp.date_to <= %s AND hp.id 
+            = pl.slip_id AND pl.code = %s""",
+                                (
+                                    self.employee_id, from_date, to_date,
+                                    code))
+            res = self.env.cr.fetchone()
+        return res and res[0] or 0.0
+
+
 class HrPayslip(models.Model):
     """Create new model for getting total Payroll Sheet for an Employee"""
     _name = 'hr.payslip'
@@ -182,6 +303,19 @@ class HrPayslip(models.Model):
             'context': {}
         }
 
+    def write(self, vals):
+        """Refresh the payslip history totals of the employees whose
+        payslips move to or out of the 'done' state"""
+        if 'state' not in vals:
+            return super(HrPayslip, self).write(vals)
+        done_before = self.filtered(lambda payslip: payslip.state == 'done')
+        res = super(HrPayslip, self).write(vals)
+        employees = (done_before | self.filtered(
+            lambda payslip: payslip.state == 'done')).mapped('employee_id')
+        if employees:
+            self.env['hr.payslip.history']._refresh(employees.ids)
+        return res
+
     def unlink(self):
         """Function for unlink the Payslip"""
         if any(self.filtered(
@@ -217,136 +351,265 @@ class HrPayslip(models.Model):
         return self.env['hr.contract'].search(clause_final).ids
 
     def action_compute_sheet(self):
-        """Function for compute Payslip sheet"""
+        """Function for compute Payslip sheet
+
+        All the payslips of the recordset are computed together: contracts,
+        worked days and inputs are prefetched in bulk, the VEB rate and the
+        sorted rules of each structure are resolved once, and the lines of
+        every payslip are created with a single multi-create.
+        """
+        # prefetch everything the rules will read, in bulk
+        self.mapped('contract_id.employee_id')
+        self.mapped('worked_days_line_ids')
+        self.mapped('input_line_ids')
+        # Auto-capture exchange rate if not already set
+        latest_rate = 0.0
+        if self.filtered(lambda slip: not slip.exchange_rate_used):
+            latest_rate = self._get_latest_veb_rate()
+        # delete old payslip lines
+        self.mapped('line_ids').unlink()
+        # number and rate are written before the rules run: rules read
+        # payslip.exchange_rate_used
+        for payslip in self:
+            vals = {'number': payslip.number or self.env[
+                'ir.sequence'].next_by_code('salary.slip')}
+            if not payslip.exchange_rate_used and latest_rate > 0:
+                vals.update({
+                    'exchange_rate_used': latest_rate,
+                    'exchange_rate_date': fields.Datetime.now(),
+                })
+            payslip.write(vals)
+        rules_cache = {}
+        line_vals = []
         for payslip in self:
-            number = payslip.number or self.env['ir.sequence'].next_by_code(
-                'salary.slip')
-
-            # Auto-capture exchange rate if not already set
-            if not payslip.exchange_rate_used:
-                try:
-                    # Get VEB currency (Venezuelan Bolívar)
-                    veb_currency = self.env['res.currency'].search([
-                        ('name', 'in', ['VEB', 'VES', 'VEF']),
-                        ('active', '=', True)
-                    ], limit=1)
-
-                    if veb_currency:
-                        # Get the latest exchange rate from res.currency.rate
-                        latest_rate = self.env['res.currency.rate'].search([
-                            ('currency_id', '=', veb_currency.id),
-                            ('company_id', 'in', [self.env.company.id, False])
-                        ], order='name desc', limit=1)
-
-                        if latest_rate and latest_rate.company_rate > 0:
-                            payslip.exchange_rate_used = latest_rate.company_rate
-                            payslip.exchange_rate_date = fields.Datetime.now()
-
-                except Exception as e:
-                    # Log the error but don't break payslip computation
-                    import logging
-                    _logger = logging.getLogger(__name__)
-                    _logger.warning(f"Could not capture exchange rate for payslip {payslip.number}: {e}")
-
-            # delete old payslip lines
-            payslip.line_ids.unlink()
             # set the list of contract for which the rules have to be applied
             # if we don't give the contract, then the rules to apply should be
             # for all current contracts of the employee
             contract_ids = payslip.contract_id.ids or \
                            self.get_contract(payslip.employee_id,
                                              payslip.date_from, payslip.date_to)
-            lines = [(0, 0, line) for line in
-                     self._get_payslip_lines(contract_ids, payslip.id)]
-            payslip.write({'line_ids': lines, 'number': number})
+            for line in self._get_payslip_lines(contract_ids, payslip.id,
+                                                rules_cache=rules_cache):
+                line['slip_id'] = payslip.id
+                line_vals.append(line)
+        self.env['hr.payslip.line'].create(line_vals)
+        self.env['hr.salary.rule']._log_rule_timings()
         return True
 
+    @api.model
+    def _get_latest_veb_rate(self):
+        """
+        @return: the latest company rate of the VEB currency (1 USD = X VES),
+        or 0.0 when it cannot be found
+        """
+        try:
+            # Get VEB currency (Venezuelan Bolívar)
+            veb_currency = self.env['res.currency'].search([
+                ('name', 'in', ['VEB', 'VES', 'VEF']),
+                ('active', '=', True)
+            ], limit=1)
+            if veb_currency:
+                # Get the latest exchange rate from res.currency.rate
+                latest_rate = self.env['res.currency.rate'].search([
+                    ('currency_id', '=', veb_currency.id),
+                    ('company_id', 'in', [self.env.company.id, False])
+                ], order='name desc', limit=1)
+                if latest_rate and latest_rate.company_rate > 0:
+                    return latest_rate.company_rate
+        except Exception as e:
+            # Log the error but don't break payslip computation
+            _logger.warning("Could not capture exchange rate for payslips "
+                            "%s: %s", self.ids, e)
+        return 0.0
+
+    @api.model
+    def _get_sorted_rules(self, structure_ids, rules_cache=None):
+        """
+        @param structure_ids: ids of the structures (with their parents)
+        @param rules_cache: optional dict shared by the payslips of a batch,
+        keyed by the set of structure ids
+        @return: the rules of the structures and their children, sorted by
+        sequence
+        """
+        key = frozenset(structure_ids)
+        if rules_cache is not None and key in rules_cache:
+            return rules_cache[key]
+        # get the rules of the structure and thier children
+        rule_ids = self.env['hr.payroll.structure'].browse(
+            structure_ids).get_all_rules()
+        # run the rules by sequence
+        sorted_rule_ids = [id for id, sequence in
+                           sorted(rule_ids, key=lambda x: x[1])]
+        sorted_rules = self.env['hr.salary.rule'].browse(sorted_rule_ids)
+        if rules_cache is not None:
+            rules_cache[key] = sorted_rules
+        return sorted_rules
+
     @api.model
     def get_worked_day_lines(self, contracts, date_from, date_to):
         """
         @param contracts: Browse record of contracts, date_from, date_to
         @return: returns a list of dict containing the input that should be
         applied for the given contract between date_from and date_to
+
+        Lines already computed for the same period by
+        _get_batch_worked_day_lines can be passed in the context key
+        'worked_day_lines' (as returned by that method).
         """
+        precomputed = self.env.context.get('worked_day_lines') or {}
+        if precomputed.get('period') != (str(date_from), str(date_to)):
+            precomputed = {}
+        lines = dict(precomputed.get('lines', {}))
+        missing = contracts.filtered(lambda contract: contract.id not in lines)
+        if missing:
+            lines.update(self._get_batch_worked_day_lines(
+                missing, date_from, date_to)['lines'])
         res = []
+        for contract in contracts:
+            res.extend(lines.get(contract.id, []))
+        return res
+
+    @api.model
+    def _get_batch_worked_day_lines(self, contracts, date_from, date_to):
+        """Function for computing the worked days lines of several contracts
+        over the same period.
+        The attendances of each working schedule are computed once for the
+        period, and the attendance and leave intervals of all the employees
+        sharing a schedule are fetched together.
+        @return: dict {'period': (date_from, date_to),
+                       'lines': {contract id: list of worked days dicts}}
+        """
+        lines = {}
+        day_from = datetime.combine(fields.Date.from_string(date_from),
+                                    time.min)
+        day_to = datetime.combine(fields.Date.from_string(date_to),
+                                  time.max)
+        # naive datetimes are made explicit in UTC (as list_leaves and
+        # get_work_days_data do)
+        start_dt = day_from.replace(tzinfo=utc)
+        end_dt = day_to.replace(tzinfo=utc)
         # fill only if the contract as a working schedule linked
-        for contract in contracts.filtered(
-                lambda contract: contract.resource_calendar_id):
-            day_from = datetime.combine(fields.Date.from_string(date_from),
-                                        time.min)
-            day_to = datetime.combine(fields.Date.from_string(date_to),
-                                      time.max)
-            # compute leave days
-            leaves = {}
-            calendar = contract.resource_calendar_id
+        contracts = contracts.filtered(
+            lambda contract: contract.resource_calendar_id)
+        for calendar in contracts.mapped('resource_calendar_id'):
+            calendar_contracts = contracts.filtered(
+                lambda contract: contract.resource_calendar_id == calendar)
+            resources = calendar_contracts.mapped('employee_id.resource_id')
             tz = timezone(calendar.tz)
-            day_leave_intervals = contract.employee_id.list_leaves(
-                day_from, day_to, calendar=contract.resource_calendar_id)
-            multi_leaves = []
-            for day, hours, leave in day_leave_intervals:
-                work_hours = calendar.get_work_hours_count(
-                    tz.localize(datetime.combine(day, time.min)),
-                    tz.localize(datetime.combine(day, time.max)),
-                    compute_leaves=False,
+            # working hours of each day of the schedule, in the schedule tz
+            day_work_hours = defaultdict(float)
+            schedule = calendar._attendance_intervals_batch(
+                tz.localize(day_from - timedelta(days=1)),
+                tz.localize(day_to + timedelta(days=1)))[False]
+            for start, stop, meta in schedule:
+                day_work_hours[start.astimezone(tz).date()] += (
+                    stop - start).total_seconds() / 3600
+            # resource intervals, with one extra day margin for day totals
+            full_attendances = calendar._attendance_intervals_batch(
+                start_dt - timedelta(days=1), end_dt + timedelta(days=1),
+                resources)
+            attendances = calendar._attendance_intervals_batch(
+                start_dt, end_dt, resources)
+            leaves = calendar._leave_intervals_batch(
+                start_dt, end_dt, resources)
+            for contract in calendar_contracts:
+                resource_id = contract.employee_id.resource_id.id
+                lines[contract.id] = self._build_worked_day_lines(
+                    contract,
+                    attendances[resource_id],
+                    leaves[resource_id],
+                    full_attendances[resource_id],
+                    day_work_hours,
                 )
-                if len(leave) > 1:
-                    for each in leave:
-                        if each.holiday_id:
-                            multi_leaves.append(each.holiday_id)
-                else:
-                    holiday = leave.holiday_id
-                    current_leave_struct = leaves.setdefault(
-                        holiday.holiday_status_id, {
-                            'name': holiday.holiday_status_id.name or _(
-                                'Global Leaves'),
-                            'sequence': 5,
-                            'code': holiday.holiday_status_id.code or 'GLOBAL',
-                            'number_of_days': 0.0,
-                            'number_of_hours': 0.0,
-                            'contract_id': contract.id,
-                        })
-                    current_leave_struct['number_of_hours'] += hours
-                    if work_hours:
-                        current_leave_struct[
-                            'number_of_days'] += hours / work_hours
-            # compute worked days
-            work_data = contract.employee_id.get_work_days_data(
-                day_from, day_to, calendar=contract.resource_calendar_id)
-            attendances = {
-                'name': _("Normal Working Days paid at 100%"),
-                'sequence': 1,
-                'code': 'WORK100',
-                'number_of_days': work_data['days'],
-                'number_of_hours': work_data['hours'],
-                'contract_id': contract.id,
-            }
-            res.append(attendances)
-            uniq_leaves = [*set(multi_leaves)]
-            c_leaves = {}
-            for rec in uniq_leaves:
-                duration = rec.duration_display.replace("days", "").strip()
-                duration_in_hours = float(duration) * 24
-                c_leaves.setdefault(rec.holiday_status_id,
-                                    {'hours': duration_in_hours})
-            for item in c_leaves:
-                if not leaves or item not in leaves:
-                    data = {
-                        'name': item.name,
-                        'sequence': 20,
-                        'code': item.code or 'LEAVES',
-                        'number_of_hours': c_leaves[item]['hours'],
-                        'number_of_days': c_leaves[item][
-                                              'hours'] / work_hours,
+        return {'period': (str(date_from), str(date_to)), 'lines': lines}
+
+    @api.model
+    def _build_worked_day_lines(self, contract, attendances, leaves,
+                                full_attendances, day_work_hours):
+        """Function for building the worked days lines of one contract from
+        its precomputed intervals.
+        @param attendances: attendance intervals of the employee in the period
+        @param leaves: leave intervals of the employee in the period
+        @param full_attendances: attendance intervals with one day margin
+        @param day_work_hours: dict {date: working hours} of the schedule
+        @return: list of worked days dicts (WORK100 first, then leaves)
+        """
+        res = []
+        # compute leave days
+        leaves_by_type = {}
+        multi_leaves = []
+        work_hours = 0.0
+        for start, stop, leave in (leaves & attendances):
+            hours = (stop - start).total_seconds() / 3600
+            work_hours = day_work_hours.get(start.date(), 0.0)
+            if len(leave) > 1:
+                for each in leave:
+                    if each.holiday_id:
+                        multi_leaves.append(each.holiday_id)
+            else:
+                holiday = leave.holiday_id
+                current_leave_struct = leaves_by_type.setdefault(
+                    holiday.holiday_status_id, {
+                        'name': holiday.holiday_status_id.name or _(
+                            'Global Leaves'),
+                        'sequence': 5,
+                        'code': holiday.holiday_status_id.code or 'GLOBAL',
+                        'number_of_days': 0.0,
+                        'number_of_hours': 0.0,
                         'contract_id': contract.id,
-                    }
-                    res.append(data)
-                for time_off in leaves:
-                    if item == time_off:
-                        leaves[item]['number_of_hours'] += c_leaves[item][
-                            'hours']
-                        leaves[item]['number_of_days'] \
-                            += c_leaves[item]['hours'] / work_hours
-            res.extend(leaves.values())
+                    })
+                current_leave_struct['number_of_hours'] += hours
+                if work_hours:
+                    current_leave_struct[
+                        'number_of_days'] += hours / work_hours
+        # compute worked days
+        day_total = defaultdict(float)
+        for start, stop, meta in full_attendances:
+            day_total[start.date()] += (stop - start).total_seconds() / 3600
+        day_hours = defaultdict(float)
+        for start, stop, meta in (attendances - leaves):
+            day_hours[start.date()] += (stop - start).total_seconds() / 3600
+        attendances_line = {
+            'name': _("Normal Working Days paid at 100%"),
+            'sequence': 1,
+            'code': 'WORK100',
+            'number_of_days': sum(
+                float_utils.round(
+                    ROUNDING_FACTOR * day_hours[day] / day_total[day]
+                ) / ROUNDING_FACTOR
+                for day in day_hours
+            ),
+            'number_of_hours': sum(day_hours.values()),
+            'contract_id': contract.id,
+        }
+        res.append(attendances_line)
+        # overlapping leaves count with their whole duration
+        c_leaves = {}
+        for rec in set(multi_leaves):
+            if rec.leave_type_request_unit == 'hour':
+                duration_in_hours = rec.number_of_hours_display
+            else:
+                duration_in_hours = float_utils.float_round(
+                    rec.number_of_days, precision_digits=2) * 24
+            c_leaves.setdefault(rec.holiday_status_id,
+                                {'hours': duration_in_hours})
+        for item in c_leaves:
+            item_days = (c_leaves[item]['hours'] / work_hours
+                         if work_hours else 0.0)
+            if item not in leaves_by_type:
+                res.append({
+                    'name': item.name,
+                    'sequence': 20,
+                    'code': item.code or 'LEAVES',
+                    'number_of_hours': c_leaves[item]['hours'],
+                    'number_of_days': item_days,
+                    'contract_id': contract.id,
+                })
+            else:
+                leaves_by_type[item]['number_of_hours'] += c_leaves[item][
+                    'hours']
+                leaves_by_type[item]['number_of_days'] += item_days
+        res.extend(leaves_by_type.values())
         return res
 
     @api.model
@@ -373,108 +636,9 @@ class HrPayslip(models.Model):
         return res
 
     @api.model
-    def _get_payslip_lines(self, contract_ids, payslip_id):
+    def _get_payslip_lines(self, contract_ids, payslip_id, rules_cache=None):
         """Function for getting Payslip Lines"""
 
-        def _sum_salary_rule_category(localdict, category, amount):
-            """Function for getting total sum of Salary Rule Category"""
-            if category.parent_id:
-                localdict = _sum_salary_rule_category(localdict,
-                                                      category.parent_id,
-                                                      amount)
-            localdict['categories'].dict[category.code] \
-                = category.code in localdict[
-                'categories'].dict and localdict['categories'].dict[
-                category.code] + amount or amount
-            return localdict
-
-        class BrowsableObject(object):
-            """Class for Browsable Object"""
-
-            def __init__(self, employee_id, dict, env):
-                """Function for getting employee_id,dict and env"""
-                self.employee_id = employee_id
-                self.dict = dict
-                self.env = env
-
-            def __getattr__(self, attr):
-                """Function for return dict"""
-                return attr in self.dict and self.dict.__getitem__(attr) or 0.0
-
-        class InputLine(BrowsableObject):
-            """a class that will be used into the python code, mainly for
-            usability purposes"""
-
-            def sum(self, code, from_date, to_date=None):
-                """Function for getting sum of Payslip with respect to
-                 from_date,to_date fields"""
-                if to_date is None:
-                    to_date = fields.Date.today()
-                self.env.cr.execute("""
-                    SELECT sum(amount) as sum
-                    FROM hr_payslip as hp, hr_payslip_input as pi
-                    WHERE hp.employee_id = %s AND hp.state = 'done'
-                    AND hp.date_from >= %s AND hp.date_to <= %s AND hp.id = 
-                    pi.payslip_id AND pi.code = %s""",
-                                    (
-                                        self.employee_id, from_date, to_date,
-                                        code))
-                return self.env.cr.fetchone()[0] or 0.0
-
-        class WorkedDays(BrowsableObject):
-            """a class that will be used into the python code, mainly for
-            usability purposes"""
-
-            def _sum(self, code, from_date, to_date=None):
-                """Function for getting sum of Payslip days with respect to
-                 from_date,to_date fields"""
-                if to_date is None:
-                    to_date = fields.Date.today()
-                self.env.cr.execute("""
-                    SELECT sum(number_of_days) as number_of_days, 
-                    sum(number_of_hours) as number_of_hours
-                    FROM hr_payslip as hp, hr_payslip_worked_days as pi
-                    WHERE hp.employee_id = %s AND hp.state = 'done'
-                    AND hp.date_from >= %s AND hp.date_to <= %s AND hp.id = 
-                    pi.payslip_id AND pi.code = %s""",
-                                    (
-                                        self.employee_id, from_date, to_date,
-                                        code))
-                return self.env.cr.fetchone()
-
-            def sum(self, code, from_date, to_date=None):
-                """Function for getting sum of Payslip with respect to
-                 from_date,to_date fields"""
-                res = self._sum(code, from_date, to_date)
-                return res and res[0] or 0.0
-
-            def sum_hours(self, code, from_date, to_date=None):
-                """Function for getting sum of Payslip hours with respect to
-                 from_date,to_date fields"""
-                res = self._sum(code, from_date, to_date)
-                return res and res[1] or 0.0
-
-        class Payslips(BrowsableObject):
-            """a class that will be used into the python code, mainly for
-            usability purposes"""
-
-            def sum(self, code, from_date, to_date=None):
-                """Function for getting sum of Payslip with respect to
-                 from_date,to_date fields"""
-                if to_date is None:
-                    to_date = fields.Date.today()
-                self.env.cr.execute("""SELECT sum(case when hp.credit_note = 
-                False then (pl.total) else (-pl.total) end)
-                FROM hr_payslip as hp, hr_payslip_line as pl
-                WHERE hp.employee_id = %s AND hp.state = 'done'
-                AND hp.date_from >= %s AND hp.date_to <= %s AND hp.id 
-                = pl.slip_id AND pl.code = %s""",
-                                    (
-                                        self.employee_id, from_date, to_date,
-                                        code))
-                res = self.env.cr.fetchone()
-                return res and res[0] or 0.0
-
         # we keep a dict with the result because a value can be overwritten
         # by another rule with the same code
         result_dict = {}
@@ -504,13 +668,8 @@ class HrPayslip(models.Model):
                 set(payslip.struct_id._get_parent_structure().ids))
         else:
             structure_ids = contracts.get_all_structures()
-        # get the rules of the structure and thier children
-        rule_ids = self.env['hr.payroll.structure'].browse(
-            structure_ids).get_all_rules()
-        # run the rules by sequence
-        sorted_rule_ids = [id for id, sequence in
-                           sorted(rule_ids, key=lambda x: x[1])]
-        sorted_rules = self.env['hr.salary.rule'].browse(sorted_rule_ids)
+        sorted_rules = self._get_sorted_rules(structure_ids,
+                                              rules_cache=rules_cache)
         for contract in contracts:
             employee = contract.employee_id
             localdict = dict(baselocaldict, employee=employee,
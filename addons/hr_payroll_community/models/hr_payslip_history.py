@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+#############################################################################
+#    A part of Open HRMS Project <https://www.openhrms.com>
+#
+#    Cybrosys Technologies Pvt. Ltd.
+#
+#    Copyright (C) 2023-TODAY Cybrosys Technologies(<https://www.cybrosys.com>)
+#    Author: Cybrosys Techno Solutions(<https://www.cybrosys.com>)
+#
+#    You can modify it under the terms of the GNU LESSER
+#    GENERAL PUBLIC LICENSE (LGPL v3), Version 3.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU LESSER GENERAL PUBLIC LICENSE (LGPL v3) for more details.
+#
+#    You should have received a copy of the GNU LESSER GENERAL PUBLIC LICENSE
+#    (LGPL v3) along with this program.
+#    If not, see <http://www.gnu.org/licenses/>.
+#
+#############################################################################
+from odoo import api, fields, models, tools
+
+# Totals of done payslips grouped by employee, code and payslip period.
+# The credit_note sign handling matches the live query of Payslips.sum().
+_HISTORY_SELECT = """
+    SELECT hp.employee_id, 'line', pl.code, hp.date_from, hp.date_to,
+           sum(CASE WHEN hp.credit_note = False THEN pl.total
+                    ELSE -pl.total END), 0.0, 0.0
+    FROM hr_payslip AS hp
+    JOIN hr_payslip_line AS pl ON pl.slip_id = hp.id
+    WHERE hp.state = 'done' AND pl.code IS NOT NULL {where}
+    GROUP BY hp.employee_id, pl.code, hp.date_from, hp.date_to
+    UNION ALL
+    SELECT hp.employee_id, 'worked_days', wd.code, hp.date_from, hp.date_to,
+           0.0, sum(wd.number_of_days), sum(wd.number_of_hours)
+    FROM hr_payslip AS hp
+    JOIN hr_payslip_worked_days AS wd ON wd.payslip_id = hp.id
+    WHERE hp.state = 'done' AND wd.code IS NOT NULL {where}
+    GROUP BY hp.employee_id, wd.code, hp.date_from, hp.date_to
+    UNION ALL
+    SELECT hp.employee_id, 'input', pi.code, hp.date_from, hp.date_to,
+           sum(pi.amount), 0.0, 0.0
+    FROM hr_payslip AS hp
+    JOIN hr_payslip_input AS pi ON pi.payslip_id = hp.id
+    WHERE hp.state = 'done' AND pi.code IS NOT NULL {where}
+    GROUP BY hp.employee_id, pi.code, hp.date_from, hp.date_to
+"""
+
+
+class HrPayslipHistory(models.Model):
+    """Materialized totals of done payslips, per employee, code and period.
+
+    The table is refreshed for the affected employees whenever a payslip
+    moves to or out of the 'done' state, and is read by the ``sum`` helpers
+    available to the salary rules (payslip, worked_days and inputs)."""
+    _name = 'hr.payslip.history'
+    _description = 'Payslip History Totals'
+    _order = 'employee_id, date_from'
+    _log_access = False
+
+    _READY_PARAM = 'hr_payroll_community.payslip_history_ready'
+
+    employee_id = fields.Many2one('hr.employee', string='Employee',
+                                  required=True, ondelete='cascade',
+                                  help="Employee of the payslips")
+    source = fields.Selection([
+        ('line', 'Payslip Line'),
+        ('worked_days', 'Worked Days'),
+        ('input', 'Input'),
+    ], string='Source', required=True,
+        help="Payslip table the totals are taken from")
+    code = fields.Char(string='Code', required=True,
+                       help="Code of the payslip lines, worked days or inputs")
+    date_from = fields.Date(string='Date From', required=True,
+                            help="Start date of the payslip period")
+    date_to = fields.Date(string='Date To', required=True,
+                          help="End date of the payslip period")
+    amount = fields.Float(string='Amount', digits='Payroll',
+                          help="Total of the payslip lines (refunds "
+                               "negated) or of the inputs")
+    number_of_days = fields.Float(string='Number of Days',
+                                  help="Total of the worked days")
+    number_of_hours = fields.Float(string='Number of Hours',
+                                   help="Total of the worked hours")
+
+    def init(self):
+        """Index used by the rule helpers lookups"""
+        tools.create_index(
+            self._cr, 'hr_payslip_history_lookup_index', self._table,
+            ['employee_id', 'source', 'code', 'date_from', 'date_to'])
+
+    @api.model
+    def _refresh(self, employee_ids=None):
+        """
+        Rebuild the totals of the given employees from the payslip tables,
+        or the whole table when no employee is given.
+        """
+        self.env.flush_all()
+        if employee_ids is None:
+            self.env.cr.execute("DELETE FROM hr_payslip_history")
+            where, params = '', ()
+        else:
+            if not employee_ids:
+                return
+            employee_ids = tuple(employee_ids)
+            self.env.cr.execute(
+                "DELETE FROM hr_payslip_history WHERE employee_id IN %s",
+                (employee_ids,))
+            where, params = 'AND hp.employee_id IN %s', (employee_ids,) * 3
+        self.env.cr.execute("""
+            INSERT INTO hr_payslip_history
+                (employee_id, source, code, date_from, date_to,
+                 amount, number_of_days, number_of_hours)
+            """ + _HISTORY_SELECT.format(where=where), params)
+        self.invalidate_model()
+
+    @api.model
+    def _get_totals(self, source, employee_id, code, from_date, to_date):
+        """
+        @return: tuple (amount, number_of_days, number_of_hours) summed over
+        the done payslips of the employee whose period lies within
+        from_date and to_date. Sums are None when no payslip matches.
+        Returns None when the dates are not plain dates, in which case the
+        caller falls back to the live query on the payslip tables.
+        """
+        try:
+            from_date = fields.Date.to_date(from_date)
+            to_date = fields.Date.to_date(to_date)
+        except (TypeError, ValueError):
+            return None
+        if not from_date or not to_date:
+            return None
+        params = self.env['ir.config_parameter'].sudo()
+        if not params.get_param(self._READY_PARAM):
+            # first use on this database: build the whole table once
+            self._refresh()
+            params.set_param(self._READY_PARAM, '1')
+        self.env.cr.execute("""
+            SELECT sum(amount), sum(number_of_days), sum(number_of_hours)
+            FROM hr_payslip_history
+            WHERE employee_id = %s AND source = %s AND code = %s
+            AND date_from >= %s AND date_to <= %s""",
+                            (employee_id, source, code, from_date, to_date))
+        return self.env.cr.fetchone()
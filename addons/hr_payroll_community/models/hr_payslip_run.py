@@ -150,6 +150,13 @@ class HrPayslipRun(models.Model):
                     lambda slip: slip.state == 'draft'):
                 slip.action_payslip_done()
 
+    def action_compute_sheets(self):
+        """Recompute all the draft payslips of the batches in a single pass,
+        sharing structures, rules and rate lookups between the payslips"""
+        self.mapped('slip_ids').filtered(
+            lambda slip: slip.state == 'draft').action_compute_sheet()
+        return True
+
     def action_payslip_run(self):
         """Function for state change"""
         return self.write({'state': 'draft'})
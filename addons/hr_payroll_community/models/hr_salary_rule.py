@@ -20,12 +20,28 @@
 #    If not, see <http://www.gnu.org/licenses/>.
 #
 #############################################################################
+import logging
+import time
+
 from odoo import api, fields, models, _
 from odoo.exceptions import UserError, ValidationError
-from odoo.tools.safe_eval import safe_eval
+from odoo.tools.safe_eval import (_BUILTINS, _SAFE_OPCODES, check_values,
+                                  test_expr)
 
 from odoo.addons import decimal_precision as dp
 
+_logger = logging.getLogger(__name__)
+
+# Compiled rule expressions, kept per worker process:
+# {(model, rule_id, field_name, mode): (write_date, source, code_object)}
+# The entry is only reused while the rule's write_date and source text are
+# unchanged, so edits made in another worker invalidate it as well.
+_COMPILED_RULES = {}
+
+# Cumulative evaluation time per rule in this worker:
+# {rule_id: [evaluation_count, total_seconds, rule_code]}
+_RULE_TIMINGS = {}
+
 
 class HrSalaryRule(models.Model):
     """Create new model for Salary Rule"""
@@ -159,6 +175,78 @@ class HrSalaryRule(models.Model):
                 _('Error! You cannot create recursive hierarchy '
                   'of Salary Rules.'))
 
+    def write(self, vals):
+        """Drop the compiled expressions of the written rules"""
+        self._invalidate_compiled_rules()
+        return super(HrSalaryRule, self).write(vals)
+
+    def unlink(self):
+        """Drop the compiled expressions of the deleted rules"""
+        self._invalidate_compiled_rules()
+        return super(HrSalaryRule, self).unlink()
+
+    def _invalidate_compiled_rules(self):
+        """Remove the cached code objects of the rules in self"""
+        keys = {(self._name, rule_id) for rule_id in self.ids}
+        for key in [key for key in _COMPILED_RULES if key[:2] in keys]:
+            _COMPILED_RULES.pop(key, None)
+
+    def _eval_rule_expression(self, fname, localdict, mode='eval',
+                              nocopy=False):
+        """
+        Evaluate the expression stored in field ``fname`` of the rule.
+
+        Behaves like ``safe_eval(self[fname], localdict, mode=mode,
+        nocopy=nocopy)`` but the opcode check and compilation of the source
+        are done once per worker and reused until the rule is written again.
+        The time spent is added to the rule's entry in ``_RULE_TIMINGS``.
+        """
+        self.ensure_one()
+        start = time.perf_counter()
+        source = self[fname]
+        key = (self._name, self.id, fname, mode)
+        cached = _COMPILED_RULES.get(key)
+        if cached and cached[0] == self.write_date and cached[1] == source:
+            code = cached[2]
+        else:
+            code = test_expr(source, _SAFE_OPCODES, mode=mode)
+            _COMPILED_RULES[key] = (self.write_date, source, code)
+        if not nocopy:
+            localdict = dict(localdict)
+        check_values(localdict)
+        localdict['__builtins__'] = dict(_BUILTINS)
+        try:
+            return eval(code, localdict)
+        finally:
+            timing = _RULE_TIMINGS.setdefault(self.id, [0, 0.0, self.code])
+            timing[0] += 1
+            timing[1] += time.perf_counter() - start
+
+    @api.model
+    def _get_rule_timings(self, limit=None):
+        """
+        @return: list of dict with the evaluation count and total/average
+        time (ms) of each rule evaluated in this worker, slowest first
+        """
+        timings = sorted(_RULE_TIMINGS.items(), key=lambda item: -item[1][1])
+        return [{
+            'rule_id': rule_id,
+            'code': code,
+            'count': count,
+            'total_ms': total * 1000.0,
+            'avg_ms': total * 1000.0 / count if count else 0.0,
+        } for rule_id, (count, total, code) in timings[:limit]]
+
+    @api.model
+    def _log_rule_timings(self, limit=10):
+        """Log the slowest rules of this worker at debug level"""
+        if not _logger.isEnabledFor(logging.DEBUG):
+            return
+        for timing in self._get_rule_timings(limit):
+            _logger.debug(
+                "Salary rule %(code)s (id %(rule_id)s): %(count)d evals, "
+                "%(total_ms).1f ms total, %(avg_ms).3f ms avg", timing)
+
     def _recursive_search_of_rules(self):
         """
         @return: returns a list of tuple (id, sequence) which are all the
@@ -181,7 +269,7 @@ class HrSalaryRule(models.Model):
             if rec.amount_select == 'fix':
                 try:
                     return rec.amount_fix, float(
-                        safe_eval(rec.quantity, localdict)), 100.0
+                        rec._eval_rule_expression('quantity', localdict)), 100.0
                 except:
                     raise UserError(
                         _('Wrong quantity defined for salary rule %s (%s).') % (
@@ -189,8 +277,9 @@ class HrSalaryRule(models.Model):
             elif rec.amount_select == 'percentage':
                 try:
                     return (
-                        float(safe_eval(rec.amount_percentage_base, localdict)),
-                        float(safe_eval(rec.quantity, localdict)),
+                        float(rec._eval_rule_expression(
+                            'amount_percentage_base', localdict)),
+                        float(rec._eval_rule_expression('quantity', localdict)),
                         rec.amount_percentage)
                 except:
                     raise UserError(
@@ -199,8 +288,9 @@ class HrSalaryRule(models.Model):
                             rec.name, rec.code))
             else:
                 try:
-                    safe_eval(rec.amount_python_compute, localdict, mode='exec',
-                              nocopy=True)
+                    rec._eval_rule_expression('amount_python_compute',
+                                              localdict, mode='exec',
+                                              nocopy=True)
                     return (float(localdict['result']),
                             'result_qty' in localdict and
                             localdict['result_qty'] or 1.0, 'result_rate'
@@ -222,7 +312,8 @@ class HrSalaryRule(models.Model):
             return True
         elif self.condition_select == 'range':
             try:
-                result = safe_eval(self.condition_range, localdict)
+                result = self._eval_rule_expression('condition_range',
+                                                    localdict)
                 return (self.condition_range_min <= result and result <=
                         self.condition_range_max or False)
             except:
@@ -232,8 +323,8 @@ class HrSalaryRule(models.Model):
                         self.name, self.code))
         else:  # python code
             try:
-                safe_eval(self.condition_python, localdict, mode='exec',
-                          nocopy=True)
+                self._eval_rule_expression('condition_python', localdict,
+                                           mode='exec', nocopy=True)
                 return 'result' in localdict and localdict['result'] or False
             except:
                 raise UserError(
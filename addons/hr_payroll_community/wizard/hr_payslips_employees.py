@@ -61,9 +61,20 @@ class HrPayslipEmployees(models.TransientModel):
             raise UserError(
                 _("You must select employee(s) to generate payslip(s)."))
 
-        for employee in self.env['hr.employee'].browse(data['employee_ids']):
+        employees = self.env['hr.employee'].browse(data['employee_ids'])
+        # compute the worked days of all the employees in one pass
+        payslip_model = self.env['hr.payslip']
+        contract_ids = []
+        for employee in employees:
+            contract_ids += payslip_model.get_contract(
+                employee, from_date, to_date)
+        worked_day_lines = payslip_model._get_batch_worked_day_lines(
+            self.env['hr.contract'].browse(contract_ids), from_date, to_date)
+        payslip_model = payslip_model.with_context(
+            worked_day_lines=worked_day_lines)
+        for employee in employees:
             slip_data = (
-                self.env['hr.payslip'].onchange_employee_id(
+                payslip_model.onchange_employee_id(
                     from_date, to_date, employee.id, contract_id=False))
             res = {
                 'employee_id': employee.id,
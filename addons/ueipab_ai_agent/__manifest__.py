@@ -1,6 +1,6 @@
 {
     'name': 'UEIPAB AI Agent',
-    'version': '17.0.1.61.0',
+    'version': '17.0.1.72.1',
     'category': 'Services',
     'summary': 'AI-powered WhatsApp agent for automated customer interactions',
     'author': 'UEIPAB',
@@ -23,6 +23,8 @@
         'views/res_partner_views.xml',
         'views/ai_agent_freescout_task_views.xml',
         'views/ai_agent_voice_call_views.xml',
+        'views/ai_agent_outbound_message_views.xml',
+        'views/ai_agent_turn_trace_views.xml',
         'views/menus.xml',
     ],
     'post_init_hook': '_load_api_configs',
@@ -25,6 +25,13 @@ class TelegramWebhookController(http.Controller):
             if not message:
                 return {}   # other update types (inline_query, etc.) — ignore
 
+            # Dedup on update_id — a redelivered update is processed once
+            update_id = data.get('update_id')
+            if update_id and not request.env['ai.agent.inbound.ledger'].sudo()._claim(
+                    'telegram', [update_id]):
+                _logger.info("Telegram inbound duplicate update skipped: %s", update_id)
+                return {}
+
             chat_id    = str(message['chat']['id'])
             text       = message.get('text', '').strip()
             first_name = message.get('from', {}).get('first_name', '')
@@ -75,12 +75,14 @@ class AiAgentWebhook(http.Controller):
             _logger.info("WhatsApp webhook: no active conversation for %s", normalized_phone)
             return {'status': 'ok', 'message': 'No active conversation'}
 
-        # Check duplicate (global, not per-conversation)
-        existing = request.env['ai.agent.message'].sudo().search([
-            ('whatsapp_message_id', '=', wa_id),
-        ], limit=1)
-        if existing:
-            _logger.info("WhatsApp webhook: duplicate message %d", wa_id)
+        # Check duplicate (global, not per-conversation). Claiming the ID
+        # up front makes a concurrent redelivery wait for this one and skip.
+        if not wa_id:
+            _logger.info("WhatsApp webhook: message without id from %s, ignored", normalized_phone)
+            return {'status': 'ok', 'message': 'No message id'}
+        if not request.env['ai.agent.inbound.ledger'].sudo()._claim(
+                'massiva', [wa_id], conversation.id):
+            _logger.info("WhatsApp webhook: duplicate message %s", wa_id)
             return {'status': 'ok', 'message': 'Duplicate message'}
 
         # Process reply
@@ -1,6 +1,10 @@
 from . import ai_agent_skill
 from . import ai_agent_conversation
 from . import ai_agent_message
+from . import ai_agent_inbound_ledger
+from . import ai_agent_outbound_message
+from . import ai_agent_http_stat
+from . import ai_agent_turn_trace
 from . import ai_agent_dashboard
 from . import whatsapp_service
 from . import kapso_service
@@ -1,15 +1,95 @@
+import hashlib
 import logging
+import os
 import re as _re
-
-import requests
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError, ValidationError
+from odoo.tools.lru import LRU
 
-from ..skills import get_skill
+from ..skills import get_skill, school_data
+from .claude_service import AIServiceError
+from . import turn_trace
+from .http_pool import get_session
 
 _logger = logging.getLogger(__name__)
 
+
+# Rendered history content blocks per message, keyed by
+# (dbname, message id, write_date). Shared by the worker's threads; image and
+# rasterized PDF payloads make entries heavy, hence the small size.
+_HISTORY_BLOCK_CACHE = LRU(128)
+
+_SUPPORTED_IMAGE_TYPES = {'image/jpeg', 'image/png', 'image/gif', 'image/webp'}
+
+# Rough token costs used to keep the history inside its budget
+_IMAGE_TOKEN_ESTIMATE = 1600    # Claude caps a vision image at ~1.6k tokens
+_CHARS_PER_TOKEN = 4
+
+# When the history exceeds its budget the window start moves forward until the
+# kept part fits in this share of the budget. Moving it in steps (not every
+# turn) keeps the history prefix stable for the prompt cache.
+_HISTORY_KEEP_RATIO = 0.6
+_HISTORY_SUMMARY_LINE_CHARS = 200
+_HISTORY_SUMMARY_MAX_CHARS = 4000
+
+# Due conversations handled per transaction by the timeout sweep
+_TIMEOUT_SWEEP_CHUNK = 50
+
+# Attachment archival: provider media URLs expire after ~72h
+_ARCHIVE_MAX_AGE_HOURS = 72
+_ARCHIVE_MAX_BYTES = 25 * 1024 * 1024
+_ARCHIVE_CHUNK_BYTES = 64 * 1024
+# A failed download is retried after 15 min, doubling per attempt; after
+# _ARCHIVE_MAX_ATTEMPTS the message leaves the backlog for good
+_ARCHIVE_MAX_ATTEMPTS = 5
+_ARCHIVE_RETRY_MINUTES = 15
+
+
+def _stream_download(url):
+    """Stream a media URL into a temp file, hashing it as it goes.
+
+    Runs on the archiver's thread pool: HTTP and file I/O only, no ORM.
+    Returns (tmp_path, sha1 hex, size, content_type); raises on failure or
+    when the payload exceeds _ARCHIVE_MAX_BYTES.
+    """
+    sha = hashlib.sha1()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(prefix='wa_archive_')
+    try:
+        with os.fdopen(fd, 'wb') as out, \
+                get_session('download').get(url, timeout=30, stream=True) as resp:
+            resp.raise_for_status()
+            for chunk in resp.iter_content(_ARCHIVE_CHUNK_BYTES):
+                size += len(chunk)
+                if size > _ARCHIVE_MAX_BYTES:
+                    raise ValueError("payload larger than %d bytes" % _ARCHIVE_MAX_BYTES)
+                sha.update(chunk)
+                out.write(chunk)
+            content_type = resp.headers.get('Content-Type', 'image/jpeg').split(';')[0]
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+    return tmp_path, sha.hexdigest(), size, content_type
+
+
+class _DeferredGeneration(Exception):
+    """Raised by action_process_reply() when called in deferred mode.
+
+    The poll cron runs each turn up to the LLM call, collects the request and
+    rolls the turn back; the requests then run concurrently and each turn is
+    replayed with its prefetched response (see _cron_poll_messages). The
+    expensive steps of the first pass are memoized in the turn cache, so the
+    replay only repeats the turn's database writes.
+    """
+
+    def __init__(self, request):
+        super().__init__(request)
+        self.request = request
+
 # Phrases that signal the customer is ending the conversation.
 # Used by general_inquiry to auto-resolve instead of staying 'waiting'.
 _FAREWELL_PHRASES = frozenset([
@@ -123,6 +203,26 @@ class AiAgentConversation(models.Model):
     # Reminder tracking
     reminder_count = fields.Integer('Recordatorios Enviados', default=0)
     last_reminder_date = fields.Datetime('Ultimo Recordatorio')
+    next_action_date = fields.Datetime(
+        'Proximo Recordatorio/Timeout', compute='_compute_next_action_date',
+        store=True, index='btree_not_null',
+        help='Momento a partir del cual el cron de timeouts envia recordatorio o cierra. '
+             'Vacio si la conversacion no espera respuesta.')
+
+    # Bounded history window (see _get_conversation_history)
+    history_window_start_id = fields.Integer(
+        'Inicio Ventana Historial', readonly=True,
+        help='Primer mensaje enviado completo a la IA; los anteriores van resumidos.')
+    history_summary = fields.Text(
+        'Resumen Historial Anterior', readonly=True,
+        help='Resumen acumulado de los mensajes que salieron de la ventana de historial.')
+
+    # AI call latency (Claude/OpenAI round-trip, retries included)
+    ai_call_count = fields.Integer('Llamadas IA', default=0, readonly=True)
+    ai_last_latency_ms = fields.Integer('Latencia IA (ms)', readonly=True)
+    ai_total_latency_ms = fields.Integer('Latencia IA Total (ms)', readonly=True)
+    ai_avg_latency_ms = fields.Integer(
+        'Latencia IA Promedio (ms)', compute='_compute_ai_avg_latency_ms')
 
     # Verification email tracking
     verification_email_sent_date = fields.Datetime('Verificacion Enviada')
@@ -162,6 +262,16 @@ class AiAgentConversation(models.Model):
             partner_name = rec.partner_id.name or 'Sin contacto'
             rec.name = f"{skill_name} - {partner_name}"
 
+    @api.depends('state', 'silent', 'last_message_date', 'skill_id.reminder_interval_hours')
+    def _compute_next_action_date(self):
+        from datetime import timedelta
+        for rec in self:
+            if rec.state == 'waiting' and not rec.silent and rec.last_message_date:
+                interval_hours = rec.skill_id.reminder_interval_hours or 24
+                rec.next_action_date = rec.last_message_date + timedelta(hours=interval_hours)
+            else:
+                rec.next_action_date = False
+
     @api.depends('escalation_freescout_id')
     def _compute_escalation_freescout_url(self):
         base = self.env['ir.config_parameter'].sudo().get_param(
@@ -175,8 +285,8 @@ class AiAgentConversation(models.Model):
 
     def _compute_turn_count(self):
         for rec in self:
-            # Only count inbound messages with actual content — empty records are
-            # dedup-only markers and must not inflate the turn limit counter.
+            # Only count inbound messages with actual content — empty records
+            # (legacy dedup-only markers) must not inflate the turn limit counter.
             rec.turn_count = len(rec.agent_message_ids.filtered(
                 lambda m: m.direction == 'inbound' and (m.body or m.attachment_url)))
 
@@ -185,89 +295,174 @@ class AiAgentConversation(models.Model):
 
         Supports multimodal content (text + images). When images are present,
         uses content block format. Falls back to simple string for text-only.
+
+        Incremental and bounded:
+          - each message is rendered once (_render_history_message, cached
+            per message; rasterized PDF pages are also persisted)
+          - only messages from history_window_start_id on are sent in full;
+            when they exceed ai_agent.history_token_budget (default 8000
+            estimated tokens) the window start moves forward and the messages
+            leaving it are folded into history_summary, sent as the opening
+            user block
         """
         self.ensure_one()
+        budget = int(self.env['ir.config_parameter'].sudo().get_param(
+            'ai_agent.history_token_budget', '8000') or 8000)
+
+        domain = [('conversation_id', '=', self.id)]
+        if self.history_window_start_id:
+            domain.append(('id', '>=', self.history_window_start_id))
+        window = []
+        for msg in self.env['ai.agent.message'].search(domain, order='timestamp asc, id asc'):
+            rendered = self._render_history_message(msg)
+            if rendered:
+                window.append((msg, rendered))
+
+        total = sum(rendered[2] for _msg, rendered in window)
+        if total > budget and len(window) > 1:
+            target = budget * _HISTORY_KEEP_RATIO
+            drop = 0
+            while drop < len(window) - 1 and total > target:
+                total -= window[drop][1][2]
+                drop += 1
+            self._fold_into_history_summary([msg for msg, _rendered in window[:drop]])
+            window = window[drop:]
+            self.history_window_start_id = window[0][0].id
+            _logger.info(
+                "Conv %d: history window moved to msg %d (%d msgs folded, ~%d tokens kept)",
+                self.id, self.history_window_start_id, drop, total)
+
         messages = []
-        for msg in self.agent_message_ids.sorted('timestamp'):
-            if not msg.body and not msg.attachment_url:
-                continue  # Skip empty dedup records
-
-            role = 'assistant' if msg.direction == 'outbound' else 'user'
-
-            # Build content blocks for this message
-            SUPPORTED_IMAGE_TYPES = {'image/jpeg', 'image/png', 'image/gif', 'image/webp'}
-            blocks = []
-            if msg.attachment_url and msg.attachment_type == 'image':
-                if msg.attachment_id and msg.attachment_id.datas:
-                    mime = msg.attachment_id.mimetype or 'image/jpeg'
-                    if mime in SUPPORTED_IMAGE_TYPES:
-                        blocks.append({
-                            'type': 'image',
-                            'source': {
-                                'type': 'base64',
-                                'media_type': mime,
-                                'data': msg.attachment_id.datas.decode('utf-8'),
-                            },
-                        })
-                    else:
-                        _logger.warning(
-                            "Skipping unsupported image mimetype %s for msg %d",
-                            mime, msg.id)
-                        blocks.append({
-                            'type': 'text',
-                            'text': '(Imagen en formato no soportado)',
-                        })
-                else:
-                    # Validate URL extension before sending to Claude
-                    url_ext = msg.attachment_url.lower().split('?')[0].rsplit('.', 1)[-1]
-                    if url_ext in ('jpg', 'jpeg', 'png', 'gif', 'webp'):
-                        blocks.append({
-                            'type': 'image',
-                            'source': {'type': 'url', 'url': msg.attachment_url},
-                        })
-                    else:
-                        _logger.warning(
-                            "Skipping non-image URL extension .%s for msg %d",
-                            url_ext, msg.id)
-                        blocks.append({
-                            'type': 'text',
-                            'text': '(Archivo adjunto no soportado para vision)',
-                        })
-            elif msg.attachment_url and msg.attachment_type == 'document':
-                # Convert PDF first page to image for Claude Vision
-                pdf_image = self._convert_pdf_to_image(msg)
-                if pdf_image:
-                    blocks.append({
-                        'type': 'image',
-                        'source': {
-                            'type': 'base64',
-                            'media_type': 'image/png',
-                            'data': pdf_image,
-                        },
-                    })
-                    if not msg.body:
-                        blocks.append({
-                            'type': 'text',
-                            'text': '(Documento PDF enviado)',
-                        })
-            if msg.body:
-                blocks.append({'type': 'text', 'text': msg.body})
-
-            # Merge with previous if same role
+        if self.history_summary:
+            messages.append({'role': 'user', 'content': [{
+                'type': 'text',
+                'text': "RESUMEN DE LA CONVERSACION ANTERIOR:\n" + self.history_summary,
+            }]})
+        for _msg, (role, blocks, _tokens) in window:
+            # Merge with previous if same role (never mutate cached blocks)
             if messages and messages[-1]['role'] == role:
                 prev = messages[-1]['content']
                 if isinstance(prev, str):
-                    messages[-1]['content'] = [{'type': 'text', 'text': prev}]
-                messages[-1]['content'].extend(blocks)
+                    prev = [{'type': 'text', 'text': prev}]
+                messages[-1]['content'] = list(prev) + list(blocks)
             else:
                 if len(blocks) == 1 and blocks[0].get('type') == 'text':
                     content = blocks[0]['text']
                 else:
-                    content = blocks
+                    content = list(blocks)
                 messages.append({'role': role, 'content': content})
 
         return messages
 
+    def _render_history_message(self, msg):
+        """Return (role, content blocks, estimated tokens) for one message.
+
+        None for empty (legacy dedup-only) records. Cached per message and write_date, so a
+        turn only renders the messages added since the previous one.
+        """
+        if not msg.body and not msg.attachment_url:
+            return None  # Skip empty legacy dedup records
+        key = (self.env.cr.dbname, msg.id, msg.write_date)
+        try:
+            return _HISTORY_BLOCK_CACHE[key]
+        except KeyError:
+            pass
+        role = 'assistant' if msg.direction == 'outbound' else 'user'
+        blocks = self._build_history_blocks(msg)
+        tokens = sum(
+            _IMAGE_TOKEN_ESTIMATE if block['type'] == 'image'
+            else len(block['text']) // _CHARS_PER_TOKEN + 1
+            for block in blocks
+        )
+        rendered = (role, tuple(blocks), tokens)
+        _HISTORY_BLOCK_CACHE[key] = rendered
+        return rendered
+
+    def _build_history_blocks(self, msg):
+        """Build the Claude content blocks of one message."""
+        blocks = []
+        if msg.attachment_url and msg.attachment_type == 'image':
+            if msg.attachment_id and msg.attachment_id.datas:
+                mime = msg.attachment_id.mimetype or 'image/jpeg'
+                if mime in _SUPPORTED_IMAGE_TYPES:
+                    blocks.append({
+                        'type': 'image',
+                        'source': {
+                            'type': 'base64',
+                            'media_type': mime,
+                            'data': msg.attachment_id.datas.decode('utf-8'),
+                        },
+                    })
+                else:
+                    _logger.warning(
+                        "Skipping unsupported image mimetype %s for msg %d",
+                        mime, msg.id)
+                    blocks.append({
+                        'type': 'text',
+                        'text': '(Imagen en formato no soportado)',
+                    })
+            else:
+                # Validate URL extension before sending to Claude
+                url_ext = msg.attachment_url.lower().split('?')[0].rsplit('.', 1)[-1]
+                if url_ext in ('jpg', 'jpeg', 'png', 'gif', 'webp'):
+                    blocks.append({
+                        'type': 'image',
+                        'source': {'type': 'url', 'url': msg.attachment_url},
+                    })
+                else:
+                    _logger.warning(
+                        "Skipping non-image URL extension .%s for msg %d",
+                        url_ext, msg.id)
+                    blocks.append({
+                        'type': 'text',
+                        'text': '(Archivo adjunto no soportado para vision)',
+                    })
+        elif msg.attachment_url and msg.attachment_type == 'document':
+            # Convert PDF first page to image for Claude Vision
+            pdf_image = self._convert_pdf_to_image(msg)
+            if pdf_image:
+                blocks.append({
+                    'type': 'image',
+                    'source': {
+                        'type': 'base64',
+                        'media_type': 'image/png',
+                        'data': pdf_image,
+                    },
+                })
+                if not msg.body:
+                    blocks.append({
+                        'type': 'text',
+                        'text': '(Documento PDF enviado)',
+                    })
+        if msg.body:
+            blocks.append({'type': 'text', 'text': msg.body})
+        return blocks
+
+    def _fold_into_history_summary(self, messages):
+        """Append messages leaving the history window to the rolling summary.
+
+        One short line per message (no AI call); the summary keeps its most
+        recent _HISTORY_SUMMARY_MAX_CHARS characters.
+        """
+        self.ensure_one()
+        lines = []
+        for msg in messages:
+            who = 'Asistente' if msg.direction == 'outbound' else 'Cliente'
+            text = ' '.join((msg.body or '').split())
+            if len(text) > _HISTORY_SUMMARY_LINE_CHARS:
+                text = text[:_HISTORY_SUMMARY_LINE_CHARS].rstrip() + '…'
+            if msg.attachment_type:
+                text = ('[%s] %s' % (msg.attachment_type, text)).strip()
+            if text:
+                lines.append('- %s: %s' % (who, text))
+        if not lines:
+            return
+        summary = '\n'.join(filter(None, [self.history_summary or '', '\n'.join(lines)]))
+        if len(summary) > _HISTORY_SUMMARY_MAX_CHARS:
+            summary = summary[-_HISTORY_SUMMARY_MAX_CHARS:]
+            summary = summary[summary.find('\n') + 1:]
+        self.history_summary = summary
+
     def _is_dry_run(self):
         # Telegram conversations are never dry-run — dry_run only gates WA
         if self and len(self) == 1 and self.channel == 'telegram':
@@ -430,14 +625,32 @@ class AiAgentConversation(models.Model):
             message_text: The customer message (may be combined from multiple messages).
             wa_message_id: WhatsApp message ID of the first/only message.
             extra_wa_ids: List of additional WA message IDs when batching multiple
-                messages. Creates empty dedup records so they won't be re-processed.
+                messages. Recorded in the inbound ledger so they won't be re-processed.
             attachment_url: URL of attachment from the first/only message.
             extra_attachments: List of dicts {'url': ..., 'wa_id': ...} for
                 additional attachments from batched messages.
             kapso_message_id: Kapso/Meta wamid of the inbound message (string);
                 stored on the message record for webhook dedup (Kapso provider).
+
+        Each completed turn is traced (ai.agent.turn.trace): stage timings for
+        moderation, transcription, PDF rasterization, context building, the
+        LLM call, skill actions, sends and receipt OCR.
         """
         self.ensure_one()
+        with turn_trace.collect() as trace:
+            result = self._process_reply(
+                message_text, wa_message_id=wa_message_id, extra_wa_ids=extra_wa_ids,
+                attachment_url=attachment_url, extra_attachments=extra_attachments,
+                kapso_message_id=kapso_message_id,
+                attachment_type_hint=attachment_type_hint)
+        if trace.stages:
+            self.env['ai.agent.turn.trace']._save(self, trace)
+        return result
+
+    def _process_reply(self, message_text, wa_message_id=0, extra_wa_ids=None,
+                       attachment_url=None, extra_attachments=None,
+                       kapso_message_id=None, attachment_type_hint=None):
+        """Body of action_process_reply(), run inside its turn trace."""
         if self.state not in ('waiting', 'active'):
             _logger.warning("Conversation %s: ignoring reply in state %s", self.id, self.state)
             return
@@ -485,15 +698,12 @@ class AiAgentConversation(models.Model):
                     'attachment_type': self._detect_attachment_type(att['url']),
                 })
 
-        # Create dedup-only records for extra WA IDs (empty body, won't appear in history)
-        if extra_wa_ids:
-            for extra_id in extra_wa_ids:
-                self.env['ai.agent.message'].create({
-                    'conversation_id': self.id,
-                    'direction': 'inbound',
-                    'body': '',
-                    'whatsapp_message_id': extra_id,
-                })
+        # Record every consumed provider ID in the inbound dedup ledger
+        Ledger = self.env['ai.agent.inbound.ledger']
+        Ledger._claim('massiva', [wa_message_id] + list(extra_wa_ids or []) + [
+            att.get('wa_id') for att in extra_attachments or []], self.id)
+        if kapso_message_id:
+            Ledger._claim('kapso', [kapso_message_id], self.id)
 
         now_dt = fields.Datetime.now()
         prev_last_msg = self.last_message_date
@@ -588,9 +798,9 @@ class AiAgentConversation(models.Model):
             return
 
         # Build conversation for Claude
-        context = skill_handler.get_context(self)
-        system_prompt = skill_handler.get_system_prompt(self, context)
-        history = self._get_conversation_history()
+        context, system_prompt = self._get_skill_prompt(skill_handler, message_text)
+        with turn_trace.span('context'):
+            history = self._get_conversation_history()
 
         # Generate AI response
         dry_run = self._is_dry_run()
@@ -598,21 +808,29 @@ class AiAgentConversation(models.Model):
 
         if dry_run:
             ai_content = "[DRY_RUN] Respuesta simulada del AI"
-            input_tokens = 0
-            output_tokens = 0
+            ai_usage = {}
             _logger.info("DRY_RUN: Would call Claude API for conversation %s", self.id)
         else:
-            ai_result = claude_service.generate_response(
-                system_prompt=system_prompt,
-                messages=history,
-                model=skill.model_name,
-            )
+            ai_request = {
+                'system_prompt': system_prompt,
+                'messages': history,
+                'model': skill.model_name,
+            }
+            if self.env.context.get('ai_agent_defer_generation'):
+                raise _DeferredGeneration(ai_request)
+            ai_result = self._take_prefetched_response(ai_request)
+            prefetched = ai_result is not None
+            if not prefetched:
+                ai_result = claude_service.generate_response(**ai_request)
+            self._record_ai_latency(ai_result.get('latency_ms', 0))
+            # a prefetched call ran before this pass: add it to the turn total
+            turn_trace.record('llm', ai_result.get('latency_ms', 0), replayed=prefetched)
             ai_content = ai_result['content']
-            input_tokens = ai_result.get('input_tokens', 0)
-            output_tokens = ai_result.get('output_tokens', 0)
+            ai_usage = self._ai_usage_vals(ai_result)
 
         # Let skill handler process AI response (may trigger resolution)
-        action = skill_handler.process_ai_response(self, ai_content, context)
+        with turn_trace.span('actions'):
+            action = skill_handler.process_ai_response(self, ai_content, context)
 
         if action.get('resolve'):
             # Send farewell message before resolving
@@ -620,14 +838,13 @@ class AiAgentConversation(models.Model):
             if farewell:
                 wa_msg_id = self._send_to_user(farewell)
 
-                self.env['ai.agent.message'].create({
-                    'conversation_id': self.id,
-                    'direction': 'outbound',
-                    'body': farewell,
-                    'whatsapp_message_id': wa_msg_id,
-                    'ai_input_tokens': input_tokens,
-                    'ai_output_tokens': output_tokens,
-                })
+                self.env['ai.agent.message'].create(dict(
+                    ai_usage,
+                    conversation_id=self.id,
+                    direction='outbound',
+                    body=farewell,
+                    whatsapp_message_id=wa_msg_id,
+                ))
 
             # Quotation emitted in the same turn as a handoff: send before resolving
             resolve_quote_msg = action.get('quote_message')
@@ -662,6 +879,7 @@ class AiAgentConversation(models.Model):
             return
 
         # Handle intermediate actions (e.g., send verification email, escalation)
+        actions_started = time.monotonic()
         if action.get('send_verification_email'):
             self._send_verification_email(action['send_verification_email'])
 
@@ -697,6 +915,7 @@ class AiAgentConversation(models.Model):
                         action['_school_followup'] = followup
             except Exception as exc:
                 _logger.warning("School account help failed: %s", exc)
+        turn_trace.record('actions', turn_trace.elapsed_ms(actions_started))
 
         # Send AI response via configured channel
         response_text = action.get('message', ai_content)
@@ -731,14 +950,13 @@ class AiAgentConversation(models.Model):
         wa_msg_id = self._send_to_user(response_text)
 
         # Log outbound message
-        self.env['ai.agent.message'].create({
-            'conversation_id': self.id,
-            'direction': 'outbound',
-            'body': response_text,
-            'whatsapp_message_id': wa_msg_id,
-            'ai_input_tokens': input_tokens,
-            'ai_output_tokens': output_tokens,
-        })
+        self.env['ai.agent.message'].create(dict(
+            ai_usage,
+            conversation_id=self.id,
+            direction='outbound',
+            body=response_text,
+            whatsapp_message_id=wa_msg_id,
+        ))
 
         # Send flyer after text reply if Claude requested one
         flyer_key = action.get('flyer_key')
@@ -755,7 +973,7 @@ class AiAgentConversation(models.Model):
         # `_TD_LABEL` NameError rolled back 3 turns → 3 resends + empty convs).
         if attachment_url and self._detect_attachment_type(attachment_url) == 'image':
             try:
-                with self.env.cr.savepoint():
+                with turn_trace.span('receipt'), self.env.cr.savepoint():
                     receipt = self._extract_payment_receipt(attachment_url)
                     if receipt:
                         partner = self.partner_id
@@ -868,9 +1086,37 @@ class AiAgentConversation(models.Model):
     def _convert_pdf_to_image(self, msg):
         """Convert a PDF attachment's first page to base64 PNG for Claude Vision.
 
-        Tries archived binary first, falls back to URL download.
+        Tries archived binary first, falls back to URL download. The rendered
+        page is kept as msg.vision_attachment_id, so each PDF is downloaded
+        and rasterized only once; within a poll run the rendering is also
+        memoized in the turn cache, so the replay of a deferred turn (whose
+        first pass was rolled back with its attachment) does not redo it.
         Returns base64 string (no prefix) or None if conversion fails.
         """
+        if msg.vision_attachment_id and msg.vision_attachment_id.datas:
+            return msg.vision_attachment_id.datas.decode('utf-8')
+        cache = self._turn_cache()
+        key = ('pdf', msg.attachment_url or msg.attachment_id.id)
+        hit = key in cache
+        if not hit:
+            started = time.monotonic()
+            cache[key] = (self._rasterize_pdf(msg), turn_trace.elapsed_ms(started))
+        png_b64, elapsed_ms = cache[key]
+        turn_trace.record('pdf', elapsed_ms, replayed=hit)
+        if not png_b64:
+            return None
+        msg.sudo().vision_attachment_id = self.env['ir.attachment'].sudo().create({
+            'name': 'WA_%d_page1.png' % msg.id,
+            'type': 'binary',
+            'datas': png_b64,
+            'mimetype': 'image/png',
+            'res_model': 'ai.agent.message',
+            'res_id': msg.id,
+        })
+        return png_b64.decode('utf-8')
+
+    def _rasterize_pdf(self, msg):
+        """First page of the message's PDF as base64 PNG bytes, or None."""
         import base64
         try:
             import fitz  # PyMuPDF
@@ -883,7 +1129,7 @@ class AiAgentConversation(models.Model):
             if msg.attachment_id and msg.attachment_id.datas:
                 pdf_bytes = base64.b64decode(msg.attachment_id.datas)
             elif msg.attachment_url:
-                resp = requests.get(msg.attachment_url, timeout=30)
+                resp = get_session('download').get(msg.attachment_url, timeout=30)
                 resp.raise_for_status()
                 pdf_bytes = resp.content
 
@@ -897,7 +1143,7 @@ class AiAgentConversation(models.Model):
             png_data = pix.tobytes("png")
             doc.close()
 
-            return base64.b64encode(png_data).decode('utf-8')
+            return base64.b64encode(png_data)
         except Exception as e:
             _logger.warning("Failed to convert PDF to image for msg %d: %s", msg.id, e)
             return None
@@ -915,7 +1161,7 @@ class AiAgentConversation(models.Model):
             return None
 
         try:
-            img_resp = requests.get(url, timeout=20)
+            img_resp = get_session('download').get(url, timeout=20)
             img_resp.raise_for_status()
             img_b64 = base64.b64encode(img_resp.content).decode('utf-8')
             mime = img_resp.headers.get('Content-Type', 'image/jpeg').split(';')[0]
@@ -953,7 +1199,7 @@ class AiAgentConversation(models.Model):
         )
 
         try:
-            resp = requests.post(
+            resp = get_session().post(
                 'https://api.openai.com/v1/chat/completions',
                 headers={'Authorization': f'Bearer {api_key}', 'Content-Type': 'application/json'},
                 json={
@@ -988,8 +1234,15 @@ class AiAgentConversation(models.Model):
     def _send_to_user(self, text):
         """Send text to the user via their channel (WhatsApp or Telegram).
 
-        Handles dry_run internally. Returns WA message_id (int) or 0.
+        Handles dry_run internally. WhatsApp messages are queued for the
+        rate-limited dispatcher (ai.agent.outbound.message), which stamps the
+        provider message ID on the logged ai.agent.message once sent.
+        Returns WA message_id (int) or 0.
         """
+        with turn_trace.span('send'):
+            return self._send_to_user_channel(text)
+
+    def _send_to_user_channel(self, text):
         if self._is_dry_run() and self.channel != 'telegram':
             _logger.info("DRY_RUN [WA → %s]: %s", self.phone, text[:80])
             return 0
@@ -1013,8 +1266,86 @@ class AiAgentConversation(models.Model):
                 except Exception:
                     pass
             return 0
-        result = self.env['ai.agent.whatsapp.service'].send_message(self.phone, text)
-        return result.get('message_id', 0)
+        self.env['ai.agent.whatsapp.service'].enqueue_message(
+            self.phone, text, conversation=self)
+        return 0
+
+    # ── AI generation helpers ───────────────────────────────────────────────
+
+    @api.depends('ai_call_count', 'ai_total_latency_ms')
+    def _compute_ai_avg_latency_ms(self):
+        for rec in self:
+            rec.ai_avg_latency_ms = (
+                rec.ai_total_latency_ms // rec.ai_call_count if rec.ai_call_count else 0)
+
+    def _record_ai_latency(self, latency_ms):
+        """Record the latency of one Claude/OpenAI call on the conversation."""
+        self.ensure_one()
+        self.write({
+            'ai_call_count': self.ai_call_count + 1,
+            'ai_last_latency_ms': latency_ms,
+            'ai_total_latency_ms': self.ai_total_latency_ms + latency_ms,
+        })
+
+    @api.model
+    def _ai_usage_vals(self, ai_result):
+        """ai.agent.message values for the usage of one AI call."""
+        return {
+            'ai_input_tokens': ai_result.get('input_tokens', 0),
+            'ai_output_tokens': ai_result.get('output_tokens', 0),
+            'ai_cache_read_tokens': ai_result.get('cache_read_tokens', 0),
+            'ai_cache_write_tokens': ai_result.get('cache_write_tokens', 0),
+            'ai_latency_ms': ai_result.get('latency_ms', 0),
+            'ai_provider': ai_result.get('provider') or 'claude',
+        }
+
+    def _get_skill_prompt(self, skill_handler, message_text):
+        """(context, system prompt) of the skill for this turn.
+
+        Both are read-only lookups (partner, balance, BCV, sheets, prior
+        conversations), so the replay of a deferred turn reuses the ones its
+        collect pass built. The history is rebuilt on replay: it carries the
+        turn's own writes (window move, summary) and its rendered messages
+        are cached anyway.
+        """
+        cache = self._turn_cache()
+        key = ('prompt', self.id, message_text or '')
+        hit = key in cache
+        if not hit:
+            started = time.monotonic()
+            context = skill_handler.get_context(self)
+            system_prompt = skill_handler.get_system_prompt(self, context)
+            cache[key] = ((context, system_prompt), turn_trace.elapsed_ms(started))
+        prompt, elapsed_ms = cache[key]
+        turn_trace.record('context', elapsed_ms, replayed=hit)
+        return prompt
+
+    def _take_prefetched_response(self, ai_request):
+        """Return the response prefetched by the poll cron for this turn.
+
+        Only used when the replayed turn asks for exactly the same messages
+        that were sent; a provider error is raised as the UserError the live
+        call would have raised. Returns None when nothing was prefetched.
+        """
+        prefetched = self.env.context.get('ai_agent_prefetched') or {}
+        entry = prefetched.pop(self.id, None)
+        if not entry or entry['request']['messages'] != ai_request['messages']:
+            return None
+        result = entry['result']
+        if isinstance(result, AIServiceError):
+            raise self.env['ai.agent.claude.service']._user_error(result)
+        return result
+
+    def _turn_cache(self):
+        """Per-poll-run memo for the expensive, read-only steps of a turn.
+
+        A deferred turn runs twice (collect, then replay); the cache keeps the
+        second pass from repeating transcription, moderation, the skill
+        context and prompt, and PDF rasterization. Entries keep the original
+        duration so the replayed turn's trace still reports it.
+        """
+        cache = self.env.context.get('ai_agent_turn_cache')
+        return cache if cache is not None else {}
 
     # ── Telegram inbound entry point ────────────────────────────────────────
 
@@ -1025,7 +1356,7 @@ class AiAgentConversation(models.Model):
         The absence_processor.py cron picks it up in the next 10-min cycle and handles
         Josefina assignment, director/subdirector email, and OdooBot DM.
         """
-        import requests as _req
+        _req = get_session()
         import json as _json
         from datetime import datetime as _dt
 
@@ -1098,9 +1429,7 @@ class AiAgentConversation(models.Model):
         Returns a follow-up message string to send to the customer, or None on failure.
         The ticket is created UNASSIGNED so the support team can follow up.
         """
-        import json as _json
         import unicodedata
-        import requests as _req
 
         cedula       = data.get('cedula', '').strip()
         student_name = data.get('student_name', '').strip()
@@ -1129,10 +1458,9 @@ class AiAgentConversation(models.Model):
                     "Por favor, escribe a soporte@ueipab.edu.ve para que el equipo te ayude directamente."
                 )
 
-        # --- 2. Load Google Directory cache ---
-        icp = self.env['ir.config_parameter'].sudo()
-        directory_json = icp.get_param('school.student_directory_json', '')
-        if not directory_json:
+        # --- 2. Load Google Directory cache (parsed + indexed, see school_data) ---
+        directory = school_data.get_directory_index(self.env)
+        if not directory.students:
             _logger.warning("School account help: school.student_directory_json param not set")
             self._create_school_account_fs_ticket(cedula, student_name, grade_raw, email_found=None)
             return (
@@ -1141,31 +1469,10 @@ class AiAgentConversation(models.Model):
                 "asistan con los datos de acceso de tu hijo/a."
             )
 
-        try:
-            directory = _json.loads(directory_json)
-            students  = directory.get('students', [])
-        except Exception:
-            students = []
-
-        # --- 3. Fuzzy name match ---
-        target = _norm(student_name)
-        # Split target into words for partial matching
-        target_words = set(target.split())
-        best_match = None
-        best_score = 0
-
-        for s in students:
-            sname = _norm(s.get('name', ''))
-            # Exact match wins immediately
-            if sname == target:
-                best_match = s
-                break
-            # Word-overlap score
-            swords = set(sname.split())
-            overlap = len(target_words & swords)
-            if overlap > best_score and overlap >= min(2, len(target_words)):
-                best_score = overlap
-                best_match = s
+        # --- 3. Name match: exact normalized name, else best word overlap ---
+        target_words = school_data.name_tokens(student_name)
+        best_match = directory.best_match(
+            student_name, min_score=max(1, min(2, len(target_words))))
 
         # --- 4. Build response and create FS ticket ---
         if best_match:
@@ -1201,7 +1508,7 @@ class AiAgentConversation(models.Model):
     def _create_school_account_fs_ticket(self, cedula, student_name, grade_raw, email_found=None):
         """Create an UNASSIGNED FreeScout soporte@ ticket for school account help follow-up."""
         import json as _json
-        import requests as _req
+        _req = get_session()
         from datetime import datetime as _dt
 
         _icp2 = self.env['ir.config_parameter'].sudo()
@@ -1734,12 +2041,12 @@ class AiAgentConversation(models.Model):
             except Exception as exc:
                 _logger.warning("CEO Discuss notify failed: %s", exc)
 
-        # 2. WA — secondary, subject to 120s anti-spam throttle
+        # 2. WA — secondary, queued behind the anti-spam interval
         ceo_phone = icp.get_param('wa_monitor.ceo_phone', '')
         if ceo_phone:
             try:
-                self.env['ai.agent.whatsapp.service'].send_message(ceo_phone, message)
-                _logger.info("CEO WA notify sent to %s", ceo_phone)
+                self.env['ai.agent.whatsapp.service'].enqueue_message(ceo_phone, message)
+                _logger.info("CEO WA notify queued for %s", ceo_phone)
             except Exception as exc:
                 _logger.warning("CEO WA notify failed: %s", exc)
 
@@ -1944,13 +2251,10 @@ class AiAgentConversation(models.Model):
 
     def _get_bcv_rate_for_payment(self):
         """Return current BCV rate (float) from ir.config_parameter."""
-        import json as _j
-        raw = self.env['ir.config_parameter'].sudo().get_param('ai_agent.bcv_rate_context', '')
-        if not raw:
-            return 0.0
+        bcv = school_data.get_bcv_context(self.env) or {}
         try:
-            return float(_j.loads(raw).get('current', {}).get('rate', 0.0))
-        except Exception:
+            return float(bcv.get('current', {}).get('rate', 0.0))
+        except (TypeError, ValueError):
             return 0.0
 
     def _resolve_journal_for_payment(self, banco, moneda):
@@ -2110,6 +2414,17 @@ class AiAgentConversation(models.Model):
         Requires ir.config_parameter 'ai_agent.openai_api_key' to be set.
         Returns Spanish transcription string, or None on failure/no key.
         """
+        cache = self._turn_cache()
+        key = ('transcription', url)
+        hit = key in cache
+        if not hit:
+            started = time.monotonic()
+            cache[key] = (self._transcribe_audio_uncached(url), turn_trace.elapsed_ms(started))
+        transcription, elapsed_ms = cache[key]
+        turn_trace.record('transcription', elapsed_ms, replayed=hit)
+        return transcription
+
+    def _transcribe_audio_uncached(self, url):
         icp = self.env['ir.config_parameter'].sudo()
         api_key = icp.get_param('ai_agent.openai_api_key', '')
         if not api_key:
@@ -2117,7 +2432,7 @@ class AiAgentConversation(models.Model):
             return None
 
         try:
-            audio_resp = requests.get(url, timeout=30)
+            audio_resp = get_session('download').get(url, timeout=30)
             audio_resp.raise_for_status()
             audio_bytes = audio_resp.content
         except Exception as e:
@@ -2130,7 +2445,7 @@ class AiAgentConversation(models.Model):
         filename = f'audio.{ext}'
 
         try:
-            whisper_resp = requests.post(
+            whisper_resp = get_session().post(
                 'https://api.openai.com/v1/audio/transcriptions',
                 headers={'Authorization': f'Bearer {api_key}'},
                 files={'file': (filename, audio_bytes, f'audio/{ext}')},
@@ -2153,13 +2468,24 @@ class AiAgentConversation(models.Model):
         Returns (flagged: bool, categories: list[str]).
         If no API key or request fails, returns (False, []) — fail open.
         """
+        cache = self._turn_cache()
+        key = ('moderation', text)
+        hit = key in cache
+        if not hit:
+            started = time.monotonic()
+            cache[key] = (self._check_moderation_uncached(text), turn_trace.elapsed_ms(started))
+        verdict, elapsed_ms = cache[key]
+        turn_trace.record('moderation', elapsed_ms, replayed=hit)
+        return verdict
+
+    def _check_moderation_uncached(self, text):
         icp = self.env['ir.config_parameter'].sudo()
         api_key = icp.get_param('ai_agent.openai_api_key', '')
         if not api_key:
             return False, []
 
         try:
-            resp = requests.post(
+            resp = get_session().post(
                 'https://api.openai.com/v1/moderations',
                 headers={'Authorization': f'Bearer {api_key}', 'Content-Type': 'application/json'},
                 json={'input': text, 'model': 'omni-moderation-latest'},
@@ -2396,7 +2722,7 @@ class AiAgentConversation(models.Model):
         self.message_post(body=_(
             "Recordatorio %d/%d enviado por WhatsApp%s."
         ) % (self.reminder_count, self.skill_id.max_reminders or 2,
-             " (DRY RUN)" if dry_run else ""))
+             " (DRY RUN)" if self._is_dry_run() else ""))
 
     def action_resolve_via_email(self, email_body_preview=''):
         """Resolve conversation because customer replied to verification email.
@@ -2677,6 +3003,10 @@ class AiAgentConversation(models.Model):
         # Phase-2 except handler so a single failed turn never leaves a fragment.
         newly_created_ids = set()
 
+        # Dedup: resolve every polled ID against the inbound ledger at once
+        seen_ids = self.env['ai.agent.inbound.ledger']._seen(
+            'massiva', [msg.get('id') for msg in messages])
+
         for msg in messages:
             # API uses 'recipient' for the other party's phone, 'phone' from webhook
             raw_phone = msg.get('recipient') or msg.get('phone', '')
@@ -2711,9 +3041,8 @@ class AiAgentConversation(models.Model):
 
             # Dedup check FIRST — if this message was already processed, skip
             # entirely before doing any conversation lookup or creation.
-            if self.env['ai.agent.message'].search([
-                ('whatsapp_message_id', '=', wa_id),
-            ], limit=1):
+            # Messages without an ID cannot be deduplicated: never processed.
+            if not wa_id or str(wa_id) in seen_ids:
                 continue
 
             # Find active conversation for this phone
@@ -2752,62 +3081,106 @@ class AiAgentConversation(models.Model):
                 'attachment': attachment if attachment else None,
             })
 
-        # Phase 2: Process each conversation batch (isolated per conversation)
+        # Phase 2: Process each conversation batch (isolated per conversation).
+        # LLM round-trips dominate a poll cycle, so they are pipelined:
+        #   2a. run every turn in deferred mode — turns that need no LLM call
+        #       (silenced, moderated, identity ring) complete right here; the
+        #       others stop at the LLM call and roll back, leaving a request
+        #   2b. run all collected requests concurrently on the LLM pool
+        #   2c. replay the deferred turns serially, each in its own savepoint,
+        #       with its prefetched response (same code path as a live call);
+        #       transcription, moderation, skill context/prompt and PDF
+        #       rendering come from turn_cache instead of being redone
+        turn_cache = {}
+        deferred = {}
         for conv_id, data in conv_groups.items():
-            conv = data['conversation']
-            items = data['items']
+            conv = data['conversation'].with_context(
+                ai_agent_defer_generation=True, ai_agent_turn_cache=turn_cache)
             try:
-                with self.env.cr.savepoint():
-                    if len(items) == 1:
-                        item = items[0]
-                        conv.action_process_reply(
-                            item['body'], wa_message_id=item['wa_id'],
-                            attachment_url=item.get('attachment'),
-                        )
-                    else:
-                        combined = '\n'.join(item['body'] for item in items if item['body'])
-                        _logger.info(
-                            "Conversation %d: batching %d messages into single interaction",
-                            conv_id, len(items))
-                        first_att = items[0].get('attachment')
-                        extra_atts = [{'url': i['attachment'], 'wa_id': i['wa_id']}
-                                      for i in items[1:] if i.get('attachment')]
-                        extra_ids = [i['wa_id'] for i in items[1:] if not i.get('attachment')]
-                        conv.action_process_reply(
-                            combined,
-                            wa_message_id=items[0]['wa_id'],
-                            extra_wa_ids=extra_ids or None,
-                            attachment_url=first_att,
-                            extra_attachments=extra_atts or None,
-                        )
+                self._process_poll_group(conv, data['items'], newly_created_ids)
+            except _DeferredGeneration as pending:
+                deferred[conv_id] = pending.request
+
+        if deferred:
+            try:
+                results = self.env['ai.agent.claude.service'].generate_responses(deferred)
             except Exception as e:
-                _logger.error(
-                    "Error processing conversation %d (%s): %s",
-                    conv_id, conv.partner_id.name, e)
-                # The Phase-2 savepoint rolled back the message log, but the
-                # conversation row (created in Phase 1, in the main transaction)
-                # survives. If it was created THIS run and still has no messages,
-                # it's an empty orphan — remove it so the next poll cycle starts
-                # clean and the customer's next message opens a fresh, coherent
-                # conversation instead of resuming an empty fragment.
-                if conv_id in newly_created_ids:
-                    try:
-                        orphan = self.sudo().browse(conv_id)
-                        if orphan.exists() and not orphan.agent_message_ids:
-                            orphan.unlink()
-                            _logger.info(
-                                "Removed empty orphaned conversation %d after Phase-2 failure",
-                                conv_id)
-                    except Exception as cleanup_err:
-                        _logger.warning(
-                            "Could not clean up orphaned conversation %d: %s",
-                            conv_id, cleanup_err)
+                # Config errors (e.g. missing key): the replay calls live and
+                # surfaces the error per conversation, as before.
+                _logger.error("LLM pool failed, replaying turns with live calls: %s", e)
+                results = {}
+            prefetched = {
+                conv_id: {'request': deferred[conv_id], 'result': result}
+                for conv_id, result in results.items()
+            }
+            for conv_id in deferred:
+                conv = conv_groups[conv_id]['conversation'].with_context(
+                    ai_agent_prefetched=prefetched, ai_agent_turn_cache=turn_cache)
+                self._process_poll_group(conv, conv_groups[conv_id]['items'], newly_created_ids)
 
         # Sweep: catch orphaned empties from paths the per-conv handler can't
         # reach (worker OOM/kill mid-run, a future code path that throws before
         # the first message is logged). Runs under the same advisory lock.
         self._sweep_empty_conversations()
 
+    @api.model
+    def _process_poll_group(self, conv, items, newly_created_ids):
+        """Process one conversation's batch of polled messages in a savepoint.
+
+        _DeferredGeneration propagates to the caller (after the savepoint
+        rolled the turn back); any other error is logged, and a conversation
+        created this run that is left without messages is removed.
+        """
+        conv_id = conv.id
+        try:
+            with self.env.cr.savepoint():
+                if len(items) == 1:
+                    item = items[0]
+                    conv.action_process_reply(
+                        item['body'], wa_message_id=item['wa_id'],
+                        attachment_url=item.get('attachment'),
+                    )
+                else:
+                    combined = '\n'.join(item['body'] for item in items if item['body'])
+                    _logger.info(
+                        "Conversation %d: batching %d messages into single interaction",
+                        conv_id, len(items))
+                    first_att = items[0].get('attachment')
+                    extra_atts = [{'url': i['attachment'], 'wa_id': i['wa_id']}
+                                  for i in items[1:] if i.get('attachment')]
+                    extra_ids = [i['wa_id'] for i in items[1:] if not i.get('attachment')]
+                    conv.action_process_reply(
+                        combined,
+                        wa_message_id=items[0]['wa_id'],
+                        extra_wa_ids=extra_ids or None,
+                        attachment_url=first_att,
+                        extra_attachments=extra_atts or None,
+                    )
+        except _DeferredGeneration:
+            raise
+        except Exception as e:
+            _logger.error(
+                "Error processing conversation %d (%s): %s",
+                conv_id, conv.partner_id.name, e)
+            # The Phase-2 savepoint rolled back the message log, but the
+            # conversation row (created in Phase 1, in the main transaction)
+            # survives. If it was created THIS run and still has no messages,
+            # it's an empty orphan — remove it so the next poll cycle starts
+            # clean and the customer's next message opens a fresh, coherent
+            # conversation instead of resuming an empty fragment.
+            if conv_id in newly_created_ids:
+                try:
+                    orphan = self.sudo().browse(conv_id)
+                    if orphan.exists() and not orphan.agent_message_ids:
+                        orphan.unlink()
+                        _logger.info(
+                            "Removed empty orphaned conversation %d after Phase-2 failure",
+                            conv_id)
+                except Exception as cleanup_err:
+                    _logger.warning(
+                        "Could not clean up orphaned conversation %d: %s",
+                        conv_id, cleanup_err)
+
     def _sweep_empty_conversations(self):
         """Delete orphaned empty general_inquiry conversations.
 
@@ -2843,6 +3216,10 @@ class AiAgentConversation(models.Model):
     def _cron_check_timeouts(self):
         """Cron: check waiting conversations for reminders or timeout.
 
+        Only conversations whose indexed next_action_date has passed are
+        loaded; they are handled in chunks of _TIMEOUT_SWEEP_CHUNK with a
+        commit after each chunk.
+
         Logic per conversation:
         1. If skill.send_reminders is False → close silently after one interval (no WA).
         2. If currently in proactive quiet hours (20:30–07:30 VET) → defer reminder
@@ -2853,88 +3230,149 @@ class AiAgentConversation(models.Model):
         if not self._is_active_environment():
             return
 
-        from datetime import timedelta
         within_schedule = self._is_within_schedule()
         in_quiet = self._in_proactive_quiet_hours()
-        conversations = self.search([('state', '=', 'waiting')])
-
         now = fields.Datetime.now()
-        for conv in conversations:
-            skill = conv.skill_id
-            # Skip reminders/timeouts outside schedule for skills that respect it
-            if skill.respect_schedule and not within_schedule:
-                continue
-            interval_hours = skill.reminder_interval_hours or 24
-            max_reminders = skill.max_reminders if skill.max_reminders >= 0 else 2
-
-            if not conv.last_message_date:
-                continue
+        due_ids = self.search([
+            ('state', '=', 'waiting'),
+            ('next_action_date', '<', now),
+        ], order='next_action_date').ids
+        if not due_ids:
+            return
+        _logger.info("Timeout cron: %d conversation(s) due", len(due_ids))
 
-            if conv.silent:
-                continue
+        for start in range(0, len(due_ids), _TIMEOUT_SWEEP_CHUNK):
+            chunk = self.browse(due_ids[start:start + _TIMEOUT_SWEEP_CHUNK])
+            for conv in chunk:
+                conv._process_timeout(now, within_schedule, in_quiet)
+            self.env.cr.commit()
 
-            deadline = conv.last_message_date + timedelta(hours=interval_hours)
-            if now <= deadline:
-                continue
+    def _process_timeout(self, now, within_schedule, in_quiet):
+        """Timeout sweep step: send the due reminder or time the conversation out."""
+        self.ensure_one()
+        # Re-check: the conversation may have moved on since the sweep selected it
+        if self.state != 'waiting' or not self.next_action_date or self.next_action_date >= now:
+            return
+        skill = self.skill_id
+        # Skip reminders/timeouts outside schedule for skills that respect it
+        if skill.respect_schedule and not within_schedule:
+            return
+        max_reminders = skill.max_reminders if skill.max_reminders >= 0 else 2
 
-            try:
-                with self.env.cr.savepoint():
-                    if not skill.send_reminders:
-                        # Silent mode: no reminder WA — close after first interval
-                        conv.action_timeout()
-                    elif in_quiet and conv.reminder_count < max_reminders:
-                        # Proactive quiet hours: defer WA reminder, check again later
-                        _logger.info(
-                            "Timeout cron: quiet hours — deferring reminder for conv %d (%s)",
-                            conv.id, conv.partner_id.name or conv.phone)
-                    elif conv.reminder_count < max_reminders:
-                        conv._send_reminder()
-                    else:
-                        conv.action_timeout()
-            except Exception as e:
-                _logger.error(
-                    "Timeout cron: error processing conversation %d (%s skill): %s",
-                    conv.id, conv.skill_id.code, e)
+        try:
+            with self.env.cr.savepoint():
+                if not skill.send_reminders:
+                    # Silent mode: no reminder WA — close after first interval
+                    self.action_timeout()
+                elif in_quiet and self.reminder_count < max_reminders:
+                    # Proactive quiet hours: defer WA reminder, check again later
+                    _logger.info(
+                        "Timeout cron: quiet hours — deferring reminder for conv %d (%s)",
+                        self.id, self.partner_id.name or self.phone)
+                elif self.reminder_count < max_reminders:
+                    self._send_reminder()
+                else:
+                    self.action_timeout()
+        except Exception as e:
+            _logger.error(
+                "Timeout cron: error processing conversation %d (%s skill): %s",
+                self.id, skill.code, e)
 
     @api.model
-    def _cron_archive_attachments(self):
-        """Cron: download image/document attachments to ir.attachment before URL expiry."""
-        if not self._is_active_environment():
-            return
-
-        import base64
+    def _archive_backlog_domain(self):
+        """Messages whose provider media URL still has to be archived."""
         from datetime import timedelta
         now = fields.Datetime.now()
-        min_age = now - timedelta(minutes=10)
-        max_age = now - timedelta(hours=72)
-
-        messages = self.env['ai.agent.message'].search([
+        return [
             ('attachment_url', '!=', False),
             ('attachment_id', '=', False),
             ('attachment_type', 'in', ('image', 'document')),
-            ('timestamp', '<=', min_age),
-            ('timestamp', '>=', max_age),
-        ], limit=20)
+            ('timestamp', '<=', now - timedelta(minutes=10)),
+            ('timestamp', '>=', now - timedelta(hours=_ARCHIVE_MAX_AGE_HOURS)),
+            ('archive_attempts', '<', _ARCHIVE_MAX_ATTEMPTS),
+            '|', ('archive_retry_after', '=', False), ('archive_retry_after', '<=', now),
+        ]
+
+    @api.model
+    def _archive_failed(self, msg, error):
+        """Count a failed archive attempt and back the message off."""
+        from datetime import timedelta
+        attempts = msg.archive_attempts + 1
+        _logger.warning("Failed to archive attachment for msg %d (attempt %d/%d): %s",
+                        msg.id, attempts, _ARCHIVE_MAX_ATTEMPTS, error)
+        msg.write({
+            'archive_attempts': attempts,
+            'archive_retry_after': fields.Datetime.now() + timedelta(
+                minutes=_ARCHIVE_RETRY_MINUTES * 2 ** (attempts - 1)),
+        })
 
+    @api.model
+    def _cron_archive_attachments(self):
+        """Cron: archive image/document attachments to ir.attachment before URL expiry.
+
+        Oldest messages (closest to URL expiry) first; a failed message is
+        backed off (see _archive_failed) so it cannot hold the head of the
+        batch, and dropped after _ARCHIVE_MAX_ATTEMPTS. Downloads run on a
+        bounded thread pool (ai_agent.archive_max_workers, default 4) and are
+        streamed to temp files, hashed on the way; a payload whose checksum is
+        already archived reuses that attachment, otherwise the bytes go to the
+        filestore as raw (no base64 round-trip). Batch size:
+        ai_agent.archive_batch_size (default 100); while a backlog remains the
+        cron re-triggers itself.
+        """
+        if not self._is_active_environment():
+            return
+
+        ICP = self.env['ir.config_parameter'].sudo()
+        batch_size = int(ICP.get_param('ai_agent.archive_batch_size', '100') or 100)
+        max_workers = max(1, int(ICP.get_param('ai_agent.archive_max_workers', '4') or 4))
+
+        Message = self.env['ai.agent.message']
+        domain = self._archive_backlog_domain()
+        backlog = Message.search_count(domain)
+        if not backlog:
+            return
+        messages = Message.search(domain, order='timestamp asc, id asc', limit=batch_size)
+        _logger.info("Attachment archive: %d pending, archiving %d", backlog, len(messages))
+
+        jobs = {msg.id: msg.attachment_url for msg in messages}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(jobs)),
+                                thread_name_prefix='ai_agent_archive') as pool:
+            futures = {
+                msg_id: pool.submit(_stream_download, url)
+                for msg_id, url in jobs.items()
+            }
+
+        archived = failed = 0
         for msg in messages:
             try:
-                resp = requests.get(msg.attachment_url, timeout=30)
-                resp.raise_for_status()
-                content_type = resp.headers.get('Content-Type', 'image/jpeg')
-                filename = msg.attachment_url.split('/')[-1].split('?')[0] or 'attachment.jpg'
-                attachment = self.env['ir.attachment'].sudo().create({
-                    'name': 'WA_%d_%s' % (msg.whatsapp_message_id, filename),
-                    'type': 'binary',
-                    'datas': base64.b64encode(resp.content),
-                    'mimetype': content_type,
-                    'res_model': 'ai.agent.message',
-                    'res_id': msg.id,
-                })
-                msg.write({'attachment_id': attachment.id})
+                tmp_path, checksum, size, content_type = futures[msg.id].result()
+            except Exception as e:
+                self._archive_failed(msg, e)
+                failed += 1
+                continue
+            try:
+                with self.env.cr.savepoint():
+                    attachment = msg._store_archived_file(tmp_path, checksum, content_type)
+                    msg.write({'attachment_id': attachment.id})
+                archived += 1
                 _logger.info("Archived attachment for msg %d: %s (%d bytes)",
-                             msg.id, filename, len(resp.content))
+                             msg.id, attachment.name, size)
             except Exception as e:
-                _logger.warning("Failed to archive attachment for msg %d: %s", msg.id, e)
+                self._archive_failed(msg, e)
+                failed += 1
+            finally:
+                os.unlink(tmp_path)
+
+        # Failed messages are backed off, so they are not part of what remains
+        remaining = backlog - archived - failed
+        _logger.info("Attachment archive: %d archived, %d failed, %d still pending",
+                     archived, failed, remaining)
+        if archived and remaining:
+            cron = self.env.ref('ueipab_ai_agent.ir_cron_archive_attachments',
+                                raise_if_not_found=False)
+            if cron:
+                cron.sudo()._trigger()
 
     @api.model
     def _cron_check_credits(self):
@@ -3093,9 +3531,9 @@ class AiAgentConversation(models.Model):
             return 'skipped'
 
         # Global dedup on wamid — Kapso retries deliveries on non-2xx and
-        # buffered/replayed events must not double-process.
-        if wamid and self.env['ai.agent.message'].search(
-                [('kapso_message_id', '=', wamid)], limit=1):
+        # buffered/replayed events must not double-process. Claimed up front
+        # so a concurrent delivery of the same wamid waits here and skips.
+        if wamid and not self.env['ai.agent.inbound.ledger']._claim('kapso', [wamid]):
             _logger.info("Kapso inbound duplicate skipped: %s", wamid)
             return 'duplicate'
 
@@ -3163,7 +3601,7 @@ class AiAgentConversation(models.Model):
             wa_service = self.env['ai.agent.whatsapp.service']
             config = wa_service._get_config()
             url = config['base_url'].rstrip('/') + '/get/subscription'
-            resp = requests.get(url, params={'secret': config['secret']}, timeout=15)
+            resp = get_session().get(url, params={'secret': config['secret']}, timeout=15)
             resp.raise_for_status()
             data = resp.json().get('data', {})
             usage = data.get('usage', {}).get('wa_send', {})
@@ -3184,18 +3622,11 @@ class AiAgentConversation(models.Model):
         """
         ICP = self.env['ir.config_parameter'].sudo()
         spend_limit = float(ICP.get_param('ai_agent.claude_spend_limit_usd', '4.50'))
-        input_rate = float(ICP.get_param('ai_agent.claude_input_rate', '0.000001'))
-        output_rate = float(ICP.get_param('ai_agent.claude_output_rate', '0.000005'))
 
-        # Aggregate all token usage
-        self.env.cr.execute("""
-            SELECT COALESCE(SUM(ai_input_tokens), 0),
-                   COALESCE(SUM(ai_output_tokens), 0)
-            FROM ai_agent_message
-            WHERE ai_input_tokens > 0 OR ai_output_tokens > 0
-        """)
-        total_in, total_out = self.env.cr.fetchone()
-        spend = (total_in * input_rate) + (total_out * output_rate)
+        # Aggregate all token usage (cached prompt tokens priced separately)
+        usage = self.env['ai.agent.claude.service']._get_usage_totals()
+        total_in, total_out = usage['input_tokens'], usage['output_tokens']
+        spend = usage['spend']
 
         detail = (f"Claude: ${spend:.4f} USD gastados "
                   f"(limite: ${spend_limit:.2f}, "
@@ -1,11 +1,11 @@
 import logging
 import re
 
-import requests
-
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError, ValidationError
 
+from .http_pool import get_session
+
 _logger = logging.getLogger(__name__)
 
 
@@ -36,6 +36,20 @@ class AiAgentDashboard(models.TransientModel):
     claude_total_output_tokens = fields.Integer('Tokens Salida', readonly=True)
     claude_input_rate = fields.Float('Tasa Input ($/token)', digits=(10, 6), default=0.000001)
     claude_output_rate = fields.Float('Tasa Output ($/token)', digits=(10, 6), default=0.000005)
+    claude_total_cache_read_tokens = fields.Integer('Tokens Cache (lectura)', readonly=True)
+    claude_total_cache_write_tokens = fields.Integer('Tokens Cache (escritura)', readonly=True)
+    claude_cache_hit_rate = fields.Float('Cache Hit (%)', readonly=True, digits=(5, 1))
+    claude_avg_latency_ms = fields.Integer('Latencia Promedio (ms)', readonly=True)
+
+    # ── Llamadas HTTP externas (por host) ───────────────────────────
+    http_stat_ids = fields.Many2many(
+        'ai.agent.http.stat', string='Hosts HTTP', compute='_compute_http_stat_ids')
+
+    # ── Latencia por turno (ai.agent.turn.trace, ultimos 7 dias) ────
+    turn_latency_ids = fields.Many2many(
+        'ai.agent.turn.latency.report', string='Latencia por Etapa',
+        compute='_compute_turn_latency_ids')
+    slow_turn_count = fields.Integer('Turnos Lentos (24h)', readonly=True)
 
     # ── Tareas Programadas (Odoo crons) ─────────────────────────────
     cron_poll_active = fields.Boolean('Poll WhatsApp Activo')
@@ -88,6 +102,7 @@ class AiAgentDashboard(models.TransientModel):
     active_conversations_count = fields.Integer('Conversaciones Activas', readonly=True)
     pending_bounce_count = fields.Integer('Bounces Pendientes', readonly=True)
     total_messages_sent = fields.Integer('Mensajes Enviados', readonly=True)
+    archive_backlog_count = fields.Integer('Adjuntos por Archivar', readonly=True)
 
     # ── Pipeline Akdemia ───────────────────────────────────────────
     bounce_pending_count = fields.Integer('Pendiente', readonly=True)
@@ -218,18 +233,7 @@ class AiAgentDashboard(models.TransientModel):
 
         # ── Live stats ──────────────────────────────────────────────
         if 'claude_total_spend' in fields_list or 'claude_total_input_tokens' in fields_list:
-            input_rate = float(ICP.get_param('ai_agent.claude_input_rate', '0.000001'))
-            output_rate = float(ICP.get_param('ai_agent.claude_output_rate', '0.000005'))
-            self.env.cr.execute("""
-                SELECT COALESCE(SUM(ai_input_tokens), 0),
-                       COALESCE(SUM(ai_output_tokens), 0)
-                FROM ai_agent_message
-                WHERE ai_input_tokens > 0 OR ai_output_tokens > 0
-            """)
-            total_in, total_out = self.env.cr.fetchone()
-            res['claude_total_input_tokens'] = total_in
-            res['claude_total_output_tokens'] = total_out
-            res['claude_total_spend'] = (total_in * input_rate) + (total_out * output_rate)
+            res.update(self._claude_usage_vals())
 
         if 'active_conversations_count' in fields_list:
             res['active_conversations_count'] = self.env['ai.agent.conversation'].search_count([
@@ -246,6 +250,18 @@ class AiAgentDashboard(models.TransientModel):
                 ('direction', '=', 'outbound'),
             ])
 
+        if 'slow_turn_count' in fields_list:
+            from datetime import timedelta
+            res['slow_turn_count'] = self.env['ai.agent.turn.trace'].sudo().search_count([
+                ('is_slow', '=', True),
+                ('create_date', '>=', fields.Datetime.now() - timedelta(hours=24)),
+            ])
+
+        if 'archive_backlog_count' in fields_list:
+            Conversation = self.env['ai.agent.conversation']
+            res['archive_backlog_count'] = self.env['ai.agent.message'].search_count(
+                Conversation._archive_backlog_domain())
+
         # ── Bounce log state distribution ──────────────────────────
         BounceLog = self.env['mail.bounce.log']
         if 'bounce_pending_count' in fields_list:
@@ -269,6 +285,35 @@ class AiAgentDashboard(models.TransientModel):
 
         return res
 
+    def _compute_turn_latency_ids(self):
+        rows = self.env['ai.agent.turn.latency.report'].sudo().search([])
+        for rec in self:
+            rec.turn_latency_ids = rows
+
+    def action_view_turn_latency(self):
+        return self.env['ir.actions.act_window']._for_xml_id(
+            'ueipab_ai_agent.ai_agent_turn_latency_report_action')
+
+    def _compute_http_stat_ids(self):
+        HttpStat = self.env['ai.agent.http.stat'].sudo()
+        HttpStat._flush()
+        stats = HttpStat.search([])
+        for rec in self:
+            rec.http_stat_ids = stats
+
+    def _claude_usage_vals(self):
+        """Dashboard values for AI spend, tokens, prompt-cache hits and latency."""
+        usage = self.env['ai.agent.claude.service']._get_usage_totals()
+        return {
+            'claude_total_spend': usage['spend'],
+            'claude_total_input_tokens': usage['input_tokens'],
+            'claude_total_output_tokens': usage['output_tokens'],
+            'claude_total_cache_read_tokens': usage['cache_read_tokens'],
+            'claude_total_cache_write_tokens': usage['cache_write_tokens'],
+            'claude_cache_hit_rate': usage['cache_hit_rate'],
+            'claude_avg_latency_ms': usage['avg_latency_ms'],
+        }
+
     def action_apply(self):
         """Save editable fields back to ir.config_parameter and cron states."""
         self.ensure_one()
@@ -331,7 +376,7 @@ class AiAgentDashboard(models.TransientModel):
             wa_service = self.env['ai.agent.whatsapp.service']
             config = wa_service._get_config()
             url = config['base_url'].rstrip('/') + '/get/subscription'
-            resp = requests.get(url, params={'secret': config['secret']}, timeout=15)
+            resp = get_session().get(url, params={'secret': config['secret']}, timeout=15)
             resp.raise_for_status()
             data = resp.json().get('data', {})
             usage = data.get('usage', {}).get('wa_send', {})
@@ -344,25 +389,14 @@ class AiAgentDashboard(models.TransientModel):
             _logger.error("Dashboard credit check — WhatsApp API error: %s", e)
 
         # ── Claude spend recalculation ──────────────────────────────
-        ICP = self.env['ir.config_parameter'].sudo()
-        input_rate = float(ICP.get_param('ai_agent.claude_input_rate', '0.000001'))
-        output_rate = float(ICP.get_param('ai_agent.claude_output_rate', '0.000005'))
-        self.env.cr.execute("""
-            SELECT COALESCE(SUM(ai_input_tokens), 0),
-                   COALESCE(SUM(ai_output_tokens), 0)
-            FROM ai_agent_message
-            WHERE ai_input_tokens > 0 OR ai_output_tokens > 0
-        """)
-        total_in, total_out = self.env.cr.fetchone()
-        spend = (total_in * input_rate) + (total_out * output_rate)
-
-        self.write({
-            'wa_remaining_sends': wa_remaining,
-            'wa_total_sends': wa_total,
-            'claude_total_spend': spend,
-            'claude_total_input_tokens': total_in,
-            'claude_total_output_tokens': total_out,
-        })
+        usage_vals = self._claude_usage_vals()
+        spend = usage_vals['claude_total_spend']
+
+        self.write(dict(
+            usage_vals,
+            wa_remaining_sends=wa_remaining,
+            wa_total_sends=wa_total,
+        ))
 
         if wa_error:
             msg = _("Error al consultar WhatsApp API. Claude: $%.4f USD") % spend
@@ -2,11 +2,11 @@ import json
 import logging
 import re
 
-import requests
-
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 
+from .http_pool import get_session
+
 _logger = logging.getLogger(__name__)
 
 
@@ -116,7 +116,7 @@ class AiAgentFreescoutTask(models.Model):
         if not api_key or not image_url:
             return None
         try:
-            resp = requests.post(
+            resp = get_session().post(
                 'https://api.openai.com/v1/chat/completions',
                 headers={'Authorization': f'Bearer {api_key}', 'Content-Type': 'application/json'},
                 json={
@@ -219,7 +219,7 @@ class AiAgentFreescoutTask(models.Model):
 
         # --- Fetch conversation ---
         try:
-            r = requests.get(f"{api_url}/conversations/{self.fs_conv_id}",
+            r = get_session().get(f"{api_url}/conversations/{self.fs_conv_id}",
                              headers=fs_headers, timeout=15)
             r.raise_for_status()
             conv = r.json()
@@ -247,8 +247,9 @@ class AiAgentFreescoutTask(models.Model):
                 ['id', 'name', 'email', 'vat', 'child_ids'], limit=1)
             partner = rows[0] if rows else None
         if not partner and customer_email:
+            matches = self.env['mail.email.index'].sudo()._match(customer_email)[0]
             rows = self.env['res.partner'].sudo().search_read(
-                [('email', 'ilike', customer_email), ('customer_rank', '>', 0)],
+                [('id', 'in', matches.ids), ('customer_rank', '>', 0)],
                 ['id', 'name', 'email', 'vat', 'child_ids'], limit=1)
             partner = rows[0] if rows else None
 
@@ -326,10 +327,10 @@ class AiAgentFreescoutTask(models.Model):
 
     def _post_fs(self, api_url, fs_headers, note, new_subject):
         try:
-            requests.post(f"{api_url}/conversations/{self.fs_conv_id}/threads",
+            get_session().post(f"{api_url}/conversations/{self.fs_conv_id}/threads",
                           json={'type': 'note', 'text': note, 'user': 1},
                           headers=fs_headers, timeout=15).raise_for_status()
-            requests.put(f"{api_url}/conversations/{self.fs_conv_id}",
+            get_session().put(f"{api_url}/conversations/{self.fs_conv_id}",
                          json={'subject': new_subject, 'byUser': 1},
                          headers=fs_headers, timeout=15).raise_for_status()
         except Exception as e:
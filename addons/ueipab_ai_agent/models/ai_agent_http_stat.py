@@ -0,0 +1,43 @@
+from odoo import models, fields, api
+
+from . import http_pool
+
+
+class AiAgentHttpStat(models.Model):
+    """Per-host counters of the agent's outbound HTTP calls.
+
+    Rows are upserted by http_pool.flush_stats() from every worker; the
+    dashboard lists them.
+    """
+    _name = 'ai.agent.http.stat'
+    _description = 'AI Agent HTTP Host Stats'
+    _order = 'call_count desc'
+    _rec_name = 'host'
+
+    host = fields.Char('Host', required=True, readonly=True)
+    call_count = fields.Integer('Llamadas', readonly=True)
+    error_count = fields.Integer('Errores', readonly=True)
+    total_ms = fields.Float('Latencia total (ms)', readonly=True)
+    max_ms = fields.Integer('Latencia max (ms)', readonly=True)
+    avg_ms = fields.Integer('Latencia prom. (ms)', compute='_compute_rates')
+    error_rate = fields.Float('% Errores', compute='_compute_rates', digits=(5, 1))
+    last_error = fields.Char('Ultimo error', readonly=True)
+    last_call = fields.Datetime('Ultima llamada', readonly=True)
+
+    _sql_constraints = [
+        ('host_unique', 'UNIQUE(host)', 'Host stats must be unique per host.'),
+    ]
+
+    @api.depends('call_count', 'error_count', 'total_ms')
+    def _compute_rates(self):
+        for rec in self:
+            rec.avg_ms = int(rec.total_ms / rec.call_count) if rec.call_count else 0
+            rec.error_rate = 100.0 * rec.error_count / rec.call_count if rec.call_count else 0.0
+
+    @api.model
+    def _flush(self):
+        """Flush this process's pending counters before reading the table."""
+        http_pool.flush_stats(self.env.cr.dbname)
+
+    def action_reset(self):
+        self.unlink()
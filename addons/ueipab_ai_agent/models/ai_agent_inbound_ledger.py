@@ -0,0 +1,97 @@
+from odoo import models, fields, api
+from odoo.tools import sql
+
+
+class AiAgentInboundLedger(models.Model):
+    """Provider message IDs already taken in, for inbound dedup.
+
+    One row per (provider, external_id) under a unique index:
+      - the poll cron resolves a whole batch of polled IDs in one query
+        (_seen) instead of one ai.agent.message search per message
+      - action_process_reply() records every ID it consumes (_claim),
+        including the extra IDs of batched messages, which used to be
+        logged as empty placeholder messages
+      - webhooks claim atomically (INSERT ... ON CONFLICT DO NOTHING), so two
+        workers racing the same delivery cannot both process it
+    """
+    _name = 'ai.agent.inbound.ledger'
+    _description = 'AI Agent Inbound Message Ledger'
+    _order = 'id desc'
+    _rec_name = 'external_id'
+    _log_access = False
+
+    provider = fields.Selection([
+        ('massiva', 'MassivaMóvil'),
+        ('kapso', 'Kapso'),
+        ('telegram', 'Telegram'),
+    ], string='Proveedor', required=True)
+    external_id = fields.Char('ID Externo', required=True)
+    conversation_id = fields.Many2one(
+        'ai.agent.conversation', string='Conversacion', ondelete='set null')
+    received_at = fields.Datetime('Recibido', default=fields.Datetime.now)
+
+    _sql_constraints = [
+        ('provider_external_id_uniq', 'unique(provider, external_id)',
+         'Este ID de mensaje ya fue registrado para el proveedor.'),
+    ]
+
+    def init(self):
+        # Inbound IDs used to live only on ai.agent.message: backfill them,
+        # then drop the empty dedup-only placeholders the ledger replaces.
+        # One-time migration: once the ledger has rows, updates skip it.
+        if not sql.table_exists(self.env.cr, 'ai_agent_message'):
+            return
+        self.env.cr.execute("SELECT 1 FROM ai_agent_inbound_ledger LIMIT 1")
+        if self.env.cr.fetchone():
+            return
+        self.env.cr.execute("""
+            INSERT INTO ai_agent_inbound_ledger
+                   (provider, external_id, conversation_id, received_at)
+            SELECT 'massiva', whatsapp_message_id::varchar, conversation_id, timestamp
+              FROM ai_agent_message
+             WHERE direction = 'inbound' AND whatsapp_message_id > 0
+             UNION ALL
+            SELECT 'kapso', kapso_message_id, conversation_id, timestamp
+              FROM ai_agent_message
+             WHERE direction = 'inbound' AND kapso_message_id IS NOT NULL
+            ON CONFLICT (provider, external_id) DO NOTHING
+        """)
+        self.env.cr.execute("""
+            DELETE FROM ai_agent_message
+             WHERE direction = 'inbound'
+               AND COALESCE(body, '') = ''
+               AND attachment_url IS NULL
+               AND whatsapp_message_id > 0
+        """)
+
+    @api.model
+    def _seen(self, provider, external_ids):
+        """Subset of external_ids already in the ledger (one query)."""
+        ids = list({str(x) for x in external_ids if x})
+        if not ids:
+            return set()
+        self.env.cr.execute("""
+            SELECT external_id FROM ai_agent_inbound_ledger
+             WHERE provider = %s AND external_id = ANY(%s)
+        """, (provider, ids))
+        return {row[0] for row in self.env.cr.fetchall()}
+
+    @api.model
+    def _claim(self, provider, external_ids, conversation_id=None):
+        """Record IDs as taken in; returns the subset newly claimed by this call.
+
+        An ID already claimed (or being claimed by a concurrent, still open
+        transaction, which this waits for) is left out of the result.
+        """
+        ids = list(dict.fromkeys(str(x) for x in external_ids if x))
+        if not ids:
+            return set()
+        self.env.cr.execute("""
+            INSERT INTO ai_agent_inbound_ledger
+                   (provider, external_id, conversation_id, received_at)
+            SELECT %s, external_id, %s, now() AT TIME ZONE 'UTC'
+              FROM unnest(%s::varchar[]) AS external_id
+            ON CONFLICT (provider, external_id) DO NOTHING
+         RETURNING external_id
+        """, (provider, conversation_id or None, ids))
+        return {row[0] for row in self.env.cr.fetchall()}
@@ -35,6 +35,17 @@ class AiAgentMessage(models.Model):
     # AI metadata (for outbound messages)
     ai_input_tokens = fields.Integer('Tokens Entrada')
     ai_output_tokens = fields.Integer('Tokens Salida')
+    ai_cache_read_tokens = fields.Integer(
+        'Tokens Cache (lectura)',
+        help='Tokens del prompt servidos desde la cache del proveedor (no incluidos en Tokens Entrada)')
+    ai_cache_write_tokens = fields.Integer(
+        'Tokens Cache (escritura)',
+        help='Tokens del prompt escritos en la cache del proveedor (no incluidos en Tokens Entrada)')
+    ai_latency_ms = fields.Integer('Latencia IA (ms)')
+    ai_provider = fields.Selection([
+        ('claude', 'Claude'),
+        ('openai', 'OpenAI'),
+    ], string='Proveedor IA')
 
     # Attachment support
     attachment_url = fields.Char(
@@ -50,3 +61,42 @@ class AiAgentMessage(models.Model):
         'ir.attachment', string='Archivo Archivado',
         ondelete='set null',
         help='Copia local del adjunto descargado de MassivaMóvil')
+    vision_attachment_id = fields.Many2one(
+        'ir.attachment', string='Pagina PDF (vision)',
+        ondelete='set null',
+        help='Primera pagina del PDF renderizada como PNG para la IA (se genera una sola vez)')
+    archive_attempts = fields.Integer(
+        'Intentos de Archivo', default=0,
+        help='Descargas fallidas del adjunto por el cron de archivo')
+    archive_retry_after = fields.Datetime(
+        'Reintentar Archivo Desde',
+        help='El cron de archivo no reintenta este adjunto antes de esta fecha')
+
+    def _store_archived_file(self, tmp_path, checksum, content_type):
+        """Attachment for a media file downloaded by the archiver cron.
+
+        The payload was streamed to tmp_path and hashed (sha1, same as the
+        filestore checksum). Identical media already archived for another
+        message is reused instead of stored again. The file is read into
+        memory whole for the create; the cron stores one file at a time, so
+        _stream_download's _ARCHIVE_MAX_BYTES cap (25 MB) bounds that memory.
+        """
+        self.ensure_one()
+        IrAttachment = self.env['ir.attachment'].sudo()
+        existing = IrAttachment.search([
+            ('res_model', '=', self._name),
+            ('checksum', '=', checksum),
+        ], limit=1)
+        if existing:
+            return existing
+        filename = self.attachment_url.split('/')[-1].split('?')[0] or 'attachment.jpg'
+        with open(tmp_path, 'rb') as f:
+            raw = f.read()
+        return IrAttachment.create({
+            'name': 'WA_%d_%s' % (self.whatsapp_message_id, filename),
+            'type': 'binary',
+            'raw': raw,
+            'mimetype': content_type,
+            'res_model': self._name,
+            'res_id': self.id,
+        })
@@ -0,0 +1,223 @@
+import logging
+import time
+from datetime import timedelta
+
+from odoo import models, fields, api
+
+_logger = logging.getLogger(__name__)
+
+# pg advisory lock key serializing the dispatcher across all workers
+_DISPATCH_LOCK_KEY = 0x5741_4F42  # 'WAOB'
+
+# Max seconds a dispatcher run keeps sending before handing over to the
+# next cron trigger (the cron itself runs every minute)
+_DISPATCH_BUDGET = 50
+
+# Retry backoff in minutes for failed sends (attempt 1, 2, 3...)
+_RETRY_BACKOFF = [1, 5, 15]
+
+
+class AiAgentOutboundMessage(models.Model):
+    """Persistent outbound WhatsApp queue.
+
+    Callers enqueue through ai.agent.whatsapp.service.enqueue_message() /
+    enqueue_media() and return immediately. The dispatcher cron sends the
+    queue in order at the provider's anti-spam rate:
+
+      - the rate is coordinated across all Odoo workers through the
+        database: the last send time is max(sent_at) of this table, and a
+        pg advisory lock lets a single worker dispatch at a time
+      - each send is its own short transaction (lock, send, commit); the
+        dispatcher never sleeps while holding a transaction, and when the
+        next slot is further away than its budget it re-triggers itself at
+        that time instead of waiting
+      - failed sends are retried with backoff, then marked failed
+    """
+    _name = 'ai.agent.outbound.message'
+    _description = 'AI Agent Outbound WhatsApp Queue'
+    _order = 'id desc'
+    _rec_name = 'phone'
+
+    phone = fields.Char('Telefono', required=True, index=True)
+    message_type = fields.Selection([
+        ('text', 'Texto'),
+        ('media', 'Imagen'),
+    ], string='Tipo', default='text', required=True)
+    body = fields.Text('Mensaje')
+    media_url = fields.Char('URL Imagen')
+    state = fields.Selection([
+        ('queued', 'En cola'),
+        ('sent', 'Enviado'),
+        ('failed', 'Fallido'),
+    ], string='Estado', default='queued', required=True, index=True)
+    conversation_id = fields.Many2one(
+        'ai.agent.conversation', string='Conversacion',
+        ondelete='set null', index=True)
+    provider = fields.Char('Proveedor', readonly=True)
+    attempts = fields.Integer('Intentos', default=0, readonly=True)
+    next_attempt_at = fields.Datetime('Proximo intento', readonly=True)
+    sent_at = fields.Datetime('Enviado el', readonly=True, index=True)
+    whatsapp_message_id = fields.Integer('MassivaMóvil ID', readonly=True)
+    kapso_message_id = fields.Char('Kapso wamid', readonly=True)
+    error = fields.Text('Error', readonly=True)
+
+    # ── Enqueue ──────────────────────────────────────────────────────────
+
+    @api.model
+    def _enqueue(self, vals):
+        """Create a queued message and wake up the dispatcher."""
+        message = self.sudo().create(vals)
+        self._trigger_dispatch()
+        return message
+
+    @api.model
+    def _trigger_dispatch(self, delay=0):
+        cron = self.env.ref(
+            'ueipab_ai_agent.ir_cron_dispatch_outbound_whatsapp',
+            raise_if_not_found=False)
+        if cron:
+            cron.sudo()._trigger(at=fields.Datetime.now() + timedelta(seconds=delay))
+
+    def action_retry(self):
+        """Put failed messages back in the queue."""
+        self.filtered(lambda m: m.state == 'failed').write({
+            'state': 'queued',
+            'attempts': 0,
+            'next_attempt_at': False,
+            'error': False,
+        })
+        self._trigger_dispatch()
+
+    # ── Dispatcher ───────────────────────────────────────────────────────
+
+    @api.model
+    def _cron_dispatch(self):
+        """Cron: send queued messages at the anti-spam rate.
+
+        One message per transaction. Returns when the queue is empty, when
+        another worker holds the dispatch lock, or when the next send slot
+        falls outside this run's budget (re-triggering the cron for it).
+        """
+        wa_service = self.env['ai.agent.whatsapp.service']
+        cr = self.env.cr
+        deadline = time.monotonic() + _DISPATCH_BUDGET
+
+        while True:
+            cr.execute("SELECT pg_try_advisory_xact_lock(%s)", (_DISPATCH_LOCK_KEY,))
+            if not cr.fetchone()[0]:
+                _logger.debug("WA outbound: another worker is dispatching")
+                return
+
+            # Next message due, oldest first
+            cr.execute("""
+                SELECT id FROM ai_agent_outbound_message
+                 WHERE state = 'queued'
+                   AND (next_attempt_at IS NULL
+                        OR next_attempt_at <= (now() AT TIME ZONE 'UTC'))
+              ORDER BY id
+                 LIMIT 1
+                   FOR UPDATE SKIP LOCKED
+            """)
+            row = cr.fetchone()
+            if not row:
+                cr.commit()
+                self._schedule_next_retry()
+                return
+
+            # Anti-spam slot, shared by every worker through the table
+            interval = wa_service._get_dispatch_interval()
+            cr.execute("""
+                SELECT EXTRACT(EPOCH FROM ((now() AT TIME ZONE 'UTC') - MAX(sent_at)))
+                  FROM ai_agent_outbound_message
+                 WHERE state = 'sent'
+            """)
+            elapsed = cr.fetchone()[0]
+            wait = interval - float(elapsed) if elapsed is not None else 0.0
+            if wait > 0:
+                cr.commit()  # release the lock before waiting
+                if time.monotonic() + wait > deadline:
+                    self._trigger_dispatch(delay=int(wait) + 1)
+                    return
+                time.sleep(wait)
+                continue
+
+            self.browse(row[0])._send_now()
+            cr.commit()
+            if time.monotonic() > deadline:
+                self._trigger_dispatch()
+                return
+
+    @api.model
+    def _schedule_next_retry(self):
+        """Wake the dispatcher for the earliest pending retry, if any."""
+        pending = self.search([
+            ('state', '=', 'queued'),
+            ('next_attempt_at', '!=', False),
+        ], order='next_attempt_at asc', limit=1)
+        if pending:
+            delay = (pending.next_attempt_at - fields.Datetime.now()).total_seconds()
+            self._trigger_dispatch(delay=max(int(delay), 0) + 1)
+
+    def _send_now(self):
+        """Send one queued message through the active provider."""
+        self.ensure_one()
+        wa_service = self.env['ai.agent.whatsapp.service']
+        provider = wa_service._provider()
+        try:
+            with self.env.cr.savepoint():
+                if self.message_type == 'media':
+                    result = wa_service.send_media(self.phone, self.media_url, caption=self.body or '')
+                else:
+                    result = wa_service.send_message(self.phone, self.body or '')
+        except Exception as e:
+            attempts = self.attempts + 1
+            if attempts > len(_RETRY_BACKOFF):
+                _logger.error("WA outbound %d to %s failed permanently: %s", self.id, self.phone, e)
+                self.write({'state': 'failed', 'attempts': attempts,
+                            'provider': provider, 'error': str(e)})
+            else:
+                _logger.warning("WA outbound %d to %s failed (attempt %d): %s",
+                                self.id, self.phone, attempts, e)
+                self.write({
+                    'attempts': attempts,
+                    'provider': provider,
+                    'error': str(e),
+                    'next_attempt_at': fields.Datetime.now() + timedelta(
+                        minutes=_RETRY_BACKOFF[attempts - 1]),
+                })
+            return False
+
+        self.write({
+            'state': 'sent',
+            'attempts': self.attempts + 1,
+            'provider': provider,
+            'sent_at': fields.Datetime.now(),
+            'whatsapp_message_id': result.get('message_id') or 0,
+            'kapso_message_id': result.get('wamid') or False,
+            'error': False,
+        })
+        self._link_agent_message()
+        return True
+
+    def _link_agent_message(self):
+        """Stamp the provider ID on the conversation's outbound message.
+
+        Conversations log their ai.agent.message right after enqueueing, so
+        the matching record is the latest outbound one with the same body
+        and no provider ID yet.
+        """
+        self.ensure_one()
+        if not self.conversation_id or not (self.whatsapp_message_id or self.kapso_message_id):
+            return
+        message = self.env['ai.agent.message'].sudo().search([
+            ('conversation_id', '=', self.conversation_id.id),
+            ('direction', '=', 'outbound'),
+            ('body', '=', self.body),
+            ('whatsapp_message_id', '=', 0),
+            ('kapso_message_id', '=', False),
+        ], order='id desc', limit=1)
+        if message:
+            message.write({
+                'whatsapp_message_id': self.whatsapp_message_id,
+                'kapso_message_id': self.kapso_message_id or False,
+            })
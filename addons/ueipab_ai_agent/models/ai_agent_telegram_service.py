@@ -1,9 +1,9 @@
 import logging
 
-import requests
-
 from odoo import models
 
+from .http_pool import get_session
+
 _logger = logging.getLogger(__name__)
 
 _TG_API = "https://api.telegram.org/bot{token}/{method}"
@@ -38,7 +38,7 @@ class AiAgentTelegramService(models.AbstractModel):
             return {}
         url = _TG_API.format(token=token, method=method)
         try:
-            r = requests.post(url, json=payload or {}, timeout=timeout)
+            r = get_session().post(url, json=payload or {}, timeout=timeout)
             data = r.json()
             if not data.get('ok'):
                 _logger.warning("Telegram API error [%s]: %s", method, data)
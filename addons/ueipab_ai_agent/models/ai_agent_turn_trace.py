@@ -0,0 +1,121 @@
+import logging
+from datetime import timedelta
+
+from odoo import models, fields, api, tools
+
+_logger = logging.getLogger(__name__)
+
+TRACE_STAGES = [
+    ('moderation', 'Moderacion'),
+    ('transcription', 'Transcripcion audio'),
+    ('pdf', 'PDF a imagen'),
+    ('context', 'Contexto y prompt'),
+    ('llm', 'IA (Claude/OpenAI)'),
+    ('actions', 'Acciones del skill'),
+    ('send', 'Envio'),
+    ('receipt', 'Comprobante (OCR)'),
+    ('total', 'Turno completo'),
+]
+
+# Traces older than this are removed by the autovacuum
+_TRACE_RETENTION_DAYS = 30
+
+
+class AiAgentTurnTrace(models.Model):
+    """Stage timings of one action_process_reply() turn (see turn_trace)."""
+    _name = 'ai.agent.turn.trace'
+    _description = 'AI Agent Turn Trace'
+    _order = 'id desc'
+
+    conversation_id = fields.Many2one(
+        'ai.agent.conversation', string='Conversacion', ondelete='cascade', index=True)
+    skill_id = fields.Many2one('ai.agent.skill', string='Skill', index=True)
+    channel = fields.Char('Canal')
+    total_ms = fields.Integer(
+        'Total (ms)',
+        help='Tiempo del turno, incluida la llamada IA precargada por el cron de '
+             'sondeo y los pasos memorizados de la primera pasada.')
+    is_slow = fields.Boolean(
+        'Lento', index=True,
+        help='El turno supero ai_agent.slow_turn_ms (por defecto 20000 ms).')
+    span_ids = fields.One2many('ai.agent.turn.span', 'trace_id', string='Etapas')
+
+    @api.model
+    def _save(self, conversation, trace):
+        """Persist a collected TurnTrace for the conversation's turn."""
+        total_ms = trace.total_ms()
+        threshold = int(self.env['ir.config_parameter'].sudo().get_param(
+            'ai_agent.slow_turn_ms', '20000') or 20000)
+        is_slow = total_ms > threshold
+        if is_slow:
+            _logger.warning(
+                "Slow turn: conv %d (%s) took %d ms — %s", conversation.id,
+                conversation.skill_id.code, total_ms,
+                ', '.join(f"{stage}={ms}" for stage, ms in trace.stages.items()))
+        return self.sudo().create({
+            'conversation_id': conversation.id,
+            'skill_id': conversation.skill_id.id,
+            'channel': conversation.channel,
+            'total_ms': total_ms,
+            'is_slow': is_slow,
+            'span_ids': [
+                (0, 0, {'stage': stage, 'duration_ms': ms})
+                for stage, ms in trace.stages.items()
+            ],
+        })
+
+    @api.autovacuum
+    def _gc_old_traces(self):
+        cutoff = fields.Datetime.now() - timedelta(days=_TRACE_RETENTION_DAYS)
+        self.sudo().search([('create_date', '<', cutoff)]).unlink()
+
+
+class AiAgentTurnSpan(models.Model):
+    _name = 'ai.agent.turn.span'
+    _description = 'AI Agent Turn Trace Stage'
+    _order = 'id'
+
+    trace_id = fields.Many2one(
+        'ai.agent.turn.trace', required=True, ondelete='cascade', index=True)
+    stage = fields.Selection(TRACE_STAGES, string='Etapa', required=True)
+    duration_ms = fields.Integer('Duracion (ms)')
+
+
+class AiAgentTurnLatencyReport(models.Model):
+    """p50/p95 latency per skill and stage over the last 7 days of traces."""
+    _name = 'ai.agent.turn.latency.report'
+    _description = 'AI Agent Turn Latency (p50/p95)'
+    _auto = False
+    _order = 'skill_id, stage'
+
+    skill_id = fields.Many2one('ai.agent.skill', string='Skill', readonly=True)
+    stage = fields.Selection(TRACE_STAGES, string='Etapa', readonly=True)
+    sample_count = fields.Integer('Muestras', readonly=True)
+    p50_ms = fields.Float('p50 (ms)', readonly=True, digits=(10, 0))
+    p95_ms = fields.Float('p95 (ms)', readonly=True, digits=(10, 0))
+    max_ms = fields.Integer('Max (ms)', readonly=True)
+
+    def init(self):
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute("""
+            CREATE OR REPLACE VIEW %s AS (
+                SELECT row_number() OVER (ORDER BY skill_id, stage) AS id,
+                       skill_id,
+                       stage,
+                       COUNT(*) AS sample_count,
+                       percentile_cont(0.5) WITHIN GROUP (ORDER BY duration_ms) AS p50_ms,
+                       percentile_cont(0.95) WITHIN GROUP (ORDER BY duration_ms) AS p95_ms,
+                       MAX(duration_ms) AS max_ms
+                  FROM (
+                        SELECT t.skill_id, s.stage, s.duration_ms
+                          FROM ai_agent_turn_span s
+                          JOIN ai_agent_turn_trace t ON t.id = s.trace_id
+                         WHERE t.create_date >= (now() AT TIME ZONE 'UTC') - interval '7 days'
+                     UNION ALL
+                        SELECT skill_id, 'total', total_ms
+                          FROM ai_agent_turn_trace
+                         WHERE create_date >= (now() AT TIME ZONE 'UTC') - interval '7 days'
+                       ) samples
+              GROUP BY skill_id, stage
+            )
+        """ % self._table)
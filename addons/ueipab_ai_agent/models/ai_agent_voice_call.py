@@ -2,11 +2,11 @@ import json
 import logging
 import re
 
-import requests
-
 from odoo import models, fields, api, _
 from odoo.exceptions import UserError
 
+from .http_pool import get_session
+
 _logger = logging.getLogger(__name__)
 
 
@@ -156,7 +156,7 @@ class AiAgentVoiceCall(models.Model):
             'callback_token': self._icp('voice_call.callback_token') or None,
         }
         try:
-            resp = requests.post(f"{gateway}/place-call", json=payload, timeout=20)
+            resp = get_session().post(f"{gateway}/place-call", json=payload, timeout=20)
             resp.raise_for_status()
             data = resp.json()
         except Exception as e:
@@ -1,16 +1,41 @@
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 
 from odoo import models, _
 from odoo.exceptions import UserError
 
+from ..skills import PROMPT_CACHE_BREAK
+from .http_pool import get_session
+
 _logger = logging.getLogger(__name__)
 
 _CLAUDE_MAX_RETRIES = 2
 _CLAUDE_RETRY_DELAYS = [3, 6]   # seconds between retry attempts on 429
 
+# Anthropic prompt caching: up to 4 cache breakpoints per request, priced
+# relative to the base input rate (write 1.25x, read 0.10x).
+_CACHE_CONTROL = {'type': 'ephemeral'}
+_MAX_SYSTEM_BREAKPOINTS = 3     # the 4th one marks the conversation history
+CACHE_WRITE_FACTOR = 1.25
+CACHE_READ_FACTOR = 0.10
+
+
+class AIServiceError(Exception):
+    """Provider failure raised by the HTTP-only generation path.
+
+    Carries an error code and detail instead of a translated UserError, so it
+    can be raised inside worker threads (no env/cursor access there).
+    generate_response() turns it into a UserError in the calling thread.
+    """
+
+    def __init__(self, code, detail=''):
+        super().__init__(code, detail)
+        self.code = code
+        self.detail = detail
+
 
 class ClaudeService(models.AbstractModel):
     _name = 'ai.agent.claude.service'
@@ -28,6 +53,7 @@ class ClaudeService(models.AbstractModel):
             'base_url':          ICP.get_param('ai_agent.claude_base_url', 'https://api.anthropic.com/v1'),
             'model':             ICP.get_param('ai_agent.claude_model', 'claude-haiku-4-5-20251001'),
             'anthropic_version': ICP.get_param('ai_agent.claude_anthropic_version', '2023-06-01'),
+            'prompt_cache':      ICP.get_param('ai_agent.claude_prompt_cache', 'True').lower() == 'true',
         }
 
     def _get_openai_config(self):
@@ -39,12 +65,95 @@ class ClaudeService(models.AbstractModel):
             'enabled':  ICP.get_param('ai_agent.openai_fallback_enabled', 'False').lower() == 'true',
         }
 
+    def _get_generation_config(self):
+        """Everything _generate() needs, read once from system parameters.
+
+        Resolved in the calling thread so the HTTP path never touches the
+        database.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        credits_ok = ICP.get_param('ai_agent.credits_ok', 'True').lower() == 'true'
+        return {
+            'credits_ok': credits_ok,
+            'claude':     self._get_claude_config() if credits_ok else None,
+            'openai':     self._get_openai_config(),
+        }
+
+    def _user_error(self, error):
+        """Translate an AIServiceError into the UserError shown to callers."""
+        if error.code == 'credits':
+            return UserError(_(
+                "AI Agent desactivado: creditos insuficientes. "
+                "Contacte soporte@ueipab.edu.ve."
+            ))
+        if error.code == 'openai_key':
+            return UserError(_("OpenAI API key no configurado (ai_agent.openai_api_key)."))
+        if error.code == 'openai_http':
+            return UserError(_("Error de OpenAI API: %s") % error.detail)
+        if error.code == 'openai_conn':
+            return UserError(_("Error de conexion con OpenAI API: %s") % error.detail)
+        if error.code == 'rate_limit':
+            return UserError(_("Claude API rate limit. Intente nuevamente en unos minutos."))
+        return UserError(_("Error de Claude API: %s") % (error.detail or 'unknown'))
+
+    # ── Prompt caching ────────────────────────────────────────────────────────
+
+    @staticmethod
+    def _plain_prompt(system_prompt):
+        """System prompt as one string (cache breaks removed)."""
+        return system_prompt.replace(PROMPT_CACHE_BREAK, '\n')
+
+    def _system_blocks(self, system_prompt):
+        """Split the system prompt into Claude text blocks at PROMPT_CACHE_BREAK.
+
+        Skills put their stable sections first and separate them from the
+        per-conversation ones with PROMPT_CACHE_BREAK; every section end
+        becomes a cache breakpoint (first ones and last one, within the API
+        limit), so the stable prefix is shared across conversations and the
+        whole system prompt across turns of the same conversation.
+        """
+        blocks = [{'type': 'text', 'text': text}
+                  for text in system_prompt.split(PROMPT_CACHE_BREAK) if text.strip()]
+        if not blocks:
+            return system_prompt
+        marked = set(range(len(blocks))[:_MAX_SYSTEM_BREAKPOINTS - 1]) | {len(blocks) - 1}
+        for idx in marked:
+            blocks[idx]['cache_control'] = _CACHE_CONTROL
+        return blocks
+
+    def _cached_messages(self, messages):
+        """Mark the end of the history as a cache breakpoint.
+
+        The next turn of the conversation re-sends the same history plus the
+        new exchange, so everything up to here is read back from the cache.
+        """
+        if not messages:
+            return messages
+        last = dict(messages[-1])
+        content = last.get('content')
+        if isinstance(content, str):
+            if not content:
+                return messages
+            last['content'] = [{'type': 'text', 'text': content, 'cache_control': _CACHE_CONTROL}]
+        elif isinstance(content, list) and content:
+            content = [dict(block) for block in content]
+            content[-1]['cache_control'] = _CACHE_CONTROL
+            last['content'] = content
+        else:
+            return messages
+        return messages[:-1] + [last]
+
     # ── Provider calls ────────────────────────────────────────────────────────
 
     def _call_claude(self, cfg, system_prompt, messages, model=None):
         """Single raw HTTP call to Claude. Returns requests.Response."""
         url = cfg['base_url'].rstrip('/') + '/messages'
-        return requests.post(
+        if cfg.get('prompt_cache'):
+            system = self._system_blocks(system_prompt)
+            messages = self._cached_messages(messages)
+        else:
+            system = self._plain_prompt(system_prompt)
+        return get_session().post(
             url,
             headers={
                 'x-api-key':         cfg['api_key'],
@@ -54,23 +163,22 @@ class ClaudeService(models.AbstractModel):
             json={
                 'model':      model or cfg['model'],
                 'max_tokens': 512,
-                'system':     system_prompt,
+                'system':     system,
                 'messages':   messages,
             },
             timeout=60,
         )
 
-    def _call_openai(self, system_prompt, messages, model=None):
+    def _call_openai(self, cfg, system_prompt, messages, model=None):
         """Call OpenAI Chat Completions. Returns normalized result dict."""
-        cfg = self._get_openai_config()
         if not cfg['api_key']:
-            raise UserError(_("OpenAI API key no configurado (ai_agent.openai_api_key)."))
+            raise AIServiceError('openai_key')
 
-        oai_messages = [{'role': 'system', 'content': system_prompt}] + messages
+        oai_messages = [{'role': 'system', 'content': self._plain_prompt(system_prompt)}] + messages
         _logger.info("OpenAI fallback call: model=%s msgs=%d", model or cfg['model'], len(messages))
 
         try:
-            resp = requests.post(
+            resp = get_session().post(
                 cfg['base_url'].rstrip('/') + '/chat/completions',
                 headers={
                     'Authorization': f"Bearer {cfg['api_key']}",
@@ -91,52 +199,51 @@ class ClaudeService(models.AbstractModel):
             except Exception:
                 msg = str(e)
             _logger.error("OpenAI HTTP error: %s", msg)
-            raise UserError(_("Error de OpenAI API: %s") % msg)
+            raise AIServiceError('openai_http', msg)
         except requests.exceptions.RequestException as e:
             _logger.error("OpenAI request error: %s", e)
-            raise UserError(_("Error de conexion con OpenAI API: %s") % str(e))
+            raise AIServiceError('openai_conn', str(e))
 
         content = result.get('choices', [{}])[0].get('message', {}).get('content', '')
         usage   = result.get('usage', {})
+        # OpenAI caches prompt prefixes automatically; prompt_tokens includes
+        # the cached part, split it out like Claude reports it.
+        cached = (usage.get('prompt_tokens_details') or {}).get('cached_tokens', 0) or 0
         _logger.info(
-            "OpenAI response: %d chars tokens in=%d out=%d",
-            len(content), usage.get('prompt_tokens', 0), usage.get('completion_tokens', 0),
+            "OpenAI response: %d chars tokens in=%d out=%d cached=%d",
+            len(content), usage.get('prompt_tokens', 0), usage.get('completion_tokens', 0), cached,
         )
         return {
-            'content':       content,
-            'input_tokens':  usage.get('prompt_tokens', 0),
-            'output_tokens': usage.get('completion_tokens', 0),
-            'provider':      'openai',
+            'content':            content,
+            'input_tokens':       usage.get('prompt_tokens', 0) - cached,
+            'output_tokens':      usage.get('completion_tokens', 0),
+            'cache_read_tokens':  cached,
+            'cache_write_tokens': 0,
+            'provider':           'openai',
         }
 
-    # ── Public API ────────────────────────────────────────────────────────────
-
-    def generate_response(self, system_prompt, messages, model=None):
-        """Generate a response using Claude with retry and optional OpenAI fallback.
-
-        Retry policy: up to 2 retries on HTTP 429 (3s, 6s delays).
-        OpenAI fallback: activated when ai_agent.openai_fallback_enabled=True and:
-          - Claude 429 persists after all retries, OR
-          - ai_agent.credits_ok=False (Claude spend limit reached — this flag
-            covers the Claude leg only; WhatsApp sends are gated separately
-            by ai_agent.wa_credits_ok in whatsapp_service)
+    def _generate(self, config, system_prompt, messages, model=None):
+        """HTTP-only generation: Claude with retry, then optional OpenAI fallback.
 
-        Returns dict: {'content', 'input_tokens', 'output_tokens'}
+        Safe to run in a worker thread: uses only the pre-resolved config
+        from _get_generation_config() and raises AIServiceError on failure.
+        The result carries the wall-clock latency of the call, retries
+        included, as 'latency_ms'.
         """
-        ICP = self.env['ir.config_parameter'].sudo()
-        credits_ok = ICP.get_param('ai_agent.credits_ok', 'True').lower() == 'true'
+        started = time.monotonic()
+        result = self._generate_once(config, system_prompt, messages, model)
+        result['latency_ms'] = int((time.monotonic() - started) * 1000)
+        return result
 
-        if not credits_ok:
+    def _generate_once(self, config, system_prompt, messages, model=None):
+        oai = config['openai']
+        if not config['credits_ok']:
             _logger.warning("Credit Guard: credits depleted — trying OpenAI fallback")
-            oai = self._get_openai_config()
             if oai['enabled'] and oai['api_key']:
-                return self._call_openai(system_prompt, messages, model)
-            raise UserError(_(
-                "AI Agent desactivado: creditos insuficientes. "
-                "Contacte soporte@ueipab.edu.ve."
-            ))
+                return self._call_openai(oai, system_prompt, messages, model)
+            raise AIServiceError('credits')
 
-        cfg = self._get_claude_config()
+        cfg = config['claude']
         _logger.info("Claude API call: model=%s msgs=%d", model or cfg['model'], len(messages))
 
         rate_limited = False
@@ -183,23 +290,122 @@ class ClaudeService(models.AbstractModel):
                 )
                 usage = result.get('usage', {})
                 _logger.info(
-                    "Claude response: %d chars tokens in=%d out=%d",
+                    "Claude response: %d chars tokens in=%d out=%d cache_read=%d cache_write=%d",
                     len(content),
                     usage.get('input_tokens', 0),
                     usage.get('output_tokens', 0),
+                    usage.get('cache_read_input_tokens') or 0,
+                    usage.get('cache_creation_input_tokens') or 0,
                 )
                 return {
-                    'content':       content,
-                    'input_tokens':  usage.get('input_tokens', 0),
-                    'output_tokens': usage.get('output_tokens', 0),
+                    'content':            content,
+                    'input_tokens':       usage.get('input_tokens', 0),
+                    'output_tokens':      usage.get('output_tokens', 0),
+                    'cache_read_tokens':  usage.get('cache_read_input_tokens') or 0,
+                    'cache_write_tokens': usage.get('cache_creation_input_tokens') or 0,
+                    'provider':           'claude',
                 }
 
         # Claude exhausted — try OpenAI fallback if rate-limited and configured
         if rate_limited:
-            oai = self._get_openai_config()
             if oai['enabled'] and oai['api_key']:
                 _logger.warning("Claude rate limit exhausted — switching to OpenAI fallback")
-                return self._call_openai(system_prompt, messages, model)
-            raise UserError(_("Claude API rate limit. Intente nuevamente en unos minutos."))
+                return self._call_openai(oai, system_prompt, messages, model)
+            raise AIServiceError('rate_limit')
+
+        raise AIServiceError('claude', last_error or 'unknown')
+
+    # ── Public API ────────────────────────────────────────────────────────────
+
+    def generate_response(self, system_prompt, messages, model=None):
+        """Generate a response using Claude with retry and optional OpenAI fallback.
+
+        Retry policy: up to 2 retries on HTTP 429 (3s, 6s delays).
+        OpenAI fallback: activated when ai_agent.openai_fallback_enabled=True and:
+          - Claude 429 persists after all retries, OR
+          - ai_agent.credits_ok=False (Claude spend limit reached — this flag
+            covers the Claude leg only; WhatsApp sends are gated separately
+            by ai_agent.wa_credits_ok in whatsapp_service)
 
-        raise UserError(_("Error de Claude API: %s") % (last_error or 'unknown'))
+        Returns dict: {'content', 'input_tokens', 'output_tokens',
+        'cache_read_tokens', 'cache_write_tokens', 'provider', 'latency_ms'}
+        (input_tokens excludes the cached prompt tokens).
+        """
+        config = self._get_generation_config()
+        try:
+            return self._generate(config, system_prompt, messages, model)
+        except AIServiceError as e:
+            raise self._user_error(e) from e
+
+    def generate_responses(self, requests_by_key):
+        """Run several generations concurrently on a bounded thread pool.
+
+        Args:
+            requests_by_key: {key: {'system_prompt', 'messages', 'model'}}
+
+        Each worker thread gets its own pooled session from http_pool
+        (keep-alive to the provider across the calls it handles). Threads only do HTTP; callers
+        apply the results to the database themselves, serially.
+        Pool size: ai_agent.llm_max_workers (default 4).
+
+        Returns {key: result dict | AIServiceError}.
+        """
+        if not requests_by_key:
+            return {}
+        config = self._get_generation_config()
+        ICP = self.env['ir.config_parameter'].sudo()
+        max_workers = max(1, int(ICP.get_param('ai_agent.llm_max_workers', '4') or 4))
+
+        def _run(req):
+            try:
+                return self._generate(
+                    config, req['system_prompt'], req['messages'], req.get('model'))
+            except AIServiceError as e:
+                return e
+            except Exception as e:
+                _logger.exception("LLM worker failed")
+                return AIServiceError('claude', str(e))
+
+        workers = min(max_workers, len(requests_by_key))
+        _logger.info("LLM pool: %d request(s) on %d worker(s)", len(requests_by_key), workers)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ai_agent_llm') as pool:
+            futures = {key: pool.submit(_run, req) for key, req in requests_by_key.items()}
+        return {key: future.result() for key, future in futures.items()}
+
+    # ── Usage accounting ──────────────────────────────────────────────────────
+
+    def _get_usage_totals(self):
+        """Token, spend, cache and latency totals over all logged AI calls.
+
+        Spend uses ai_agent.claude_input_rate / claude_output_rate, with cache
+        writes and reads priced at CACHE_WRITE_FACTOR / CACHE_READ_FACTOR of
+        the input rate. Cache-hit rate is the share of prompt tokens served
+        from the cache.
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        input_rate = float(ICP.get_param('ai_agent.claude_input_rate', '0.000001'))
+        output_rate = float(ICP.get_param('ai_agent.claude_output_rate', '0.000005'))
+        self.env.cr.execute("""
+            SELECT COALESCE(SUM(ai_input_tokens), 0),
+                   COALESCE(SUM(ai_output_tokens), 0),
+                   COALESCE(SUM(ai_cache_read_tokens), 0),
+                   COALESCE(SUM(ai_cache_write_tokens), 0),
+                   COALESCE(AVG(NULLIF(ai_latency_ms, 0)), 0)
+            FROM ai_agent_message
+            WHERE ai_input_tokens > 0 OR ai_output_tokens > 0
+               OR ai_cache_read_tokens > 0
+        """)
+        total_in, total_out, cache_read, cache_write, avg_latency = self.env.cr.fetchone()
+        prompt_tokens = total_in + cache_read + cache_write
+        return {
+            'input_tokens': total_in,
+            'output_tokens': total_out,
+            'cache_read_tokens': cache_read,
+            'cache_write_tokens': cache_write,
+            'cache_hit_rate': (cache_read * 100.0 / prompt_tokens) if prompt_tokens else 0.0,
+            'avg_latency_ms': int(avg_latency),
+            'spend': (total_in * input_rate
+                      + cache_write * input_rate * CACHE_WRITE_FACTOR
+                      + cache_read * input_rate * CACHE_READ_FACTOR
+                      + total_out * output_rate),
+        }
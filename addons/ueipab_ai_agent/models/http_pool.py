@@ -0,0 +1,153 @@
+"""Shared HTTP session layer for the AI agent's external API calls.
+
+Every outbound call (Claude, OpenAI, MassivaMóvil, Kapso, Telegram,
+FreeScout, the voice gateway, media downloads) goes through get_session()
+instead of bare requests.get/post:
+
+  - one requests.Session per worker thread and policy, kept alive for the
+    life of the thread, with a connection pool per host (no TCP + TLS setup
+    on every call)
+  - retry with exponential backoff on connection failures for every method,
+    and on 502/503/504 for idempotent methods only — a POST that reached the
+    server is never replayed (it may be a WhatsApp send)
+  - per-host call / error / latency counters, accumulated in memory and
+    flushed to ai.agent.http.stat at most once per FLUSH_INTERVAL from a
+    separate cursor, so counters from cron and HTTP workers land in the
+    same table
+"""
+import logging
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import odoo
+
+_logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 60  # seconds between stat flushes per process
+
+_IDEMPOTENT = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+
+# name -> (pool_connections, pool_maxsize, Retry kwargs)
+_POLICIES = {
+    # API calls: quick retry on connect errors / gateway hiccups
+    'default': (10, 10, {
+        'total': 2, 'connect': 2, 'read': 0, 'status': 2,
+        'backoff_factor': 0.5,
+    }),
+    # Media downloads (idempotent GETs from the providers' CDNs)
+    'download': (4, 4, {
+        'total': 3, 'connect': 3, 'read': 1, 'status': 3,
+        'backoff_factor': 1.0,
+    }),
+}
+
+_local = threading.local()
+
+_stats_lock = threading.Lock()
+_pending = {}  # host -> [calls, errors, total_ms, max_ms, last_error]
+_last_flush = time.monotonic()
+
+
+class _PooledSession(requests.Session):
+    """requests.Session that records per-host latency and errors."""
+
+    def request(self, method, url, *args, **kwargs):
+        host = urlsplit(url).hostname or '?'
+        started = time.monotonic()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except requests.exceptions.RequestException as e:
+            _record(host, started, f"{type(e).__name__}: {e}")
+            raise
+        status = response.status_code
+        _record(host, started, f"HTTP {status}" if status >= 500 or status == 429 else None)
+        return response
+
+
+def _new_session(policy):
+    pool_connections, pool_maxsize, retry_kwargs = _POLICIES[policy]
+    retry = Retry(
+        status_forcelist=(502, 503, 504),
+        allowed_methods=_IDEMPOTENT,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+        **retry_kwargs,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+    session = _PooledSession()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session(policy='default'):
+    """Return this thread's pooled session for the given retry policy."""
+    sessions = _local.__dict__.setdefault('sessions', {})
+    session = sessions.get(policy)
+    if session is None:
+        session = sessions[policy] = _new_session(policy)
+    return session
+
+
+# ── Per-host stats ────────────────────────────────────────────────────────────
+
+def _record(host, started, error=None):
+    elapsed_ms = int((time.monotonic() - started) * 1000)
+    with _stats_lock:
+        stat = _pending.setdefault(host, [0, 0, 0, 0, None])
+        stat[0] += 1
+        stat[2] += elapsed_ms
+        stat[3] = max(stat[3], elapsed_ms)
+        if error:
+            stat[1] += 1
+            stat[4] = error[:500]
+        due = time.monotonic() - _last_flush >= FLUSH_INTERVAL
+    if due:
+        flush_stats()
+
+
+def flush_stats(dbname=None):
+    """Add the counters accumulated in this process to ai_agent_http_stat.
+
+    Uses its own cursor (committed on exit) so it never touches the caller's
+    transaction. Threads without a database (LLM pool workers) leave their
+    counters pending for the next flush from an Odoo thread.
+    """
+    global _last_flush
+    dbname = dbname or getattr(threading.current_thread(), 'dbname', None)
+    if not dbname:
+        return
+    with _stats_lock:
+        pending = dict(_pending)
+        _pending.clear()
+        _last_flush = time.monotonic()
+    if not pending:
+        return
+    try:
+        with odoo.sql_db.db_connect(dbname).cursor() as cr:
+            for host, (calls, errors, total_ms, max_ms, last_error) in pending.items():
+                cr.execute("""
+                    INSERT INTO ai_agent_http_stat
+                           (host, call_count, error_count, total_ms, max_ms,
+                            last_error, last_call, create_date, write_date)
+                    VALUES (%s, %s, %s, %s, %s, %s,
+                            now() AT TIME ZONE 'UTC', now() AT TIME ZONE 'UTC',
+                            now() AT TIME ZONE 'UTC')
+                    ON CONFLICT (host) DO UPDATE SET
+                           call_count = ai_agent_http_stat.call_count + EXCLUDED.call_count,
+                           error_count = ai_agent_http_stat.error_count + EXCLUDED.error_count,
+                           total_ms = ai_agent_http_stat.total_ms + EXCLUDED.total_ms,
+                           max_ms = GREATEST(ai_agent_http_stat.max_ms, EXCLUDED.max_ms),
+                           last_error = COALESCE(EXCLUDED.last_error, ai_agent_http_stat.last_error),
+                           last_call = EXCLUDED.last_call,
+                           write_date = EXCLUDED.write_date
+                """, (host, calls, errors, total_ms, max_ms, last_error))
+    except Exception as e:
+        # Module not installed in this database, or DB unavailable: drop them
+        _logger.debug("HTTP stats flush to %s skipped: %s", dbname, e)
@@ -6,11 +6,9 @@ import requests
 from odoo import models, _
 from odoo.exceptions import UserError
 
-_logger = logging.getLogger(__name__)
+from .http_pool import get_session
 
-# Module-level last-send timestamp for throttling (per worker process),
-# same pattern as whatsapp_service.py.
-_last_send_time = 0.0
+_logger = logging.getLogger(__name__)
 
 
 class KapsoService(models.AbstractModel):
@@ -67,17 +65,6 @@ class KapsoService(models.AbstractModel):
         ICP = self.env['ir.config_parameter'].sudo()
         return int(ICP.get_param('ai_agent.kapso_send_interval', '3'))
 
-    def _throttle_send(self):
-        global _last_send_time
-        interval = self._get_send_interval()
-        if interval <= 0:
-            return
-        elapsed = time.time() - _last_send_time
-        if elapsed < interval:
-            wait = interval - elapsed
-            _logger.info("Kapso throttle: waiting %.1fs (interval=%ds)", wait, interval)
-            time.sleep(wait)
-
     def _check_kill_switch(self):
         """Same WA kill switch as MassivaMóvil (ai_agent.wa_credits_ok)."""
         wa_credits_ok = self.env['ir.config_parameter'].sudo().get_param(
@@ -99,8 +86,9 @@ class KapsoService(models.AbstractModel):
     def _post_message(self, payload, config):
         """POST a message payload to the Kapso Meta proxy.
 
-        The Kapso client has no built-in retry, so we retry ONCE on network
-        error, HTTP 429 (honoring Retry-After, capped 30s) and 5xx.
+        The pooled session only retries connect failures for a POST, so we
+        retry ONCE on network error, HTTP 429 (honoring Retry-After, capped
+        30s) and 5xx.
         Returns the parsed JSON response; raises UserError on failure.
         """
         url = self._messages_url(config)
@@ -108,7 +96,7 @@ class KapsoService(models.AbstractModel):
         last_error = ''
         for attempt in (1, 2):
             try:
-                response = requests.post(url, json=payload, headers=headers, timeout=30)
+                response = get_session().post(url, json=payload, headers=headers, timeout=30)
             except requests.exceptions.RequestException as e:
                 last_error = str(e)
                 _logger.warning("Kapso API network error (attempt %d): %s", attempt, e)
@@ -157,7 +145,6 @@ class KapsoService(models.AbstractModel):
         the MassivaMóvil integer contract for existing callers (their IDs
         are ints; Kapso wamids are strings, carried separately).
         """
-        global _last_send_time
         self._check_kill_switch()
         config = self._get_config()
         normalized_phone = self._normalize_phone(phone)
@@ -170,7 +157,6 @@ class KapsoService(models.AbstractModel):
             'text': {'body': message},
         }
 
-        self._throttle_send()
         _logger.info("Kapso WA send to %s (%d chars)", normalized_phone, len(message or ''))
         result = self._post_message(payload, config)
 
@@ -180,11 +166,10 @@ class KapsoService(models.AbstractModel):
             wamid = (messages[0] or {}).get('id') or ''
         # The message was ACCEPTED (2xx) — do NOT raise on a missing wamid, or
         # a retrying caller would double-send an already-delivered message.
-        # Stamp the throttle and return like send_media does.
+        # Return like send_media does.
         if not wamid:
             _logger.warning("Kapso send: 2xx but no wamid in response: %s", result)
 
-        _last_send_time = time.time()
         _logger.info("Kapso WA message sent to %s (%s)", normalized_phone, wamid or 'no-wamid')
         return {'message_id': 0, 'wamid': wamid}
 
@@ -194,7 +179,6 @@ class KapsoService(models.AbstractModel):
         Mirrors MassivaMóvil send_media (used for flyers — images only).
         Returns {'message_id': 0, 'wamid': 'wamid.XXX'}.
         """
-        global _last_send_time
         self._check_kill_switch()
         config = self._get_config()
         normalized_phone = self._normalize_phone(phone)
@@ -210,7 +194,6 @@ class KapsoService(models.AbstractModel):
             'image': image,
         }
 
-        self._throttle_send()
         _logger.info("Kapso WA media send to %s: %s", normalized_phone, url)
         result = self._post_message(payload, config)
 
@@ -218,7 +201,6 @@ class KapsoService(models.AbstractModel):
         messages = result.get('messages') or []
         if messages and isinstance(messages, list):
             wamid = (messages[0] or {}).get('id') or ''
-        _last_send_time = time.time()
         _logger.info("Kapso WA media sent to %s (%s)", normalized_phone, wamid or 'no-wamid')
         return {'message_id': 0, 'wamid': wamid}
 
@@ -0,0 +1,78 @@
+"""Per-turn latency tracing for action_process_reply().
+
+A turn opens a collector with collect(); pipeline stages inside it are
+timed with span(stage) (or record(stage, ms) for a duration measured
+elsewhere). Work done before the turn's own pass — the LLM call the poll
+cron prefetched, or a step memoized from the deferred collect pass — is
+recorded with replayed=True: it counts as a stage and is added to the
+turn's total, which otherwise is only the wall time of this pass. Stages
+outside a turn are not recorded. The collector is thread-local, so the poll
+cron's LLM pool threads never see it; ai.agent.turn.trace persists it.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+class TurnTrace:
+    """Stage durations (ms) collected during one turn."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.stages = {}
+        self.replayed_ms = 0   # stage time spent outside this pass
+
+    def add(self, stage, elapsed_ms, replayed=False):
+        self.stages[stage] = self.stages.get(stage, 0) + int(elapsed_ms)
+        if replayed:
+            self.replayed_ms += int(elapsed_ms)
+
+    def total_ms(self):
+        """Wall time of the pass plus the replayed stages it did not run."""
+        return elapsed_ms(self.started) + self.replayed_ms
+
+
+def elapsed_ms(started):
+    return int((time.monotonic() - started) * 1000)
+
+
+def current():
+    return getattr(_local, 'trace', None)
+
+
+@contextmanager
+def collect():
+    """Open a turn collector (nested turns get their own)."""
+    parent = current()
+    trace = _local.trace = TurnTrace()
+    try:
+        yield trace
+    finally:
+        _local.trace = parent
+
+
+@contextmanager
+def span(stage):
+    """Time the enclosed block as `stage` of the current turn, if any."""
+    trace = current()
+    if trace is None:
+        yield
+        return
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        trace.add(stage, elapsed_ms(started))
+
+
+def record(stage, duration_ms, replayed=False):
+    """Add a duration measured elsewhere to the current turn, if any.
+
+    replayed=True when the work ran before this pass (prefetched or
+    memoized), so it is also added to the turn total.
+    """
+    trace = current()
+    if trace is not None:
+        trace.add(stage, duration_ms, replayed)
@@ -1,18 +1,15 @@
 import json
 import logging
 import re
-import time
 
 import requests
 
 from odoo import models, api, _
 from odoo.exceptions import UserError
 
-_logger = logging.getLogger(__name__)
+from .http_pool import get_session
 
-# Module-level last-send timestamp for anti-spam throttling.
-# Shared across all service instances within the same worker process.
-_last_send_time = 0.0
+_logger = logging.getLogger(__name__)
 
 
 class WhatsAppService(models.AbstractModel):
@@ -73,30 +70,44 @@ class WhatsAppService(models.AbstractModel):
         ICP = self.env['ir.config_parameter'].sudo()
         return int(ICP.get_param('ai_agent.whatsapp_send_interval', '120'))
 
-    def _throttle_send(self):
-        """Wait if needed to respect the anti-spam send interval.
+    def _get_dispatch_interval(self):
+        """Anti-spam interval of the active provider, in seconds.
 
-        Uses module-level timestamp so throttling works across all
-        send_message() calls within the same Odoo worker process.
+        Used by the outbound queue dispatcher (ai.agent.outbound.message),
+        which enforces the spacing across all workers.
         """
-        global _last_send_time
-        interval = self._get_send_interval()
-        if interval <= 0:
-            return
-
-        now = time.time()
-        elapsed = now - _last_send_time
-        if elapsed < interval:
-            wait = interval - elapsed
-            _logger.info(
-                "WhatsApp throttle: waiting %.0fs (interval=%ds, elapsed=%.0fs)",
-                wait, interval, elapsed)
-            time.sleep(wait)
+        if self._provider() == 'kapso':
+            return self.env['ai.agent.kapso.service']._get_send_interval()
+        return self._get_send_interval()
+
+    def enqueue_message(self, phone, message, conversation=None):
+        """Queue a WhatsApp text message and return immediately.
+
+        The message is sent by the dispatcher cron at the anti-spam rate.
+        Returns the ai.agent.outbound.message record.
+        """
+        return self.env['ai.agent.outbound.message']._enqueue({
+            'phone': phone,
+            'message_type': 'text',
+            'body': message,
+            'conversation_id': conversation.id if conversation else False,
+        })
+
+    def enqueue_media(self, phone, url, caption='', conversation=None):
+        """Queue a WhatsApp image message and return immediately."""
+        return self.env['ai.agent.outbound.message']._enqueue({
+            'phone': phone,
+            'message_type': 'media',
+            'media_url': url,
+            'body': caption,
+            'conversation_id': conversation.id if conversation else False,
+        })
 
     def send_message(self, phone, message):
         """Send a WhatsApp message via MassivaMóvil API.
 
-        Respects anti-spam throttling interval between sends.
+        Sends immediately — the anti-spam interval is enforced by the
+        outbound queue dispatcher; callers should use enqueue_message().
         Returns dict with message_id on success.
         """
         if self._provider() == 'kapso':
@@ -110,7 +121,6 @@ class WhatsAppService(models.AbstractModel):
             raise UserError(_("Envios WhatsApp desactivados: creditos WhatsApp insuficientes. "
                               "Contacte soporte@ueipab.edu.ve."))
 
-        global _last_send_time
         config = self._get_config()
         url = config['base_url'].rstrip('/') + '/send/whatsapp'
         normalized_phone = self._normalize_phone(phone)
@@ -123,13 +133,10 @@ class WhatsAppService(models.AbstractModel):
             'message': message,
         }
 
-        # Anti-spam throttle: wait if last send was too recent
-        self._throttle_send()
-
         _logger.info("WhatsApp send to %s (%d chars)", normalized_phone, len(message))
 
         try:
-            response = requests.post(url, data=data, timeout=30)
+            response = get_session().post(url, data=data, timeout=30)
             response.raise_for_status()
             result = response.json()
         except requests.exceptions.RequestException as e:
@@ -141,9 +148,6 @@ class WhatsAppService(models.AbstractModel):
             _logger.error("WhatsApp API returned error: %s", error_msg)
             raise UserError(_("Error de WhatsApp API: %s") % error_msg)
 
-        # Record send time for throttling
-        _last_send_time = time.time()
-
         _logger.info("WhatsApp message sent successfully to %s", normalized_phone)
         return {'message_id': result.get('data', {}).get('id', 0)}
 
@@ -166,7 +170,6 @@ class WhatsAppService(models.AbstractModel):
             raise UserError(_("Envios WhatsApp desactivados: creditos WhatsApp insuficientes. "
                               "Contacte soporte@ueipab.edu.ve."))
 
-        global _last_send_time
         config = self._get_config()
         api_url = config['base_url'].rstrip('/') + '/send/whatsapp'
         normalized_phone = self._normalize_phone(phone)
@@ -180,12 +183,10 @@ class WhatsAppService(models.AbstractModel):
             'message': caption or 'Informacion adicional',
         }
 
-        self._throttle_send()
-
         _logger.info("WhatsApp media send to %s: %s", normalized_phone, url)
 
         try:
-            response = requests.post(api_url, data=data, timeout=30)
+            response = get_session().post(api_url, data=data, timeout=30)
             response.raise_for_status()
             result = response.json()
         except requests.exceptions.RequestException as e:
@@ -197,7 +198,6 @@ class WhatsAppService(models.AbstractModel):
             _logger.error("WhatsApp media API returned error: %s", error_msg)
             raise UserError(_("Error de WhatsApp API (media): %s") % error_msg)
 
-        _last_send_time = time.time()
         _logger.info("WhatsApp media sent successfully to %s", normalized_phone)
         data = result.get('data') or {}
         msg_id = data.get('messageId') or data.get('id') or 0
@@ -222,7 +222,7 @@ class WhatsAppService(models.AbstractModel):
         }
 
         try:
-            response = requests.get(url, params=params, timeout=15)
+            response = get_session().get(url, params=params, timeout=15)
             response.raise_for_status()
             result = response.json()
         except requests.exceptions.RequestException as e:
@@ -260,7 +260,7 @@ class WhatsAppService(models.AbstractModel):
             params['account'] = account_id
 
         try:
-            response = requests.get(url, params=params, timeout=30)
+            response = get_session('download').get(url, params=params, timeout=30)
             response.raise_for_status()
             result = response.json()
         except requests.exceptions.RequestException as e:
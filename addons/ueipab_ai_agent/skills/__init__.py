@@ -4,6 +4,11 @@ from datetime import datetime, timezone, timedelta, date
 
 SKILL_REGISTRY = {}
 
+# Separator between the stable and the per-conversation sections of a skill's
+# system prompt. ClaudeService turns each section into a cacheable prompt
+# block; other providers get the sections joined back into one string.
+PROMPT_CACHE_BREAK = '\n<<CACHE_BREAK>>\n'
+
 # Venezuela timezone: UTC-4
 VE_TZ = timezone(timedelta(hours=-4))
 
@@ -377,8 +377,8 @@ class BounceResolutionSkill:
                 )
             # Remove from mailing.contact too
             bounced_lower = (bounce_log.bounced_email or '').lower()
-            mc_records = conversation.env['mailing.contact'].sudo().search(
-                [('email', 'ilike', bounce_log.bounced_email)])
+            mc_records = conversation.env['mail.email.index'].sudo()._match(
+                bounce_log.bounced_email)[1]
             for mc in mc_records:
                 mc_emails = [e.strip().lower() for e in (mc.email or '').split(';') if e.strip()]
                 if bounced_lower in mc_emails:
@@ -1,8 +1,9 @@
-import json
 import logging
 import re
 
-from . import register_skill, get_ve_greeting
+from ..models.http_pool import get_session
+from . import register_skill, get_ve_greeting, PROMPT_CACHE_BREAK
+from . import school_data
 
 _logger = logging.getLogger(__name__)
 
@@ -439,45 +440,9 @@ class GeneralInquirySkill:
         'cuanto', 'cuánto', 'vale', 'cobra', 'cobran',
     }
 
-    @staticmethod
-    def _norm_phone(raw):
-        """Normalize phone → 10-digit Venezuelan format."""
-        p = (raw or '').strip().replace(' ', '').replace('-', '').lstrip('+')
-        if p.startswith('58') and len(p) > 10:
-            p = p[2:]
-        p = p.lstrip('0')
-        return p[-10:] if len(p) > 10 else p
-
-    @staticmethod
-    def _word_overlap(a, b):
-        """Count matching words between two uppercased strings."""
-        wa = set(a.upper().split())
-        wb = set(b.upper().split())
-        return len(wa & wb)
-
-    def _load_family_billing_cache(self, conversation):
-        raw = conversation.env['ir.config_parameter'].sudo().get_param(
-            'school.family_billing_json', '{}')
-        try:
-            return json.loads(raw).get('families', [])
-        except Exception:
-            return []
-
-    def _load_directory_cache(self, conversation):
-        raw = conversation.env['ir.config_parameter'].sudo().get_param(
-            'school.student_directory_json', '{}')
-        try:
-            return json.loads(raw).get('students', [])
-        except Exception:
-            return []
-
     def _lookup_grade(self, student_name, directory):
-        """Return grade string for a student name via fuzzy match, or ''."""
-        best, best_score = None, 1
-        for s in directory:
-            score = self._word_overlap(student_name, s.get('name', ''))
-            if score > best_score:
-                best, best_score = s, score
+        """Return grade string for a student name via the directory index, or ''."""
+        best = directory.best_match(student_name, min_score=2)
         if best:
             return best.get('grade') or best.get('ou') or ''
         return ''
@@ -487,31 +452,30 @@ class GeneralInquirySkill:
         Look up the conversation partner in the family billing cache.
         Returns a formatted context block string, or '' if not found.
 
-        Lookup strategy (in order):
+        Lookup strategy (in order), all through the cached school_data indexes:
         1. Phone match against billing cache
-        2. No match → check latest inbound message for student names
+        2. Cédula match (identified partner's VAT)
+        3. No match → check latest inbound message for student names
         """
         import re
-        families   = self._load_family_billing_cache(conversation)
-        directory  = self._load_directory_cache(conversation)
-        if not families:
+        env        = conversation.env
+        families   = school_data.get_family_index(env)
+        directory  = school_data.get_directory_index(env)
+        if not families.families:
             return ''
 
-        family = None
-
         # Strategy 1 — phone match (WA: conversation.phone; Telegram: partner.mobile/phone)
-        conv_phone = self._norm_phone(conversation.phone or '')
-        if not conv_phone and conversation.partner_id:
-            conv_phone = self._norm_phone(
-                conversation.partner_id.mobile or conversation.partner_id.phone or ''
-            )
-        if conv_phone:
-            for f in families:
-                if f.get('phone') and self._norm_phone(f['phone']) == conv_phone:
-                    family = f
-                    break
+        partner = conversation.partner_id
+        conv_phone = school_data.normalize_phone(conversation.phone or '')
+        if not conv_phone and partner:
+            conv_phone = school_data.normalize_phone(partner.mobile or partner.phone or '')
+        family = families.by_phone.get(conv_phone) if conv_phone else None
+
+        # Strategy 2 — cédula match
+        if not family and partner and partner.vat:
+            family = families.by_cedula.get(school_data.normalize_cedula(partner.vat))
 
-        # Strategy 2 — student name mention in latest inbound message
+        # Strategy 3 — student name mention in latest inbound message
         if not family:
             latest = conversation.env['ai.agent.message'].search(
                 [('conversation_id', '=', conversation.id),
@@ -524,13 +488,7 @@ class GeneralInquirySkill:
             has_billing_kw = bool(words_in_msg & {k.upper() for k in self._BILLING_KEYWORDS})
 
             if has_billing_kw and msg_text:
-                best_family, best_score = None, 1
-                for f in families:
-                    for student in f.get('students', []):
-                        score = self._word_overlap(student, msg_text)
-                        if score > best_score:
-                            best_family, best_score = f, score
-                family = best_family
+                family = families.by_student_mention(msg_text, min_score=2)
 
         if not family:
             return ''
@@ -716,29 +674,17 @@ class GeneralInquirySkill:
 
     def _get_bcv_rate_from_context(self, conversation):
         """Extract current BCV rate from ir.config_parameter."""
-        import json as _j
-        raw = conversation.env['ir.config_parameter'].sudo().get_param(
-            'ai_agent.bcv_rate_context', '')
-        if not raw:
-            return 0.0
+        bcv = school_data.get_bcv_context(conversation.env) or {}
         try:
-            return float(_j.loads(raw).get('current', {}).get('rate', 0))
-        except Exception:
+            return float(bcv.get('current', {}).get('rate', 0))
+        except (TypeError, ValueError):
             return 0.0
 
     # ── BCV context helpers ───────────────────────────────────────────────────
 
     def _get_bcv_context(self, conversation):
         """Read BCV rate context from ir.config_parameter (populated by sync_bcv_to_odoo.py)."""
-        import json as _json
-        icp = conversation.env['ir.config_parameter'].sudo()
-        raw = icp.get_param('ai_agent.bcv_rate_context', '')
-        if not raw:
-            return None
-        try:
-            return _json.loads(raw)
-        except Exception:
-            return None
+        return school_data.get_bcv_context(conversation.env)
 
     def _get_calibration_tester(self, conversation):
         """Return (employee, ack) if this conversation belongs to a calibration participant.
@@ -860,21 +806,14 @@ class GeneralInquirySkill:
         if partner and not partner.name.startswith(('Consulta WhatsApp', 'Telegram ')):
             return ''  # already identified
 
-        raw = conversation.env['ir.config_parameter'].sudo().get_param(
-            'school.customers_sheet_json', '')
-        if not raw:
-            return ''
-
-        try:
-            import json as _json
-            data = _json.loads(raw)
-        except Exception:
+        customers = school_data.get_customers_by_email(conversation.env)
+        if not customers:
             return ''
 
         # Try to match by email stored on partner
-        email = (partner.email or '').lower() if partner else ''
-        if email and email in data:
-            name = data[email]
+        email = (partner.email or '').strip().lower() if partner else ''
+        if email and email in customers:
+            name = customers[email]
             return (
                 f"HOJA CUSTOMERS: El email {email} corresponde a {name} "
                 f"según la hoja de cálculo del colegio.\n"
@@ -1095,13 +1034,16 @@ class GeneralInquirySkill:
                 + "\n---\n"
             )
 
+        # Stable sections first: everything before PROMPT_CACHE_BREAK is the
+        # same for every conversation and is served from the prompt cache.
         return (
             f"Eres {agent_name}, asistente virtual del {institution}, ubicada en Venezuela.\n\n"
             + community_block
-            + calibration_block
             + audience_block
             + _INSTITUTIONAL_KNOWLEDGE
             + _BUDGET_KNOWLEDGE
+            + PROMPT_CACHE_BREAK
+            + calibration_block
             + self._build_bcv_block(bcv) + "\n"
             + balance_ctx + "\n"
             + billing_enrichment
@@ -1572,7 +1514,7 @@ class GeneralInquirySkill:
     def _close_freescout_vote_conv(self, conversation, ack, option):
         """Add internal note + close the FreeScout votacion@ conv for this ACK."""
         try:
-            import requests as _req
+            _req = get_session()
             from datetime import datetime as _dt
             icp     = conversation.env['ir.config_parameter'].sudo()
             fs_url  = icp.get_param('ai_agent.freescout_api_url', '').rstrip('/')
@@ -1731,10 +1673,10 @@ class GeneralInquirySkill:
             return
         wa_service = conversation.env['ai.agent.whatsapp.service']
         try:
-            wa_service.send_media(conversation.phone, url)
-            _logger.info("Flyer '%s' sent to %s", flyer_key, conversation.phone)
+            wa_service.enqueue_media(conversation.phone, url, conversation=conversation)
+            _logger.info("Flyer '%s' queued for %s", flyer_key, conversation.phone)
         except Exception as e:
-            _logger.error("Failed to send flyer '%s' to %s: %s", flyer_key, conversation.phone, e)
+            _logger.error("Failed to queue flyer '%s' for %s: %s", flyer_key, conversation.phone, e)
 
     def on_resolve(self, conversation, resolution_data):
         """Send handoff email to soporte@ueipab.edu.ve with full transcript."""
@@ -13,8 +13,7 @@ import base64
 import logging
 import re
 
-import requests
-
+from ..models.http_pool import get_session
 from . import (
     register_skill,
     get_ve_greeting,
@@ -389,7 +388,7 @@ RECORDATORIO IMPORTANTE:
             mimetype = attachment_msg.attachment_id.mimetype or 'image/jpeg'
         elif attachment_msg.attachment_url:
             try:
-                resp = requests.get(attachment_msg.attachment_url, timeout=30)
+                resp = get_session('download').get(attachment_msg.attachment_url, timeout=30)
                 resp.raise_for_status()
                 binary_data = base64.b64encode(resp.content)
                 mimetype = resp.headers.get('Content-Type', 'image/jpeg')
@@ -0,0 +1,164 @@
+"""Parsed, indexed views of the school data blobs in ir.config_parameter.
+
+The sync scripts push large JSON documents into system parameters
+(school.family_billing_json, school.student_directory_json,
+school.customers_sheet_json, ai_agent.bcv_rate_context). Skills used to
+json.loads them and scan them linearly on every turn; here each blob is
+parsed once per worker and kept with the parameter's write_date, which is
+re-checked per call (a one-row query), so a sync is picked up on the next
+turn. Lookups go through precomputed indexes: cédula, phone, email and
+normalized-name tokens.
+"""
+import json
+import logging
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+
+_logger = logging.getLogger(__name__)
+
+FAMILY_BILLING_PARAM = 'school.family_billing_json'
+STUDENT_DIRECTORY_PARAM = 'school.student_directory_json'
+CUSTOMERS_SHEET_PARAM = 'school.customers_sheet_json'
+BCV_CONTEXT_PARAM = 'ai_agent.bcv_rate_context'
+
+# (dbname, param key) -> (write_date, parsed value)
+_CACHE = {}
+_CACHE_LOCK = threading.Lock()
+
+
+def normalize_name(text):
+    """Uppercase, accents and punctuation stripped, whitespace collapsed."""
+    text = unicodedata.normalize('NFD', text or '')
+    text = ''.join(c for c in text if unicodedata.category(c) != 'Mn')
+    return ' '.join(re.sub(r'[^\w\s]', ' ', text.upper()).split())
+
+
+def name_tokens(text):
+    return set(normalize_name(text).split())
+
+
+def normalize_cedula(raw):
+    """Digits only: 'V-12.345.678' → '12345678'."""
+    return re.sub(r'\D', '', raw or '')
+
+
+def normalize_phone(raw):
+    """Normalize phone → 10-digit Venezuelan format."""
+    p = (raw or '').strip().replace(' ', '').replace('-', '').lstrip('+')
+    if p.startswith('58') and len(p) > 10:
+        p = p[2:]
+    p = p.lstrip('0')
+    return p[-10:] if len(p) > 10 else p
+
+
+def _best_by_tokens(token_index, tokens, min_score):
+    """Key sharing the most tokens (at least min_score); ties → lowest key."""
+    counts = Counter()
+    for token in tokens:
+        counts.update(token_index.get(token, ()))
+    best, best_score = None, min_score - 1
+    for key, score in counts.items():
+        if score > best_score or (score == best_score and best is not None and key < best):
+            best, best_score = key, score
+    return best
+
+
+class FamilyIndex:
+    """Family billing records indexed by phone, cédula and student name tokens."""
+
+    def __init__(self, families):
+        self.families = families
+        self.by_phone = {}
+        self.by_cedula = {}
+        self._student_tokens = defaultdict(set)   # token -> {(family pos, student pos)}
+        for fi, family in enumerate(families):
+            phone = normalize_phone(family.get('phone'))
+            if phone:
+                self.by_phone.setdefault(phone, family)
+            cedula = normalize_cedula(family.get('cedula'))
+            if cedula:
+                self.by_cedula.setdefault(cedula, family)
+            for si, student in enumerate(family.get('students', [])):
+                for token in name_tokens(student):
+                    self._student_tokens[token].add((fi, si))
+
+    def by_student_mention(self, text, min_score=2):
+        """Family with a student whose name shares at least min_score words with text."""
+        key = _best_by_tokens(self._student_tokens, name_tokens(text), min_score)
+        return self.families[key[0]] if key else None
+
+
+class DirectoryIndex:
+    """Google Directory students indexed by email, normalized name and name tokens."""
+
+    def __init__(self, students):
+        self.students = students
+        self.by_email = {}
+        self.by_name = {}
+        self._name_tokens = defaultdict(set)   # token -> {student pos}
+        for pos, student in enumerate(students):
+            email = (student.get('email') or '').strip().lower()
+            if email:
+                self.by_email.setdefault(email, student)
+            name = normalize_name(student.get('name'))
+            if name:
+                self.by_name.setdefault(name, student)
+            for token in name.split():
+                self._name_tokens[token].add(pos)
+
+    def best_match(self, name, min_score=2):
+        """Exact normalized-name match, else the best word overlap >= min_score."""
+        normalized = normalize_name(name)
+        if normalized in self.by_name:
+            return self.by_name[normalized]
+        pos = _best_by_tokens(self._name_tokens, set(normalized.split()), min_score)
+        return self.students[pos] if pos is not None else None
+
+
+def _load(env, key, build):
+    """Parsed value of a JSON parameter, rebuilt only when its write_date changes."""
+    env.cr.execute(
+        "SELECT write_date FROM ir_config_parameter WHERE key = %s", (key,))
+    row = env.cr.fetchone()
+    stamp = row[0] if row else None
+    cache_key = (env.cr.dbname, key)
+    cached = _CACHE.get(cache_key)
+    if cached and cached[0] == stamp:
+        return cached[1]
+
+    raw = env['ir.config_parameter'].sudo().get_param(key, '') if row else ''
+    data = None
+    if raw:
+        try:
+            data = json.loads(raw)
+        except ValueError as e:
+            _logger.warning("School data: invalid JSON in %s: %s", key, e)
+    value = build(data)
+    with _CACHE_LOCK:
+        _CACHE[cache_key] = (stamp, value)
+    return value
+
+
+def get_family_index(env):
+    return _load(env, FAMILY_BILLING_PARAM, lambda data: FamilyIndex(
+        (data or {}).get('families', []) if isinstance(data, dict) else []))
+
+
+def get_directory_index(env):
+    return _load(env, STUDENT_DIRECTORY_PARAM, lambda data: DirectoryIndex(
+        (data or {}).get('students', []) if isinstance(data, dict) else []))
+
+
+def get_customers_by_email(env):
+    """{lowercased email: customer name} from the Customers sheet."""
+    return _load(env, CUSTOMERS_SHEET_PARAM, lambda data: {
+        (email or '').strip().lower(): name
+        for email, name in (data.items() if isinstance(data, dict) else ())
+    })
+
+
+def get_bcv_context(env):
+    """BCV rate context dict (sync_bcv_to_odoo.py), or None."""
+    return _load(env, BCV_CONTEXT_PARAM, lambda data: data if isinstance(data, dict) else None)
@@ -0,0 +1 @@
+from . import test_claude_prompt_cache
@@ -0,0 +1,169 @@
+"""
+Prompt caching in ai.agent.claude.service, tested offline.
+
+The pooled HTTP session used by claude_service is replaced with a fake
+that records the request body and answers like the Messages API, so the
+cache breakpoints, the cached-token accounting and the spend formula are
+checked without any network access.
+"""
+from unittest import mock
+
+from odoo.tests import common, tagged
+
+from ..models.claude_service import CACHE_READ_FACTOR, CACHE_WRITE_FACTOR
+from ..skills import PROMPT_CACHE_BREAK
+
+_SESSION = 'odoo.addons.ueipab_ai_agent.models.claude_service.get_session'
+
+
+class _FakeResponse:
+    status_code = 200
+
+    def __init__(self, body):
+        self._body = body
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._body
+
+
+class _FakeSession:
+    """Stands in for http_pool's session: records posts, replies with `usage`."""
+
+    def __init__(self, usage):
+        self.usage = usage
+        self.posts = []
+
+    def post(self, url, headers=None, json=None, timeout=None):
+        self.posts.append({'url': url, 'json': json})
+        return _FakeResponse({
+            'content': [{'type': 'text', 'text': 'Hola, ¿en qué puedo ayudarle?'}],
+            'usage': self.usage,
+        })
+
+
+@tagged('post_install', '-at_install')
+class TestClaudePromptCache(common.TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        ICP = cls.env['ir.config_parameter'].sudo()
+        ICP.set_param('ai_agent.claude_api_key', 'test-key')
+        ICP.set_param('ai_agent.credits_ok', 'True')
+        ICP.set_param('ai_agent.claude_prompt_cache', 'True')
+        ICP.set_param('ai_agent.claude_input_rate', '0.000003')
+        ICP.set_param('ai_agent.claude_output_rate', '0.000015')
+        cls.service = cls.env['ai.agent.claude.service']
+        skill = cls.env['ai.agent.skill'].create({
+            'name': 'Prueba cache', 'code': 'test_prompt_cache', 'system_prompt': 'x',
+        })
+        partner = cls.env['res.partner'].create({'name': 'Representante Prueba'})
+        cls.conversation = cls.env['ai.agent.conversation'].create({
+            'skill_id': skill.id, 'partner_id': partner.id, 'phone': '584140000000',
+        })
+        cls.history = [
+            {'role': 'user', 'content': 'Buenas tardes'},
+            {'role': 'assistant', 'content': 'Buenas tardes, ¿en qué le ayudo?'},
+            {'role': 'user', 'content': 'Quiero saber el monto de la mensualidad'},
+        ]
+
+    def _generate(self, system_prompt, messages, usage=None):
+        session = _FakeSession(usage or {'input_tokens': 10, 'output_tokens': 5})
+        with mock.patch(_SESSION, return_value=session):
+            result = self.service.generate_response(system_prompt, messages)
+        self.assertEqual(len(session.posts), 1)
+        return result, session.posts[0]['json']
+
+    def test_system_blocks_at_cache_breaks(self):
+        sections = ['Identidad', 'Reglas', 'Tarifas', 'Calendario', 'Datos del contacto']
+        _, body = self._generate(PROMPT_CACHE_BREAK.join(sections), self.history)
+
+        system = body['system']
+        self.assertEqual([block['text'] for block in system], sections)
+        # first sections and the last one are breakpoints (3 in total), the
+        # 4th breakpoint of the request is kept for the history
+        self.assertEqual([bool(block.get('cache_control')) for block in system],
+                         [True, True, False, False, True])
+        self.assertEqual(system[0]['cache_control'], {'type': 'ephemeral'})
+
+    def test_history_breakpoint_on_last_message(self):
+        _, body = self._generate('Identidad' + PROMPT_CACHE_BREAK + 'Contacto', self.history)
+
+        messages = body['messages']
+        self.assertEqual(messages[:2], self.history[:2])
+        self.assertEqual(messages[-1]['content'], [{
+            'type': 'text',
+            'text': 'Quiero saber el monto de la mensualidad',
+            'cache_control': {'type': 'ephemeral'},
+        }])
+        # the caller's history is left untouched
+        self.assertIsInstance(self.history[-1]['content'], str)
+
+        image_turn = self.history[:2] + [{'role': 'user', 'content': [
+            {'type': 'image', 'source': {'type': 'url', 'url': 'https://example.com/r.jpg'}},
+            {'type': 'text', 'text': 'Este es el comprobante'},
+        ]}]
+        _, body = self._generate('Identidad', image_turn)
+        content = body['messages'][-1]['content']
+        self.assertNotIn('cache_control', content[0])
+        self.assertEqual(content[1]['cache_control'], {'type': 'ephemeral'})
+        self.assertNotIn('cache_control', image_turn[-1]['content'][1])
+
+    def test_prompt_cache_disabled(self):
+        self.env['ir.config_parameter'].sudo().set_param('ai_agent.claude_prompt_cache', 'False')
+        _, body = self._generate('Identidad' + PROMPT_CACHE_BREAK + 'Contacto', self.history)
+        self.assertEqual(body['system'], 'Identidad\nContacto')
+        self.assertEqual(body['messages'], self.history)
+
+    def test_cached_tokens_stored_on_message(self):
+        result, _ = self._generate('Identidad' + PROMPT_CACHE_BREAK + 'Contacto', self.history, {
+            'input_tokens': 42,
+            'output_tokens': 17,
+            'cache_read_input_tokens': 3100,
+            'cache_creation_input_tokens': 650,
+        })
+        message = self.env['ai.agent.message'].create(dict(
+            self.conversation._ai_usage_vals(result),
+            conversation_id=self.conversation.id,
+            direction='outbound',
+            body=result['content'],
+        ))
+        self.assertEqual(message.ai_input_tokens, 42)
+        self.assertEqual(message.ai_output_tokens, 17)
+        self.assertEqual(message.ai_cache_read_tokens, 3100)
+        self.assertEqual(message.ai_cache_write_tokens, 650)
+        self.assertEqual(message.ai_provider, 'claude')
+
+    def test_usage_totals_pricing(self):
+        before = self.service._get_usage_totals()
+        self.env['ai.agent.message'].create([{
+            'conversation_id': self.conversation.id,
+            'direction': 'outbound',
+            'ai_input_tokens': 1000,
+            'ai_output_tokens': 200,
+            'ai_cache_write_tokens': 4000,
+        }, {
+            'conversation_id': self.conversation.id,
+            'direction': 'outbound',
+            'ai_input_tokens': 300,
+            'ai_output_tokens': 100,
+            'ai_cache_read_tokens': 4000,
+        }])
+        self.env.flush_all()
+        after = self.service._get_usage_totals()
+
+        self.assertEqual(after['input_tokens'] - before['input_tokens'], 1300)
+        self.assertEqual(after['cache_write_tokens'] - before['cache_write_tokens'], 4000)
+        self.assertEqual(after['cache_read_tokens'] - before['cache_read_tokens'], 4000)
+        self.assertEqual(CACHE_WRITE_FACTOR, 1.25)
+        self.assertEqual(CACHE_READ_FACTOR, 0.10)
+        expected = (1300 * 0.000003
+                    + 4000 * 0.000003 * 1.25
+                    + 4000 * 0.000003 * 0.10
+                    + 300 * 0.000015)
+        self.assertAlmostEqual(after['spend'] - before['spend'], expected, places=9)
+        prompt = after['input_tokens'] + after['cache_read_tokens'] + after['cache_write_tokens']
+        self.assertAlmostEqual(after['cache_hit_rate'], after['cache_read_tokens'] * 100.0 / prompt)
@@ -196,7 +196,7 @@ class StartConversationWizard(models.TransientModel):
         )
 
         wa_service = self.env['ai.agent.whatsapp.service']
-        wa_service.send_message(self.phone, msg)
+        wa_service.enqueue_message(self.phone, msg)
 
         return {
             'type': 'ir.actions.client',
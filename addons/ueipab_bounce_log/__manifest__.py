@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 {
     'name': 'UEIPAB Bounce Log',
-    'version': '17.0.1.4.0',
+    'version': '17.0.1.5.1',
     'category': 'Contacts',
     'summary': 'Email bounce tracking and resolution workflow for Contacts',
     'description': """
@@ -17,6 +17,8 @@ Features:
 * State tracking: Pending → Notified → Contacted → Pendiente Akdemia → Resolved
 * Chatter audit trail on partner records
 * Mailing contact sync: resolution updates mailing.contact records by email match
+* Normalized email index (mail.email.index): exact address → partners / mailing
+  contacts lookup for multi-email fields, also callable over RPC (lookup)
 * Future: WhatsApp AI agent integration
 """,
     'author': 'UEIPAB',
@@ -1,2 +1,5 @@
 # -*- coding: utf-8 -*-
 from . import mail_bounce_log
+from . import mail_email_index
+from . import res_partner
+from . import mailing_contact
@@ -178,7 +178,7 @@ class MailBounceLog(models.Model):
         })
 
     def _sync_mailing_contacts(self, new_email):
-        """Find all mailing.contact records with the bounced email and update them.
+        """Find all mailing.contact records listing the bounced email and update them.
 
         For 'apply new email': replaces bounced email with new email.
         For 'restore original': re-adds the bounced email (no-op if already there).
@@ -193,8 +193,7 @@ class MailBounceLog(models.Model):
         if bounced.strip().lower() in PROTECTED_EMAILS:
             return
 
-        MailingContact = self.env['mailing.contact'].sudo()
-        mc_records = MailingContact.search([('email', 'ilike', bounced)])
+        mc_records = self.env['mail.email.index'].sudo()._match(bounced)[1]
 
         if not mc_records:
             return
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+from odoo import models, fields, api
+
+
+def normalize_emails(value):
+    """Lowercased, stripped, de-duplicated addresses of a multi-email field.
+
+    'Ana@X.com; ana@x.com;b@y.com' → ['ana@x.com', 'b@y.com']
+
+    Only ';' separates addresses, as in every place that removes one from
+    the field, so an indexed hit is always removable.
+    """
+    return list(dict.fromkeys(
+        e.strip().lower() for e in (value or '').split(';') if e.strip()))
+
+
+class MailEmailIndex(models.Model):
+    """One row per (normalized address, partner or mailing contact).
+
+    res.partner and mailing.contact keep several addresses in a single
+    ';'-separated email field, so finding who owns an address used to be an
+    ilike scan followed by re-splitting the field in Python. This table is
+    kept in sync on create/write of both models and answers lookup() with an
+    indexed equality match, for server code and RPC scripts alike.
+    """
+    _name = 'mail.email.index'
+    _description = 'Normalized Email Index'
+    _rec_name = 'email'
+    _log_access = False
+
+    email = fields.Char('Email', required=True, index=True)
+    partner_id = fields.Many2one(
+        'res.partner', string='Contacto', ondelete='cascade', index='btree_not_null')
+    mailing_contact_id = fields.Many2one(
+        'mailing.contact', string='Contacto Mailing', ondelete='cascade',
+        index='btree_not_null')
+
+    def init(self):
+        # Full rebuild on install/update: cheap, and heals any drift from
+        # email changes made outside the ORM.
+        self.env.cr.execute("""
+            DELETE FROM mail_email_index;
+            INSERT INTO mail_email_index (email, partner_id)
+            SELECT DISTINCT lower(trim(addr)), p.id
+              FROM res_partner p, regexp_split_to_table(p.email, ';') addr
+             WHERE p.email IS NOT NULL AND trim(addr) <> '';
+            INSERT INTO mail_email_index (email, mailing_contact_id)
+            SELECT DISTINCT lower(trim(addr)), mc.id
+              FROM mailing_contact mc, regexp_split_to_table(mc.email, ';') addr
+             WHERE mc.email IS NOT NULL AND trim(addr) <> '';
+        """)
+
+    @api.model
+    def _sync(self, records):
+        """Re-index the addresses of res.partner or mailing.contact records."""
+        if not records:
+            return
+        column = 'partner_id' if records._name == 'res.partner' else 'mailing_contact_id'
+        self.env.cr.execute(
+            f"DELETE FROM mail_email_index WHERE {column} = ANY(%s)", (records.ids,))
+        rows = [(addr, rec.id) for rec in records for addr in normalize_emails(rec.email)]
+        if rows:
+            emails, ids = zip(*rows)
+            self.env.cr.execute(f"""
+                INSERT INTO mail_email_index (email, {column})
+                SELECT * FROM unnest(%s::varchar[], %s::int[])
+            """, (list(emails), list(ids)))
+        self.invalidate_model()
+
+    @api.model
+    def lookup(self, emails, include_archived=False):
+        """Exact, case-insensitive owners of each address.
+
+        :param emails: address or list of addresses (multi-email values are split)
+        :return: {normalized email: {'partner_ids': [...], 'mailing_contact_ids': [...]}},
+                 with an entry (possibly empty) for every requested address.
+                 Archived partners are left out unless include_archived.
+        """
+        if isinstance(emails, str):
+            emails = [emails]
+        keys = list(dict.fromkeys(addr for value in emails for addr in normalize_emails(value)))
+        result = {key: {'partner_ids': [], 'mailing_contact_ids': []} for key in keys}
+        if not keys:
+            return result
+
+        self.env['res.partner'].check_access_rights('read')
+        self.env['res.partner'].flush_model(['active'])
+        self.env.cr.execute("""
+            SELECT i.email, i.partner_id, i.mailing_contact_id
+              FROM mail_email_index i
+              LEFT JOIN res_partner p ON p.id = i.partner_id
+             WHERE i.email = ANY(%s)
+               AND (i.partner_id IS NULL OR p.active OR %s)
+             ORDER BY i.partner_id, i.mailing_contact_id
+        """, (keys, bool(include_archived)))
+        for email, partner_id, mailing_contact_id in self.env.cr.fetchall():
+            if partner_id:
+                result[email]['partner_ids'].append(partner_id)
+            if mailing_contact_id:
+                result[email]['mailing_contact_ids'].append(mailing_contact_id)
+        return result
+
+    @api.model
+    def _match(self, email, include_archived=False):
+        """(res.partner, mailing.contact) recordsets listing `email` exactly."""
+        key = (normalize_emails(email) or [''])[0]
+        found = self.lookup([key], include_archived).get(key) if key else None
+        if not found:
+            return self.env['res.partner'], self.env['mailing.contact']
+        return (self.env['res.partner'].browse(found['partner_ids']),
+                self.env['mailing.contact'].browse(found['mailing_contact_ids']))
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from odoo import models, api
+
+
+class MailingContact(models.Model):
+    _inherit = 'mailing.contact'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        contacts = super().create(vals_list)
+        self.env['mail.email.index']._sync(contacts.filtered('email'))
+        return contacts
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'email' in vals:
+            self.env['mail.email.index']._sync(self)
+        return res
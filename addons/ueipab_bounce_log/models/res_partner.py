@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from odoo import models, api
+
+
+class ResPartner(models.Model):
+    _inherit = 'res.partner'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        partners = super().create(vals_list)
+        self.env['mail.email.index']._sync(partners.filtered('email'))
+        return partners
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'email' in vals:
+            self.env['mail.email.index']._sync(self)
+        return res
@@ -1333,8 +1333,9 @@ class EnrollmentJourney(models.Model):
 
         try:
             if 'ai.agent.whatsapp.service' in self.env:
-                # Canonical sender (prod + dev): param config, credit guard, throttle.
-                self.env['ai.agent.whatsapp.service'].sudo().send_message(phone, wa_text)
+                # Canonical sender (prod + dev): queued for the rate-limited
+                # dispatcher (param config, credit guard, anti-spam interval).
+                self.env['ai.agent.whatsapp.service'].sudo().enqueue_message(phone, wa_text)
             else:
                 # Dev-only fallback: file-based Massiva config.
                 with open('/opt/odoo-dev/config/whatsapp_massiva.json') as fh:
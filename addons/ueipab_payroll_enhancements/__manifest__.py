@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 {
     'name': 'UEIPAB Payroll Enhancements',
-    'version': '17.0.1.75.0',
+    'version': '17.0.1.76.0',
     'category': 'Human Resources/Payroll',
     'summary': 'Enhanced payroll batch with total net, disbursement reports, advance payments, and custom reports menu',
     'description': """
@@ -122,6 +122,7 @@ Advance Payment System (Pago Adelanto):
         'data/arc_email_template.xml',  # ARC annual withholding certificate email
         'data/arc_ack_confirmation_template.xml',  # ARC acknowledgment confirmation email
         'data/arc_final_pdf_template.xml',  # ARC Stage 2 signed PDF delivery email
+        'data/ir_cron_data.xml',  # Batch payslip email delivery queue
 
         # 4. Views (which may inherit or use actions from above)
         'views/hr_payslip_employees_views.xml',
@@ -3,6 +3,7 @@
 from . import hr_payslip_employees
 from . import hr_payslip_run
 from . import hr_payslip
+from . import res_currency_rate
 from . import payroll_disbursement_wizard
 from . import payroll_disbursement_report
 from . import payroll_taxes_wizard
@@ -60,12 +60,10 @@ class AguinaldosDisbursementReport(models.AbstractModel):
             else:
                 # Fallback to date-based currency lookup
                 latest_date = max(payslips.mapped('date_to'))
-                rate_record = self.env['res.currency.rate'].search([
-                    ('currency_id', '=', currency.id),
-                    ('name', '<=', latest_date)
-                ], limit=1, order='name desc')
-                if rate_record:
-                    exchange_rate = rate_record.company_rate
+                rate_value, rate_date = self.env['res.currency.rate']._lookup_rate(
+                    currency, latest_date, fallback_earliest=False)
+                if rate_date:
+                    exchange_rate = rate_value
                     exchange_rate_source = f'Date lookup ({latest_date})'
 
         # Build employee data list with aguinaldo amounts
@@ -57,9 +57,12 @@ class ArcAnnualReport(models.AbstractModel):
         ])
         cert_map = {c.employee_id.id: c for c in certs}
 
+        # One grouped pass over the fiscal year for all employees
+        year_data = self._get_arc_year_data(employees, year)
+
         reports = []
         for employee in employees:
-            report = self._compute_employee_arc(employee, year)
+            report = self._compute_employee_arc(employee, year, year_data=year_data)
             cert = cert_map.get(employee.id)
             cert_number = cert.certificate_number if cert else ''
             if cert and cert.is_acknowledged:
@@ -109,7 +112,111 @@ class ArcAnnualReport(models.AbstractModel):
     # Core computation
     # ------------------------------------------------------------------
 
-    def _compute_employee_arc(self, employee, year):
+    def _get_arc_year_data(self, employees, year):
+        """Load everything the ARC needs for a fiscal year in a few queries.
+
+        - One hr.contract search: most recent contract active during the
+          year, per employee
+        - One grouped SQL query over confirmed regular payslips of the year
+          (liquidation/aguinaldo structures excluded), returning the USD
+          total of each ARC rule code per payslip plus the batch rate
+
+        Per month, the totals follow _compute_employee_arc's rules: for each
+        payslip the first matching code of each code list is used, and the
+        first payslip (by id) whose batch has an exchange rate provides the
+        month rate.
+
+        Args:
+            employees: hr.employee recordset
+            year: int fiscal year
+
+        Returns:
+            dict: {employee_id: {'contract': hr.contract,
+                                 'months': {month_num: {'payslip_count',
+                                 'batch_rate', 'salary_usd', 'extrabonus_usd',
+                                 'bonus_usd', 'sso_usd', 'faov_usd',
+                                 'paro_usd', 'ari_usd'}}}}
+        """
+        result = {emp_id: {'contract': self.env['hr.contract'], 'months': {}}
+                  for emp_id in employees.ids}
+        if not employees:
+            return result
+
+        contracts = self.env['hr.contract'].search([
+            ('employee_id', 'in', employees.ids),
+            ('state', 'in', ['open', 'close']),
+            ('date_start', '<=', '%s-12-31' % year),
+        ], order='date_start desc')
+        for contract in contracts:
+            if not result[contract.employee_id.id]['contract']:
+                result[contract.employee_id.id]['contract'] = contract
+
+        code_lists = {
+            'salary_usd': SALARY_CODES,
+            'extrabonus_usd': EXTRABONUS_CODES,
+            'bonus_usd': BONUS_CODES,
+            'sso_usd': SSO_CODES,
+            'faov_usd': FAOV_CODES,
+            'paro_usd': PARO_CODES,
+            'ari_usd': ARI_CODES,
+        }
+        all_codes = tuple({code for codes in code_lists.values() for code in codes})
+
+        for model in ('hr.payslip', 'hr.payslip.line', 'hr.payslip.run', 'hr.payroll.structure'):
+            self.env[model].flush_model()
+        self.env.cr.execute("""
+            SELECT hp.id, hp.employee_id, hp.date_from, run.exchange_rate,
+                   hpl.code, SUM(hpl.total)
+              FROM hr_payslip hp
+              JOIN hr_payroll_structure hps ON hps.id = hp.struct_id
+              LEFT JOIN hr_payslip_run run ON run.id = hp.payslip_run_id
+              LEFT JOIN hr_payslip_line hpl
+                     ON hpl.slip_id = hp.id AND hpl.code IN %(codes)s
+             WHERE hp.employee_id IN %(employee_ids)s
+               AND hp.state = 'done'
+               AND hp.date_from >= %(year_start)s
+               AND hp.date_from <= %(year_end)s
+               AND (hps.code IS NULL OR hps.code NOT IN %(excluded)s)
+               AND (hp.company_id IS NULL OR hp.company_id IN %(company_ids)s)
+          GROUP BY hp.id, run.id, hpl.code
+          ORDER BY hp.id
+        """, {
+            'codes': all_codes,
+            'employee_ids': tuple(employees.ids),
+            'year_start': date(year, 1, 1),
+            'year_end': date(year, 12, 31),
+            'excluded': tuple(LIQUIDATION_CODES),
+            'company_ids': tuple(self.env.companies.ids),
+        })
+
+        # {payslip_id: (employee_id, month_num, batch_rate, {code: total})}
+        slips = {}
+        for slip_id, employee_id, date_from, batch_rate, code, total in self.env.cr.fetchall():
+            slip = slips.setdefault(slip_id, (employee_id, date_from.month, batch_rate, {}))
+            if code:
+                slip[3][code] = total or 0.0
+
+        # Per-payslip values grouped by month, in payslip id order
+        for employee_id, month_num, batch_rate, code_totals in slips.values():
+            month = result[employee_id]['months'].setdefault(month_num, {
+                'payslip_count': 0,
+                'batch_rate': None,
+                'values': {key: [] for key in code_lists},
+            })
+            month['payslip_count'] += 1
+            if month['batch_rate'] is None and batch_rate:
+                month['batch_rate'] = batch_rate
+            for key, codes in code_lists.items():
+                month['values'][key].append(
+                    next((code_totals[c] for c in codes if c in code_totals), 0.0))
+
+        for employee_data in result.values():
+            for month in employee_data['months'].values():
+                for key, values in month.pop('values').items():
+                    month[key] = sum(values)
+        return result
+
+    def _compute_employee_arc(self, employee, year, year_data=None):
         """Build the full ARC data dict for one employee and one fiscal year.
 
         Per Decreto 1808 (SENIAT):
@@ -117,15 +224,21 @@ class ArcAnnualReport(models.AbstractModel):
         - Mid-year hires: only months from contract.date_start onward are included.
         - Ended contracts: only months up to contract.date_end are included.
         - 0% ARI employees: still included (shows Bs. 0 withheld).
+
+        Args:
+            employee: hr.employee record
+            year: int fiscal year
+            year_data: Optional result of _get_arc_year_data covering this
+                employee (loaded for the employee alone when not given)
         """
         veb = self.env['res.currency'].search([('name', '=', 'VEB')], limit=1)
 
+        if year_data is None or employee.id not in year_data:
+            year_data = self._get_arc_year_data(employee, year)
+        employee_data = year_data[employee.id]
+
         # Most recent contract active during the requested year
-        contract = self.env['hr.contract'].search([
-            ('employee_id', '=', employee.id),
-            ('state', 'in', ['open', 'close']),
-            ('date_start', '<=', '%s-12-31' % year),
-        ], limit=1, order='date_start desc')
+        contract = employee_data['contract']
 
         # Determine effective window within the fiscal year
         year_start = date(year, 1, 1)
@@ -153,19 +266,13 @@ class ArcAnnualReport(models.AbstractModel):
                 months_data.append(self._empty_month(month_num))
                 continue
 
-            # Find confirmed regular payslips in this month (exclude liquidations)
-            payslips = self.env['hr.payslip'].search([
-                ('employee_id', '=', employee.id),
-                ('date_from', '>=', month_first.strftime('%Y-%m-%d')),
-                ('date_from', '<=', month_last.strftime('%Y-%m-%d')),
-                ('state', '=', 'done'),
-                ('struct_id.code', 'not in', LIQUIDATION_CODES),
-            ])
+            # Confirmed regular payslips in this month (exclude liquidations)
+            month_totals = employee_data['months'].get(month_num)
 
             historical_rate = self._get_exchange_rate(month_first, veb)
 
-            if payslips:
-                row = self._row_from_payslips(payslips, historical_rate)
+            if month_totals:
+                row = self._row_from_totals(month_totals, historical_rate)
             elif contract:
                 row = self._row_simulated(contract, month_first, historical_rate)
                 has_estimates = True
@@ -200,25 +307,21 @@ class ArcAnnualReport(models.AbstractModel):
     # Row builders
     # ------------------------------------------------------------------
 
-    def _row_from_payslips(self, payslips, historical_rate):
-        """Build a month row from real confirmed payslip data."""
+    def _row_from_totals(self, month_totals, historical_rate):
+        """Build a month row from the confirmed payslip totals of the month.
+
+        month_totals is one month entry of _get_arc_year_data (USD totals).
+        """
         # Determine exchange rate: prefer batch rate, fallback to historical
-        rate = historical_rate
-        for p in payslips:
-            if p.payslip_run_id and p.payslip_run_id.exchange_rate:
-                rate = p.payslip_run_id.exchange_rate
-                break
-
-        def total_usd(codes):
-            return sum(self._get_lines_total(p, codes) for p in payslips)
-
-        salary_usd = total_usd(SALARY_CODES)
-        extrabonus_usd = total_usd(EXTRABONUS_CODES)
-        bonus_usd = total_usd(BONUS_CODES)
-        sso_usd = abs(total_usd(SSO_CODES))
-        faov_usd = abs(total_usd(FAOV_CODES))
-        paro_usd = abs(total_usd(PARO_CODES))
-        ari_usd = abs(total_usd(ARI_CODES))
+        rate = month_totals['batch_rate'] or historical_rate
+
+        salary_usd = month_totals['salary_usd']
+        extrabonus_usd = month_totals['extrabonus_usd']
+        bonus_usd = month_totals['bonus_usd']
+        sso_usd = abs(month_totals['sso_usd'])
+        faov_usd = abs(month_totals['faov_usd'])
+        paro_usd = abs(month_totals['paro_usd'])
+        ari_usd = abs(month_totals['ari_usd'])
 
         gross_ves = (salary_usd + extrabonus_usd + bonus_usd) * rate
         sso_ves = sso_usd * rate
@@ -289,33 +392,11 @@ class ArcAnnualReport(models.AbstractModel):
     # Helpers
     # ------------------------------------------------------------------
 
-    def _get_lines_total(self, payslip, codes):
-        """Sum totals for the first matching rule code in the payslip lines."""
-        for code in codes:
-            lines = payslip.line_ids.filtered(lambda l, c=code: l.code == c)
-            if lines:
-                return sum(l.total for l in lines)
-        return 0.0
-
     def _get_exchange_rate(self, ref_date, veb_currency):
         """Return VES/USD rate for the closest date <= ref_date, or earliest available."""
         if not veb_currency:
             return 1.0
 
-        rate_rec = self.env['res.currency.rate'].search([
-            ('currency_id', '=', veb_currency.id),
-            ('name', '<=', ref_date),
-        ], limit=1, order='name desc')
-
-        if not rate_rec:
-            rate_rec = self.env['res.currency.rate'].search([
-                ('currency_id', '=', veb_currency.id),
-            ], limit=1, order='name asc')
-
-        if rate_rec:
-            if hasattr(rate_rec, 'company_rate') and rate_rec.company_rate:
-                return rate_rec.company_rate
-            if rate_rec.rate > 0:
-                return 1.0 / rate_rec.rate
-
-        return 1.0
+        rate_value, _rate_date = self.env['res.currency.rate']._lookup_rate(
+            veb_currency, ref_date)
+        return rate_value or 1.0
@@ -146,11 +146,9 @@ class HrLoan(models.Model):
             [('name', 'in', ['VEB', 'VES']), ('active', '=', True)], limit=1)
         if not veb:
             return 0.0
-        domain = [('currency_id', '=', veb.id)]
-        if for_date:
-            domain.append(('name', '<=', for_date))
-        rate = self.env['res.currency.rate'].search(domain, order='name desc', limit=1)
-        return rate.company_rate if rate else 0.0
+        rate, _rate_date = self.env['res.currency.rate']._lookup_rate(
+            veb, for_date, fallback_earliest=False)
+        return rate
 
     def _default_loan_account(self):
         return self.env['account.account'].search(
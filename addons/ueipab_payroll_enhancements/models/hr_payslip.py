@@ -154,6 +154,45 @@ class HrPayslip(models.Model):
         help='Date and time when the last reminder was sent.'
     )
 
+    # ========================================
+    # BATCH EMAIL DELIVERY QUEUE FIELDS
+    # ========================================
+
+    email_delivery_state = fields.Selection([
+        ('queued', 'Queued'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ], string='Email Delivery', copy=False, readonly=True, index=True,
+        help='Status of the payslip email queued from the batch. '
+             'Processed in the background by the batch email delivery cron.'
+    )
+
+    email_delivery_template_id = fields.Many2one(
+        'mail.template',
+        string='Delivery Template',
+        copy=False,
+        readonly=True,
+        ondelete='set null',
+        help='Email template selected on the batch when the email was queued.'
+    )
+
+    email_delivery_mail_id = fields.Many2one(
+        'mail.mail',
+        string='Delivery Mail',
+        copy=False,
+        readonly=True,
+        ondelete='set null',
+        help='Outgoing mail rendered for this payslip.'
+    )
+
+    email_delivery_error = fields.Text(
+        string='Delivery Error',
+        copy=False,
+        readonly=True,
+        help='Reason of the last delivery failure, if any.'
+    )
+
     # ========================================
     # PARTIAL QUINCENA PRO-RATION
     # ========================================
@@ -212,6 +251,37 @@ class HrPayslip(models.Model):
                 a.number or a.name for a in advances
             ) if advances else False
 
+    # ========================================
+    # COMPUTATION HELPERS
+    # ========================================
+
+    def action_compute_sheet(self):
+        """Defer the batch totals until every slip of the batch is computed.
+
+        Line unlink/create would otherwise mark total_net_amount dirty and
+        any intermediate flush would recompute it once per slip.
+        """
+        batches = self.mapped('payslip_run_id')
+        if not batches:
+            return super().action_compute_sheet()
+        deferred = [batches._fields['total_net_amount'],
+                    batches._fields['advance_total_amount']]
+        with self.env.protecting(deferred, batches):
+            res = super().action_compute_sheet()
+        for field in deferred:
+            self.env.add_to_compute(field, batches)
+        return res
+
+    @api.model
+    def _get_latest_veb_rate(self):
+        """Latest BCV rate for compute_sheet, via the shared rate service."""
+        veb_currency = self.env['res.currency'].search([
+            ('name', 'in', ['VEB', 'VES', 'VEF']),
+            ('active', '=', True)
+        ], limit=1)
+        rate, _rate_date = self.env['res.currency.rate']._lookup_rate(veb_currency)
+        return rate
+
     # ========================================
     # EMAIL TEMPLATE HELPER METHODS
     # ========================================
@@ -469,6 +539,75 @@ class HrPayslip(models.Model):
             },
         }
 
+    def _queue_email_delivery(self, template):
+        """Mark payslips for background delivery with the given template.
+
+        The batch email delivery cron picks them up (see
+        hr.payslip.run._cron_process_email_queue) and is woken up right away.
+        """
+        if not self:
+            return
+        self.write({
+            'email_delivery_state': 'queued',
+            'email_delivery_template_id': template.id,
+            'email_delivery_mail_id': False,
+            'email_delivery_error': False,
+        })
+        self.env['hr.payslip.run']._trigger_email_queue()
+
+    def _render_delivery_email(self):
+        """Render the queued email of one payslip into an outgoing mail.mail.
+
+        Rendering errors (template, QWeb PDF) only fail this payslip: they are
+        caught inside a savepoint and stored on email_delivery_error.
+        """
+        self.ensure_one()
+        template = self.email_delivery_template_id
+        email_to = self.employee_id.work_email
+        if not template or not email_to:
+            self.write({
+                'email_delivery_state': 'failed',
+                'email_delivery_error': (
+                    _('No email template selected.') if not template
+                    else _('Employee %s has no work email configured.') % self.employee_id.name
+                ),
+            })
+            return
+        try:
+            with self.env.cr.savepoint():
+                mail_id = template.send_mail(
+                    self.id,
+                    force_send=False,
+                    email_values={'email_to': email_to},
+                )
+        except Exception as e:
+            _logger.warning("Payslip %s: email rendering failed: %s", self.number, e)
+            self.write({
+                'email_delivery_state': 'failed',
+                'email_delivery_error': str(e),
+            })
+            return
+        self.write({
+            'email_delivery_state': 'sending',
+            'email_delivery_mail_id': mail_id,
+        })
+
+    def _sync_email_delivery_state(self):
+        """Copy the outcome of the rendered mails back to the payslips.
+
+        A mail that no longer exists was sent and auto-deleted; mails still
+        outgoing are left as 'sending' for the next cron run.
+        """
+        for slip in self.filtered(lambda s: s.email_delivery_state == 'sending'):
+            mail = slip.email_delivery_mail_id.exists()
+            if not mail or mail.state == 'sent':
+                slip.email_delivery_state = 'sent'
+            elif mail.state in ('exception', 'cancel'):
+                slip.write({
+                    'email_delivery_state': 'failed',
+                    'email_delivery_error': mail.failure_reason or _('Mail delivery failed.'),
+                })
+
     def action_send_ack_reminder_single(self):
         """Send acknowledgment reminder to this employee."""
         self.ensure_one()
@@ -83,9 +83,19 @@ class HrPayslipEmployees(models.TransientModel):
         # Generate payslips
         payslips = self.env['hr.payslip']
 
+        # Worked days of all employees computed in one pass (calendar
+        # attendances once per working schedule, leaves fetched together)
+        Payslip = self.env['hr.payslip']
+        contract_ids = []
+        for employee in self.employee_ids:
+            contract_ids += Payslip.get_contract(employee, from_date, to_date)
+        worked_day_lines = Payslip._get_batch_worked_day_lines(
+            self.env['hr.contract'].browse(contract_ids), from_date, to_date)
+        Payslip = Payslip.with_context(worked_day_lines=worked_day_lines)
+
         for employee in self.employee_ids:
             # Get default data from contract
-            slip_data = self.env['hr.payslip'].onchange_employee_id(
+            slip_data = Payslip.onchange_employee_id(
                 from_date, to_date, employee.id, contract_id=False
             )
 
@@ -150,6 +150,47 @@ class HrPayslipRun(models.Model):
                 1 for s in batch.slip_ids if s.has_period_advance
             )
 
+    # ========================================
+    # BATCH EMAIL DELIVERY PROGRESS
+    # ========================================
+
+    email_queued_count = fields.Integer(
+        string='Emails Pending',
+        compute='_compute_email_delivery_counts',
+        help='Payslip emails queued or being sent in the background.',
+    )
+    email_sent_count = fields.Integer(
+        string='Emails Sent',
+        compute='_compute_email_delivery_counts',
+    )
+    email_failed_count = fields.Integer(
+        string='Emails Failed',
+        compute='_compute_email_delivery_counts',
+    )
+
+    @api.depends('slip_ids.email_delivery_state')
+    def _compute_email_delivery_counts(self):
+        counts = {}
+        run_ids = [rid for rid in self._origin.ids if isinstance(rid, int)]
+        if run_ids:
+            groups = self.env['hr.payslip'].read_group(
+                [('payslip_run_id', 'in', run_ids),
+                 ('email_delivery_state', '!=', False)],
+                ['payslip_run_id'],
+                ['payslip_run_id', 'email_delivery_state'],
+                lazy=False,
+            )
+            for group in groups:
+                key = (group['payslip_run_id'][0], group['email_delivery_state'])
+                counts[key] = group['__count']
+        for batch in self:
+            batch_id = batch._origin.id
+            batch.email_queued_count = (
+                counts.get((batch_id, 'queued'), 0) + counts.get((batch_id, 'sending'), 0)
+            )
+            batch.email_sent_count = counts.get((batch_id, 'sent'), 0)
+            batch.email_failed_count = counts.get((batch_id, 'failed'), 0)
+
     # ========================================
     # ONCHANGE METHODS
     # ========================================
@@ -207,6 +248,8 @@ class HrPayslipRun(models.Model):
         ], limit=1)
         return template.id if template else False
 
+    _NET_RULE_CODES = ('VE_NET', 'VE_NET_V2', 'AGUINALDOS', 'LIQUID_NET_V2')
+
     @api.depends('slip_ids', 'slip_ids.state', 'slip_ids.line_ids', 'slip_ids.line_ids.total')
     def _compute_total_net_amount(self):
         """Calculate total net payable for all payslips in batch.
@@ -222,34 +265,46 @@ class HrPayslipRun(models.Model):
             - Uses @api.depends for automatic recomputation
             - Stored in database for performance (store=True)
             - Filters out cancelled payslips only
+            - One grouped query over hr_payslip_line / hr_salary_rule for all
+              batches in self (no per-slip line_ids.filtered())
+            - hr.payslip.action_compute_sheet defers this recompute until all
+              slips of the batch are computed
         """
-        for batch in self:
-            # Get all payslips except cancelled ones (include draft for pre-validation)
-            valid_slips = batch.slip_ids.filtered(
-                lambda s: s.state != 'cancel'
-            )
+        totals = {}
+        real_batches = self.filtered('id')
+        if real_batches:
+            self.env['hr.payslip.line'].flush_model(['slip_id', 'salary_rule_id', 'total'])
+            self.env['hr.payslip'].flush_model(['payslip_run_id', 'state', 'struct_id'])
+            # Per slip, pick the NET line: known NET codes first, then any
+            # NET-category line belonging to the payslip's own structure rules
+            # (excludes BASE aggregator NET line which overstates the total).
+            self.env.cr.execute("""
+                SELECT net.payslip_run_id, SUM(net.total)
+                FROM (
+                    SELECT DISTINCT ON (hp.id) hp.payslip_run_id, pl.total
+                    FROM hr_payslip hp
+                    JOIN hr_payslip_line pl ON pl.slip_id = hp.id
+                    JOIN hr_salary_rule r ON r.id = pl.salary_rule_id
+                    LEFT JOIN hr_salary_rule_category c ON c.id = r.category_id
+                    LEFT JOIN hr_structure_salary_rule_rel rel
+                        ON rel.struct_id = hp.struct_id AND rel.rule_id = r.id
+                    WHERE hp.payslip_run_id IN %(run_ids)s
+                      AND hp.state != 'cancel'
+                      AND (r.code IN %(net_codes)s
+                           OR (rel.rule_id IS NOT NULL
+                               AND c.code = 'NET' AND pl.total > 0))
+                    ORDER BY hp.id, (r.code IN %(net_codes)s) DESC,
+                             pl.contract_id, pl.sequence, pl.id
+                ) net
+                GROUP BY net.payslip_run_id
+            """, {
+                'run_ids': tuple(real_batches.ids),
+                'net_codes': self._NET_RULE_CODES,
+            })
+            totals = dict(self.env.cr.fetchall())
 
-            # Sum the NET line from each payslip
-            total = 0.0
-            for slip in valid_slips:
-                # Find the NET salary rule line — try known codes first, then fall back to
-                # any NET-category line belonging to the payslip's own structure rules
-                # (excludes BASE aggregator NET line which overstates the total).
-                net_line = slip.line_ids.filtered(
-                    lambda l: l.salary_rule_id.code in ('VE_NET', 'VE_NET_V2', 'AGUINALDOS', 'LIQUID_NET_V2')
-                )
-                if not net_line:
-                    struct_rule_ids = set(slip.struct_id.rule_ids.ids)
-                    net_line = slip.line_ids.filtered(
-                        lambda l: l.salary_rule_id.id in struct_rule_ids
-                        and l.salary_rule_id.category_id.code == 'NET'
-                        and l.total > 0
-                    )
-                if net_line:
-                    # Should only be one NET line per payslip
-                    total += net_line[0].total
-
-            batch.total_net_amount = total
+        for batch in self:
+            batch.total_net_amount = totals.get(batch.id, 0.0)
 
     @api.depends('slip_ids.exchange_rate_used')
     def _compute_exchange_rate(self):
@@ -591,7 +646,7 @@ class HrPayslipRun(models.Model):
     # ========================================
 
     def action_send_batch_emails(self):
-        """Send individual payslips to each employee via email.
+        """Queue individual payslip emails for background delivery.
 
         Business Use Case:
             - User creates/confirms payslips in a batch
@@ -601,11 +656,14 @@ class HrPayslipRun(models.Model):
 
         Technical Implementation:
             - Uses selected email_template_id or fallback to default
-            - Sends mail using template.send_mail()
-            - Posts message to batch chatter with count
+            - Marks each payslip with a work email as 'queued' and returns
+              immediately; the PDF rendering and SMTP delivery run in the
+              batch email delivery cron (see _cron_process_email_queue)
+            - Payslips already queued or being sent are not queued twice
+            - Progress and failures are shown on the batch form
 
         Returns:
-            bool: True if emails sent successfully
+            dict: Notification action with the number of queued emails
 
         Raises:
             UserError: If no payslips in batch or no template selected
@@ -627,30 +685,124 @@ class HrPayslipRun(models.Model):
                 "Please select an email template or update the module to restore default templates."
             ))
 
-        sent_count = 0
-        for slip in self.slip_ids:
-            if slip.employee_id.work_email:
-                template.send_mail(
-                    slip.id,
-                    force_send=True,
-                    email_values={'email_to': slip.employee_id.work_email}
-                )
-                sent_count += 1
+        slips = self.slip_ids.filtered(
+            lambda s: s.employee_id.work_email
+            and s.email_delivery_state not in ('queued', 'sending')
+        )
+        slips._queue_email_delivery(template)
 
-        # Return success notification
         return {
             'type': 'ir.actions.client',
             'tag': 'display_notification',
             'params': {
-                'title': _('Emails Sent'),
-                'message': _("Payslips sent by email to %s employees using template '%s'.") % (
-                    sent_count, template.name
+                'title': _('Emails Queued'),
+                'message': _("%s payslip emails queued using template '%s'. "
+                             "Delivery progress is shown on the batch.") % (
+                    len(slips), template.name
                 ),
                 'type': 'success',
                 'sticky': False,
             }
         }
 
+    def action_retry_failed_emails(self):
+        """Queue again the payslip emails of this batch that failed."""
+        self.ensure_one()
+        failed = self.slip_ids.filtered(lambda s: s.email_delivery_state == 'failed')
+        if not failed:
+            raise UserError(_("There are no failed payslip emails in this batch."))
+        for template in failed.email_delivery_template_id:
+            failed.filtered(
+                lambda s: s.email_delivery_template_id == template
+            )._queue_email_delivery(template)
+        failed.filtered(
+            lambda s: not s.email_delivery_template_id
+        )._queue_email_delivery(self.email_template_id)
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Emails Queued'),
+                'message': _("%s failed payslip emails queued again.") % len(failed),
+                'type': 'success',
+                'sticky': False,
+            }
+        }
+
+    # ========================================
+    # BATCH EMAIL DELIVERY QUEUE
+    # ========================================
+
+    @api.model
+    def _trigger_email_queue(self, delay=0):
+        """Wake up the batch email delivery cron, optionally after a delay (seconds)."""
+        cron = self.env.ref(
+            'ueipab_payroll_enhancements.ir_cron_payslip_email_queue',
+            raise_if_not_found=False,
+        )
+        if cron:
+            cron._trigger(at=fields.Datetime.now() + timedelta(seconds=delay))
+
+    @api.model
+    def _cron_process_email_queue(self):
+        """Render and send queued payslip emails, a rate-limited chunk per run.
+
+        Technical Implementation:
+            1. Render: up to ``email_queue_batch_size`` queued payslips are
+               rendered into outgoing mail.mail records (template + PDF),
+               each in its own savepoint, then committed together
+            2. Send: the rendered mails are sent with a single
+               mail.mail.send() call, which opens one SMTP connection per
+               mail server and reuses it for the whole chunk
+            3. Sync: mail outcome (sent / exception) is copied back to the
+               payslips so the batch shows progress and failures
+            4. While work remains, the cron re-triggers itself after
+               ``email_queue_interval`` seconds (rate limit)
+
+        Configuration (ir.config_parameter):
+            - ueipab_payroll_enhancements.email_queue_batch_size (default 50)
+            - ueipab_payroll_enhancements.email_queue_interval (default 60)
+        """
+        ICP = self.env['ir.config_parameter'].sudo()
+        batch_size = int(ICP.get_param(
+            'ueipab_payroll_enhancements.email_queue_batch_size', 50))
+        interval = int(ICP.get_param(
+            'ueipab_payroll_enhancements.email_queue_interval', 60))
+        Payslip = self.env['hr.payslip']
+
+        # 1. Render queued payslips into outgoing mails
+        queued = Payslip.search(
+            [('email_delivery_state', '=', 'queued')],
+            order='payslip_run_id, id', limit=batch_size,
+        )
+        for slip in queued:
+            slip._render_delivery_email()
+        if queued:
+            self.env.cr.commit()
+
+        # 2. Send rendered mails through one SMTP session per mail server
+        sending = Payslip.search(
+            [('email_delivery_state', '=', 'sending')],
+            order='payslip_run_id, id', limit=batch_size,
+        )
+        mails = sending.email_delivery_mail_id.exists().filtered(
+            lambda m: m.state == 'outgoing')
+        if mails:
+            mails.send(auto_commit=True)
+
+        # 3. Report mail outcome back to the payslips
+        sending._sync_email_delivery_state()
+        self.env.cr.commit()
+
+        remaining = Payslip.search_count(
+            [('email_delivery_state', 'in', ('queued', 'sending'))], limit=1)
+        if remaining:
+            self._trigger_email_queue(delay=interval)
+        _logger.info(
+            "Payslip email queue: %d rendered, %d sent in this run",
+            len(queued), len(mails),
+        )
+
     def action_cancel(self):
         """Cancel the payslip batch and all associated payslips.
 
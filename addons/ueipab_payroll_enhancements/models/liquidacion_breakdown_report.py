@@ -5,9 +5,10 @@ Relación de Liquidación Report Model
 Generates detailed breakdown of liquidation calculations with formulas.
 """
 
+from itertools import accumulate
+
 from odoo import models, api, _
 from datetime import date, timedelta
-from dateutil.relativedelta import relativedelta
 
 
 class LiquidacionBreakdownReport(models.AbstractModel):
@@ -504,20 +505,14 @@ class LiquidacionBreakdownReport(models.AbstractModel):
         # Accumulate VEB month-by-month using historical rates
         # CRITICAL: Must use actual historical rate for each month (not latest rate)
         # This matches the Prestaciones Soc. Intereses report calculation
-        accumulated_veb = 0.0
-        current_date = start_date
-
-        while current_date <= end_date:
-            # Get HISTORICAL rate for this specific month (same logic as Prestaciones report)
-            month_rate = self._get_historical_exchange_rate(current_date, currency)
-            month_interest_veb = interest_per_month * month_rate
-            accumulated_veb += month_interest_veb
-
-            current_date = current_date + relativedelta(months=1)
-            if current_date > end_date:
-                break
+        # (same accrual schedule engine, rates resolved in one pass)
+        schedule = self.env['report.ueipab_payroll_enhancements.prestaciones_interest']
+        month_dates = schedule._get_accrual_months(start_date, end_date)
+        month_rates = schedule._get_historical_rates(month_dates, currency)
+        accumulated_veb = list(accumulate(
+            [interest_per_month * month_rate for month_rate in month_rates]))
 
-        return accumulated_veb
+        return accumulated_veb[-1] if accumulated_veb else 0.0
 
     def _get_historical_exchange_rate(self, date_ref, currency):
         """Get historical exchange rate for a specific date.
@@ -536,22 +531,11 @@ class LiquidacionBreakdownReport(models.AbstractModel):
             return 1.0
 
         if currency.name == 'VEB':
-            # Get rate valid on or before the specific date
-            rate_record = self.env['res.currency.rate'].search([
-                ('currency_id', '=', currency.id),
-                ('name', '<=', date_ref)
-            ], limit=1, order='name desc')
-
-            # If no rate found for date, use earliest available rate
-            if not rate_record:
-                rate_record = self.env['res.currency.rate'].search([
-                    ('currency_id', '=', currency.id)
-                ], limit=1, order='name asc')
-
-            if rate_record and hasattr(rate_record, 'company_rate'):
-                return rate_record.company_rate
-            elif rate_record and rate_record.rate > 0:
-                return 1.0 / rate_record.rate
+            # Rate valid on or before the date, else earliest available rate
+            rate_value, rate_date = self.env['res.currency.rate']._lookup_rate(
+                currency, date_ref)
+            if rate_date:
+                return rate_value
 
         return 1.0
 
@@ -581,28 +565,13 @@ class LiquidacionBreakdownReport(models.AbstractModel):
                 return custom_rate
 
             # PRIORITY 2: USE CUSTOM DATE IF PROVIDED
-            if custom_date:
-                rate_record = self.env['res.currency.rate'].search([
-                    ('currency_id', '=', currency.id),
-                    ('name', '<=', custom_date)
-                ], limit=1, order='name desc')
-            else:
-                # PRIORITY 3: USE LATEST AVAILABLE RATE (2025-11-21 Enhancement)
-                # Always use the most recent rate in system, regardless of payslip date
-                rate_record = self.env['res.currency.rate'].search([
-                    ('currency_id', '=', currency.id)
-                ], limit=1, order='name desc')
-
-            if not rate_record:
-                # Fallback: Get any rate available
-                rate_record = self.env['res.currency.rate'].search([
-                    ('currency_id', '=', currency.id)
-                ], limit=1, order='name asc')
-
-            if rate_record and hasattr(rate_record, 'company_rate'):
-                return rate_record.company_rate
-            elif rate_record and rate_record.rate > 0:
-                return 1.0 / rate_record.rate
+            # PRIORITY 3: USE LATEST AVAILABLE RATE (2025-11-21 Enhancement)
+            # Always use the most recent rate in system, regardless of payslip date
+            # Fallback: earliest rate when custom_date predates the series
+            rate_value, rate_date = self.env['res.currency.rate']._lookup_rate(
+                currency, custom_date)
+            if rate_date:
+                return rate_value
 
         return 1.0
 
@@ -629,31 +598,11 @@ class LiquidacionBreakdownReport(models.AbstractModel):
                 return custom_rate, date_ref  # Return payslip date for custom rate
 
             # PRIORITY 2: USE CUSTOM DATE IF PROVIDED
-            if custom_date:
-                rate_record = self.env['res.currency.rate'].search([
-                    ('currency_id', '=', currency.id),
-                    ('name', '<=', custom_date)
-                ], limit=1, order='name desc')
-            else:
-                # PRIORITY 3: USE LATEST AVAILABLE RATE (2025-11-21 Enhancement)
-                rate_record = self.env['res.currency.rate'].search([
-                    ('currency_id', '=', currency.id)
-                ], limit=1, order='name desc')
-
-            if not rate_record:
-                # Fallback: Get any rate available
-                rate_record = self.env['res.currency.rate'].search([
-                    ('currency_id', '=', currency.id)
-                ], limit=1, order='name asc')
-
-            if rate_record:
-                rate_value = None
-                if hasattr(rate_record, 'company_rate'):
-                    rate_value = rate_record.company_rate
-                elif rate_record.rate > 0:
-                    rate_value = 1.0 / rate_record.rate
-
-                if rate_value:
-                    return rate_value, rate_record.name  # Return rate and its date
+            # PRIORITY 3: USE LATEST AVAILABLE RATE (2025-11-21 Enhancement)
+            # Fallback: earliest rate when custom_date predates the series
+            rate_value, rate_date = self.env['res.currency.rate']._lookup_rate(
+                currency, custom_date)
+            if rate_value:
+                return rate_value, rate_date  # Return rate and its date
 
         return 1.0, None
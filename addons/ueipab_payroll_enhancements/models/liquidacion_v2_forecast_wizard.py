@@ -229,14 +229,8 @@ class LiquidacionV2ForecastWizard(models.TransientModel):
         veb = self.env['res.currency'].search([('name', '=', 'VEB')], limit=1)
         if not veb:
             return 1.0
-        rate_rec = self.env['res.currency.rate'].search(
-            [('currency_id', '=', veb.id)],
-            order='name desc',
-            limit=1,
-        )
-        if rate_rec and rate_rec.company_rate:
-            return rate_rec.company_rate
-        return 1.0
+        rate, _rate_date = self.env['res.currency.rate']._lookup_rate(veb)
+        return rate or 1.0
 
     # ── main compute action ───────────────────────────────────────────────────
 
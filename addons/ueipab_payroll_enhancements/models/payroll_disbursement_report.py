@@ -68,12 +68,10 @@ class PayrollDisbursementReport(models.AbstractModel):
             else:
                 # Priority 3: Fallback to date-based currency lookup
                 latest_date = max(payslips.mapped('date_to'))
-                rate_record = self.env['res.currency.rate'].search([
-                    ('currency_id', '=', currency.id),
-                    ('name', '<=', latest_date)
-                ], limit=1, order='name desc')
-                if rate_record:
-                    exchange_rate = rate_record.company_rate
+                rate_value, rate_date = self.env['res.currency.rate']._lookup_rate(
+                    currency, latest_date, fallback_earliest=False)
+                if rate_date:
+                    exchange_rate = rate_value
                     exchange_rate_source = f'Date lookup ({latest_date})'
 
         # Return context for QWeb template
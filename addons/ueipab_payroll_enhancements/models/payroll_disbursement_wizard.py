@@ -360,12 +360,10 @@ class PayrollDisbursementWizard(models.TransientModel):
                 # Priority 3: Fallback to date-based currency lookup
                 latest_date = max(payslips.mapped('date_to'))
                 veb_currency = self.currency_id
-                rate_record = self.env['res.currency.rate'].search([
-                    ('currency_id', '=', veb_currency.id),
-                    ('name', '<=', latest_date)
-                ], limit=1, order='name desc')
-                if rate_record:
-                    exchange_rate = rate_record.company_rate
+                rate_value, rate_date = self.env['res.currency.rate']._lookup_rate(
+                    veb_currency, latest_date, fallback_earliest=False)
+                if rate_date:
+                    exchange_rate = rate_value
 
         # Write data rows
         row = 3
@@ -154,14 +154,11 @@ class PayrollRequisitionWizard(models.TransientModel):
             self.exchange_rate_source = ''
             return
 
-        rate_record = self.env['res.currency.rate'].search(
-            [('currency_id', '=', self.currency_id.id)],
-            limit=1, order='name desc'
-        )
-        if rate_record:
-            self.exchange_rate = rate_record.company_rate
-            self.exchange_rate_date = rate_record.name
-            self.exchange_rate_source = 'BCV al %s' % rate_record.name.strftime('%d/%m/%Y')
+        rate_value, rate_date = self.env['res.currency.rate']._lookup_rate(self.currency_id)
+        if rate_date:
+            self.exchange_rate = rate_value
+            self.exchange_rate_date = rate_date
+            self.exchange_rate_source = 'BCV al %s' % rate_date.strftime('%d/%m/%Y')
         else:
             self.exchange_rate = 0.0
             self.exchange_rate_date = False
@@ -229,10 +226,10 @@ class PayrollRequisitionWizard(models.TransientModel):
         usd = self.env.ref('base.USD')
         if self.currency_id != usd and self.exchange_rate > 0:
             return self.exchange_rate
-        rate_rec = self.env['res.currency.rate'].search(
-            [('currency_id.name', '=', 'VEB')], limit=1, order='name desc'
-        )
-        return rate_rec.company_rate if rate_rec else 0.0
+        veb = self.env['res.currency'].with_context(active_test=False).search(
+            [('name', '=', 'VEB')], limit=1)
+        rate_value, _rate_date = self.env['res.currency.rate']._lookup_rate(veb)
+        return rate_value
 
     def _get_rate_source_label(self):
         """
@@ -250,12 +247,9 @@ class PayrollRequisitionWizard(models.TransientModel):
         if self.exchange_rate_date:
             return 'BCV al %s' % self.exchange_rate_date.strftime('%d/%m/%Y')
         # Otherwise re-query the latest available rate record
-        rate_record = self.env['res.currency.rate'].search(
-            [('currency_id', '=', self.currency_id.id)],
-            limit=1, order='name desc'
-        )
-        if rate_record:
-            return 'BCV al %s' % rate_record.name.strftime('%d/%m/%Y')
+        _rate_value, rate_date = self.env['res.currency.rate']._lookup_rate(self.currency_id)
+        if rate_date:
+            return 'BCV al %s' % rate_date.strftime('%d/%m/%Y')
         return 'Tasa personalizada'
 
     def _compute_contract_data(self, contract):
@@ -5,9 +5,11 @@ Comprobante de Pago (Compact) Report Model
 Generates single-page compact payslip with currency conversion support.
 """
 
-from odoo import models, api, _
+from collections import defaultdict
 from datetime import date
 
+from odoo import models, api, _
+
 
 class PayslipCompactReport(models.AbstractModel):
     """Report model for Comprobante de Pago (Compact)."""
@@ -52,17 +54,30 @@ class PayslipCompactReport(models.AbstractModel):
             else:
                 rate_date = data['rate_date']
 
+        # Batch preparation: all lines in one read, employee/contract fields
+        # prefetched for the whole recordset, batch-level rate resolved once
+        lines_by_slip = self._read_payslip_lines(payslips)
+        payslips.mapped('employee_id.job_id.name')
+        payslips.mapped('employee_id.department_id.name')
+        payslips.mapped('employee_id.bank_account_id.acc_number')
+        payslips.mapped('contract_id.wage')
+        batch_rate = self._get_batch_exchange_rate(
+            currency, use_custom_rate, custom_exchange_rate, rate_date)
+
         # Generate report data for each payslip
         reports = []
         for payslip in payslips:
             # Get exchange rate
-            exchange_rate, rate_source_date, rate_source_type = self._get_exchange_rate(
-                payslip,
-                currency,
-                use_custom_rate,
-                custom_exchange_rate,
-                rate_date
-            )
+            if batch_rate:
+                exchange_rate, rate_source_date, rate_source_type = batch_rate
+            else:
+                exchange_rate, rate_source_date, rate_source_type = self._get_exchange_rate(
+                    payslip,
+                    currency,
+                    use_custom_rate,
+                    custom_exchange_rate,
+                    rate_date
+                )
 
             # Prepare report data
             report_data = self._prepare_report_data(
@@ -70,7 +85,8 @@ class PayslipCompactReport(models.AbstractModel):
                 currency,
                 exchange_rate,
                 rate_source_date,
-                rate_source_type
+                rate_source_type,
+                lines=lines_by_slip.get(payslip.id, []),
             )
             reports.append(report_data)
 
@@ -83,6 +99,59 @@ class PayslipCompactReport(models.AbstractModel):
             'reports': reports,
         }
 
+    def _read_payslip_lines(self, payslips):
+        """Read the lines of all payslips at once.
+
+        Args:
+            payslips: hr.payslip recordset
+
+        Returns:
+            dict: {payslip_id: [line dict, ...]} in payslip line order, each
+                dict with name, code, quantity, rate, total and category_code
+        """
+        lines_by_slip = defaultdict(list)
+        if not payslips:
+            return lines_by_slip
+        lines = self.env['hr.payslip.line'].search_read(
+            [('slip_id', 'in', payslips.ids)],
+            ['slip_id', 'name', 'code', 'quantity', 'rate', 'total', 'category_id'],
+            order='slip_id, contract_id, sequence, id',
+        )
+        category_ids = {line['category_id'][0] for line in lines if line['category_id']}
+        category_codes = {
+            cat['id']: cat['code']
+            for cat in self.env['hr.salary.rule.category'].browse(category_ids).read(['code'])
+        }
+        for line in lines:
+            line['category_code'] = (
+                category_codes.get(line['category_id'][0]) if line['category_id'] else False
+            )
+            lines_by_slip[line['slip_id'][0]].append(line)
+        return lines_by_slip
+
+    def _get_batch_exchange_rate(self, currency, use_custom, custom_rate, rate_date):
+        """Resolve the exchange rate shared by every payslip of the report.
+
+        Covers the cases of _get_exchange_rate that do not depend on the
+        payslip (USD, custom rate, wizard rate date).
+
+        Returns:
+            tuple: (exchange_rate, rate_source_date, rate_source_type), or
+                None when the rate must be resolved per payslip
+        """
+        if currency.name == 'USD':
+            return 1.0, None, 'usd'
+        if currency.name != 'VEB':
+            return 1.0, None, 'fallback'
+        if use_custom and custom_rate and custom_rate > 0:
+            return custom_rate, None, 'custom'
+        if rate_date:
+            rate_value, rate_source = self.env['res.currency.rate']._lookup_rate(
+                currency, rate_date, fallback_earliest=False)
+            if rate_value:
+                return rate_value, rate_source, 'wizard_date'
+        return None
+
     def _get_exchange_rate(self, payslip, currency, use_custom, custom_rate, rate_date):
         """Get exchange rate for currency conversion.
 
@@ -115,18 +184,10 @@ class PayslipCompactReport(models.AbstractModel):
 
             # PRIORITY 2: USE CUSTOM DATE IF PROVIDED
             if rate_date:
-                rate_record = self.env['res.currency.rate'].search([
-                    ('currency_id', '=', currency.id),
-                    ('name', '<=', rate_date)
-                ], limit=1, order='name desc')
-                if rate_record:
-                    rate_value = None
-                    if hasattr(rate_record, 'company_rate'):
-                        rate_value = rate_record.company_rate
-                    elif rate_record.rate > 0:
-                        rate_value = 1.0 / rate_record.rate
-                    if rate_value:
-                        return rate_value, rate_record.name, 'wizard_date'
+                rate_value, rate_source = self.env['res.currency.rate']._lookup_rate(
+                    currency, rate_date, fallback_earliest=False)
+                if rate_value:
+                    return rate_value, rate_source, 'wizard_date'
 
             # PRIORITY 3: USE PAYSLIP'S EXCHANGE RATE (exchange_rate_used field)
             if payslip.exchange_rate_used and payslip.exchange_rate_used > 0:
@@ -137,19 +198,9 @@ class PayslipCompactReport(models.AbstractModel):
                 return payslip.exchange_rate_used, rate_source, 'payslip'
 
             # PRIORITY 4: FALLBACK TO LATEST AVAILABLE RATE
-            rate_record = self.env['res.currency.rate'].search([
-                ('currency_id', '=', currency.id)
-            ], limit=1, order='name desc')
-
-            if rate_record:
-                rate_value = None
-                if hasattr(rate_record, 'company_rate'):
-                    rate_value = rate_record.company_rate
-                elif rate_record.rate > 0:
-                    rate_value = 1.0 / rate_record.rate
-
-                if rate_value:
-                    return rate_value, rate_record.name, 'latest'
+            rate_value, rate_source = self.env['res.currency.rate']._lookup_rate(currency)
+            if rate_value:
+                return rate_value, rate_source, 'latest'
 
         # Fallback
         return 1.0, None, 'fallback'
@@ -184,7 +235,7 @@ class PayslipCompactReport(models.AbstractModel):
             return f"Bs. {formatted}"
 
     def _prepare_report_data(self, payslip, currency, exchange_rate, rate_source_date,
-                            rate_source_type):
+                            rate_source_type, lines=None):
         """Prepare all data for report template.
 
         Args:
@@ -193,10 +244,14 @@ class PayslipCompactReport(models.AbstractModel):
             exchange_rate: Exchange rate value
             rate_source_date: Date of rate record (or None)
             rate_source_type: String indicating source ('custom', 'wizard_date', 'payslip', 'latest')
+            lines: Line dicts of the payslip from _read_payslip_lines
+                (read on the fly when not given)
 
         Returns:
             dict: Complete report data
         """
+        if lines is None:
+            lines = self._read_payslip_lines(payslip).get(payslip.id, [])
         contract = payslip.contract_id
         employee = payslip.employee_id
 
@@ -241,40 +296,41 @@ class PayslipCompactReport(models.AbstractModel):
         earnings_categories = ['ALW', 'BASIC', 'GROSS', 'COMP']
 
         # Filter lines once
-        earning_lines = payslip.line_ids.filtered(
-            lambda l: l.category_id.code in earnings_categories and l.total > 0 and l.code != 'VE_GROSS_V2'
-        )
+        earning_lines = [
+            l for l in lines
+            if l['category_code'] in earnings_categories and l['total'] > 0 and l['code'] != 'VE_GROSS_V2'
+        ]
 
         cesta_ticket_usd = 0.0
 
         for line in earning_lines:
             # Point 2: Accumulate VE_BONUS_V2 for consolidated "Bonos" line
-            if line.code == 'VE_BONUS_V2':
-                bonos_total_usd += line.total
+            if line['code'] == 'VE_BONUS_V2':
+                bonos_total_usd += line['total']
                 continue
 
             # Track Cesta Ticket separately for its own display line
-            if line.code == 'VE_CESTA_TICKET_V2':
-                cesta_ticket_usd += line.total
+            if line['code'] == 'VE_CESTA_TICKET_V2':
+                cesta_ticket_usd += line['total']
                 continue
 
             # Process other lines and apply renaming
-            amount_converted = self._convert_amount(line.total, exchange_rate)
-            line_name = line.name
+            amount_converted = self._convert_amount(line['total'], exchange_rate)
+            line_name = line['name']
 
             # Point 1: Rename VE_SALARY_V2
-            if line.code == 'VE_SALARY_V2':
+            if line['code'] == 'VE_SALARY_V2':
                 line_name = 'Salario quincenal (Deducible)'
 
             # Point 3: Rename VE_EXTRABONUS_V2
-            elif line.code == 'VE_EXTRABONUS_V2':
+            elif line['code'] == 'VE_EXTRABONUS_V2':
                 line_name = 'Otros Bonos'
 
             processed_earnings.append({
                 'number': len(processed_earnings) + 1,
                 'name': line_name,
-                'code': line.code,
-                'quantity': line.quantity,
+                'code': line['code'],
+                'quantity': line['quantity'],
                 'amount': amount_converted,
                 'amount_formatted': self._format_amount(amount_converted, currency)
             })
@@ -320,37 +376,38 @@ class PayslipCompactReport(models.AbstractModel):
         deductions_total = 0.0
         deduction_categories = ['DED', 'NET']
 
-        for line in payslip.line_ids.filtered(
-            lambda l: l.category_id.code in deduction_categories and l.total < 0 and l.code != 'VE_TOTAL_DED_V2'
-        ):
-            amount_usd = abs(line.total)
+        for line in lines:
+            if (line['category_code'] not in deduction_categories or line['total'] >= 0
+                    or line['code'] == 'VE_TOTAL_DED_V2'):
+                continue
+            amount_usd = abs(line['total'])
             amount_converted = self._convert_amount(amount_usd, exchange_rate)
 
             # Get rate percentage if available
-            rate_text = f"{line.rate:.1f}%" if line.rate else ""
+            rate_text = f"{line['rate']:.1f}%" if line['rate'] else ""
 
-            line_name = line.name  # Initialize with original name
+            line_name = line['name']  # Initialize with original name
 
             # Apply renaming based on user's request
-            if line.code == 'VE_SSO_DED_V2':
+            if line['code'] == 'VE_SSO_DED_V2':
                 line_name = 'Seguro Social Obligatorio 4%'
-            elif line.code == 'VE_FAOV_DED_V2':
+            elif line['code'] == 'VE_FAOV_DED_V2':
                 line_name = 'Política Habiltacional BANAVIH 1%'
-            elif line.code == 'VE_ISLR_DED':
+            elif line['code'] == 'VE_ISLR_DED':
                 line_name = 'Retención de impuesto'
-            elif line.code == 'VE_PARO_DED_V2':
+            elif line['code'] == 'VE_PARO_DED_V2':
                 line_name = 'Seguro Social Paro Forzoso 0.5%'
-            elif line.code == 'VE_ARI_DED_V2':
+            elif line['code'] == 'VE_ARI_DED_V2':
                 # Get ARI rate from contract field
                 ari_rate = contract.ueipab_ari_withholding_rate or 0.0
                 line_name = f'Retención impuestos AR-I {ari_rate:.0f}%'
-            elif line.code == 'VE_OTHER_DED_V2':
+            elif line['code'] == 'VE_OTHER_DED_V2':
                 line_name = 'Otras Deducciones'
 
             deductions.append({
                 'number': len(deductions) + 1,
                 'name': line_name,  # Use the potentially updated name
-                'code': line.code,
+                'code': line['code'],
                 'rate': rate_text,
                 'amount': amount_converted,
                 'amount_formatted': self._format_amount(amount_converted, currency)
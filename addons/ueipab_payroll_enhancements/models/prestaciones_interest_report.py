@@ -5,6 +5,8 @@ Prestaciones Sociales Interest Report Model
 Generates month-by-month breakdown of prestaciones and interest calculations.
 """
 
+from itertools import accumulate
+
 from odoo import models, api, _
 from dateutil.relativedelta import relativedelta
 from datetime import date
@@ -80,57 +82,45 @@ class PrestacionesInterestReport(models.AbstractModel):
 
         quarterly_deposit = integral_daily * 15
 
-        monthly_data = []
-        current_date = start_date
-        month_num = 0
-        accumulated_prestaciones_usd = 0.0
-        accumulated_interest_converted = 0.0
-        total_days_deposited = 0
-
         months_count = int(service_months)
         interest_per_month_usd = (intereses_total / service_months) if months_count > 0 else 0.0
+        # Interest amount: use wizard rate for consistency with email template
+        month_interest_converted = interest_per_month_usd * wizard_rate
+
+        # Accrual schedule as columns: one entry per month of service
+        month_dates = self._get_accrual_months(start_date, end_date)
+        deposit_days = [
+            15 if (month_num >= 3 and (month_num - 3) % 3 == 0) else 0
+            for month_num in range(1, len(month_dates) + 1)
+        ]
+        deposit_amounts = [quarterly_deposit if days else 0.0 for days in deposit_days]
+        accumulated_prestaciones = list(accumulate(deposit_amounts))
+        accumulated_interest = list(accumulate([month_interest_converted] * len(month_dates)))
+        # Historical rate for display in "Tasa del Mes" column (informational only)
+        historical_rates = self._get_historical_rates(month_dates, currency)
+        factors = self._get_conversion_factors(month_dates, usd, currency)
 
-        while current_date <= end_date:
-            month_num += 1
-
-            is_deposit_month = (month_num >= 3 and (month_num - 3) % 3 == 0)
-            deposit_days = 15 if is_deposit_month else 0
-            deposit_amount = quarterly_deposit if is_deposit_month else 0.0
-
-            accumulated_prestaciones_usd += deposit_amount
-            total_days_deposited += deposit_days
-
-            # Historical rate for display in "Tasa del Mes" column (informational only)
-            historical_rate = self._get_historical_exchange_rate(current_date, currency)
-
-            # Interest amount: use wizard rate for consistency with email template
-            month_interest_converted = interest_per_month_usd * wizard_rate
-            accumulated_interest_converted += month_interest_converted
-
-            monthly_income_converted = self._convert_currency(monthly_income, usd, currency, current_date)
-            integral_daily_converted = self._convert_currency(integral_daily, usd, currency, current_date)
-            deposit_amount_converted = self._convert_currency(deposit_amount, usd, currency, current_date)
-            accumulated_prestaciones_converted = self._convert_currency(accumulated_prestaciones_usd, usd, currency, current_date)
-
+        monthly_data = []
+        for i, current_date in enumerate(month_dates):
+            factor = factors[i] if factors else None
             monthly_data.append({
                 'month_name': current_date.strftime("%b-%y"),
                 'month_date': current_date,
-                'monthly_income': monthly_income_converted,
-                'integral_salary': integral_daily_converted,
-                'deposit_days': deposit_days,
-                'deposit_amount': deposit_amount_converted,
+                'monthly_income': self._apply_factor(monthly_income, factor, currency),
+                'integral_salary': self._apply_factor(integral_daily, factor, currency),
+                'deposit_days': deposit_days[i],
+                'deposit_amount': self._apply_factor(deposit_amounts[i], factor, currency),
                 'advance': 0.0,
-                'accumulated_prestaciones': accumulated_prestaciones_converted,
-                'exchange_rate': historical_rate,  # display only
+                'accumulated_prestaciones': self._apply_factor(
+                    accumulated_prestaciones[i], factor, currency),
+                'exchange_rate': historical_rates[i],  # display only
                 'month_interest': month_interest_converted,
                 'interest_canceled': 0.0,
-                'accumulated_interest': accumulated_interest_converted,
+                'accumulated_interest': accumulated_interest[i],
             })
 
-            current_date = current_date + relativedelta(months=1)
-            if current_date > end_date:
-                break
-
+        accumulated_prestaciones_usd = accumulated_prestaciones[-1] if month_dates else 0.0
+        total_days_deposited = sum(deposit_days)
         total_prestaciones_converted = self._convert_currency(accumulated_prestaciones_usd, usd, currency, end_date)
         # Total interest = intereses_total_usd × wizard_rate (matches email template)
         total_interest_converted = intereses_total * wizard_rate if currency.name == 'VEB' else intereses_total
@@ -157,6 +147,65 @@ class PrestacionesInterestReport(models.AbstractModel):
             'totals': totals,
         }
 
+    # ========================================
+    # ACCRUAL SCHEDULE ENGINE
+    # ========================================
+    # Shared with report.ueipab_payroll_enhancements.liquidacion_breakdown
+    # (_calculate_accrued_interest). Each helper returns one column of the
+    # month-by-month schedule so callers work on whole lists, with the rate
+    # series loaded once instead of one rate query per month.
+
+    @api.model
+    def _get_accrual_months(self, start_date, end_date):
+        """Return the month dates of an accrual period.
+
+        Stepping is cumulative (date + 1 month, month after month) so dates
+        clamped at a month end stay clamped, as in the original monthly loop.
+        """
+        month_dates = []
+        current_date = start_date
+        while current_date <= end_date:
+            month_dates.append(current_date)
+            current_date = current_date + relativedelta(months=1)
+        return month_dates
+
+    @api.model
+    def _get_historical_rates(self, month_dates, currency):
+        """Return the historical VEB/USD rate of each month (1.0 if not VEB).
+
+        Same values as _get_historical_exchange_rate, resolved in one pass.
+        """
+        if currency.name != 'VEB':
+            return [1.0] * len(month_dates)
+        found = self.env['res.currency.rate']._lookup_rates(currency, month_dates)
+        return [
+            found[month_date][0] if found[month_date][1] else 1.0
+            for month_date in month_dates
+        ]
+
+    @api.model
+    def _get_conversion_factors(self, month_dates, from_currency, to_currency):
+        """Return the Odoo conversion rate of each month, or None if same currency.
+
+        The rates of both currencies are read once for the whole schedule and
+        each month's factor is shared by every amount converted on that month
+        (instead of one dated rate query per amount via _convert).
+        """
+        if from_currency == to_currency:
+            return None
+        found = self.env['res.currency.rate']._lookup_conversion_rates(
+            from_currency, to_currency, month_dates)
+        return [found[month_date] for month_date in month_dates]
+
+    @api.model
+    def _apply_factor(self, amount, factor, to_currency):
+        """Convert an amount with a conversion factor, rounded as _convert does."""
+        if factor is None:
+            return amount
+        if not amount:
+            return 0.0
+        return to_currency.round(amount * factor)
+
     def _convert_currency(self, amount, from_currency, to_currency, date_ref):
         if from_currency == to_currency:
             return amount
@@ -176,16 +225,8 @@ class PrestacionesInterestReport(models.AbstractModel):
         if currency.name == 'USD':
             return 1.0
         if currency.name == 'VEB':
-            rate_record = self.env['res.currency.rate'].search([
-                ('currency_id', '=', currency.id),
-                ('name', '<=', date_ref)
-            ], limit=1, order='name desc')
-            if not rate_record:
-                rate_record = self.env['res.currency.rate'].search([
-                    ('currency_id', '=', currency.id)
-                ], limit=1, order='name asc')
-            if rate_record and hasattr(rate_record, 'company_rate'):
-                return rate_record.company_rate
-            elif rate_record and rate_record.rate > 0:
-                return 1.0 / rate_record.rate
+            rate_value, rate_date = self.env['res.currency.rate']._lookup_rate(
+                currency, date_ref)
+            if rate_date:
+                return rate_value
         return 1.0
@@ -79,13 +79,11 @@ class PrestacionesInterestWizard(models.TransientModel):
     @api.onchange('currency_id')
     def _onchange_currency_id(self):
         if self.currency_id and self.currency_id.name == 'VEB':
-            rate_rec = self.env['res.currency.rate'].search(
-                [('currency_id', '=', self.currency_id.id)],
-                limit=1, order='name desc'
-            )
-            if rate_rec:
-                self.exchange_rate = rate_rec.company_rate
-                self.exchange_rate_date = rate_rec.name
+            rate_value, rate_date = self.env['res.currency.rate']._lookup_rate(
+                self.currency_id)
+            if rate_date:
+                self.exchange_rate = rate_value
+                self.exchange_rate_date = rate_date
             else:
                 self.exchange_rate = 0.0
                 self.exchange_rate_date = False
@@ -104,12 +102,10 @@ class PrestacionesInterestWizard(models.TransientModel):
             return 'USD'
         if self.exchange_rate_date:
             return 'BCV al %s' % self.exchange_rate_date.strftime('%d/%m/%Y')
-        rate_rec = self.env['res.currency.rate'].search(
-            [('currency_id', '=', self.currency_id.id)],
-            limit=1, order='name desc'
-        )
-        if rate_rec:
-            return 'BCV al %s' % rate_rec.name.strftime('%d/%m/%Y')
+        _rate_value, rate_date = self.env['res.currency.rate']._lookup_rate(
+            self.currency_id)
+        if rate_date:
+            return 'BCV al %s' % rate_date.strftime('%d/%m/%Y')
         return 'Tasa personalizada'
 
     def action_print_report(self):
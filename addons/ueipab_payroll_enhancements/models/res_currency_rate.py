@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+UEIPAB Payroll Enhancements - Exchange Rate Lookup Service
+
+Shared BCV rate resolution for the payroll reports, wizards and payslip
+computation. The rate series of a currency (usually VEB) is loaded once per
+transaction into two sorted lists and every date-to-rate question is
+answered by bisection, instead of each report issuing its own
+``res.currency.rate`` search per payslip or per month.
+
+Lookup semantics (same as the per-report searches it replaces):
+    - Rate on a date: latest rate with ``name <= date``
+    - Optional fallback to the earliest rate when the date predates the series
+    - No date: latest available rate
+    - Rate value: ``company_rate`` (VEB per USD), or ``1 / rate`` if unset
+
+_lookup_conversion_rates answers the other question the reports ask, the
+factor ``res.currency._get_conversion_rate`` would give on each of many
+dates, from one read of both currencies' rates.
+"""
+
+from bisect import bisect_right
+
+from odoo import api, fields, models
+
+_CACHE_KEY = 'ueipab_rate_series'
+
+
+class ResCurrencyRate(models.Model):
+    """Extend res.currency.rate with a cached, bisection-based lookup."""
+
+    _inherit = 'res.currency.rate'
+
+    # ========================================
+    # CACHE MAINTENANCE
+    # ========================================
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        self._invalidate_rate_series()
+        return super().create(vals_list)
+
+    def write(self, vals):
+        self._invalidate_rate_series()
+        return super().write(vals)
+
+    def unlink(self):
+        self._invalidate_rate_series()
+        return super().unlink()
+
+    @api.model
+    def _invalidate_rate_series(self):
+        """Drop every rate series cached in the current transaction."""
+        cache = self.env.cr.cache
+        for key in [k for k in cache if isinstance(k, tuple) and k[0] == _CACHE_KEY]:
+            del cache[key]
+
+    # ========================================
+    # LOOKUP SERVICE
+    # ========================================
+
+    @api.model
+    def _get_rate_series(self, currency):
+        """Return the (dates, rates) series of a currency, oldest first.
+
+        Loaded with a single search per transaction and company; ``rates[i]``
+        is the VEB-per-USD value of the rate record dated ``dates[i]``.
+        """
+        key = (_CACHE_KEY, currency.id, self.env.company.id)
+        cache = self.env.cr.cache
+        if key not in cache:
+            records = self.search(
+                [('currency_id', '=', currency.id)], order='name asc, id asc')
+            dates, rates = [], []
+            for rec in records:
+                value = rec.company_rate or (1.0 / rec.rate if rec.rate > 0 else 0.0)
+                if dates and dates[-1] == rec.name:
+                    # Same day twice: keep the last one, as name desc would
+                    rates[-1] = value
+                    continue
+                dates.append(rec.name)
+                rates.append(value)
+            cache[key] = (dates, rates)
+        return cache[key]
+
+    @api.model
+    def _lookup_rate(self, currency, date_ref=None, fallback_earliest=True):
+        """Return (rate, rate_date) for a currency on a date.
+
+        Args:
+            currency: res.currency record (empty recordset → (0.0, None))
+            date_ref: date/datetime/str; None or False → latest rate
+            fallback_earliest: use the earliest rate when no rate exists on
+                or before date_ref
+
+        Returns:
+            tuple: (rate, rate_date), or (0.0, None) when nothing matches
+        """
+        if not currency:
+            return 0.0, None
+        dates, rates = self._get_rate_series(currency)
+        if not dates:
+            return 0.0, None
+        if not date_ref:
+            return rates[-1], dates[-1]
+        idx = bisect_right(dates, fields.Date.to_date(date_ref)) - 1
+        if idx < 0:
+            if not fallback_earliest:
+                return 0.0, None
+            idx = 0
+        return rates[idx], dates[idx]
+
+    @api.model
+    def _lookup_rates(self, currency, dates_ref, fallback_earliest=True):
+        """Batch version of _lookup_rate.
+
+        Returns:
+            dict: {date_ref: (rate, rate_date)} for each date in dates_ref
+        """
+        return {
+            date_ref: self._lookup_rate(currency, date_ref, fallback_earliest)
+            for date_ref in set(dates_ref)
+        }
+
+    @api.model
+    def _lookup_conversion_rates(self, from_currency, to_currency, dates_ref, company=None):
+        """Batch version of res.currency._get_conversion_rate.
+
+        Reads the rates of both currencies once and resolves every date in
+        memory with the rules of res.currency._get_rates: the company's
+        latest rate on or before the date, else the latest shared rate
+        (company_id unset), else the earliest rate (company's first), else
+        1.0; the factor is computed as Odoo does, 1 / (from / to).
+
+        Returns:
+            dict: {date_ref: conversion factor} for each date in dates_ref
+        """
+        if from_currency == to_currency:
+            return dict.fromkeys(dates_ref, 1.0)
+        company = (company or self.env.company).root_id
+        records = self.search_read([
+            ('currency_id', 'in', (from_currency | to_currency).ids),
+            ('company_id', 'in', [company.id, False]),
+        ], ['name', 'rate', 'currency_id', 'company_id'], order='name asc, id asc')
+        series = {}   # (currency id, own company?) -> ([dates], [rates])
+        for rec in records:
+            dates, rates = series.setdefault(
+                (rec['currency_id'][0], bool(rec['company_id'])), ([], []))
+            dates.append(rec['name'])
+            rates.append(rec['rate'])
+
+        def rate_on(currency, date_ref):
+            own = series.get((currency.id, True), ([], []))
+            shared = series.get((currency.id, False), ([], []))
+            for dates, rates in (own, shared):
+                idx = bisect_right(dates, date_ref) - 1
+                if idx >= 0:
+                    return rates[idx]
+            for dates, rates in (own, shared):
+                if dates:
+                    return rates[0]
+            return 1.0
+
+        factors = {}
+        for date_ref in set(dates_ref):
+            day = fields.Date.to_date(date_ref)
+            rate = (rate_on(from_currency, day) or 1.0) / rate_on(to_currency, day)
+            factors[date_ref] = 1 / rate
+        return factors
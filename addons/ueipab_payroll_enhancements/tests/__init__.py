@@ -0,0 +1,3 @@
+# -*- coding: utf-8 -*-
+from . import test_payslip_compact_report
+from . import test_prestaciones_schedule
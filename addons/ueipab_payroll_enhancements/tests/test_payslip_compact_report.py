@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+Query count of the Comprobante de Pago (Compact) report.
+
+Report data is prepared in batch (one read of all lines, employee and
+contract fields prefetched, the batch rate resolved once), so rendering a
+whole batch must cost a fixed number of queries, not a few per payslip.
+"""
+
+from datetime import date
+
+from odoo.tests import common, tagged
+
+REPORT = 'ueipab_payroll_enhancements.action_report_payslip_compact'
+BATCH_SIZE = 200
+
+
+@tagged('post_install', '-at_install')
+class TestPayslipCompactReport(common.TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        env = cls.env
+        rules = env['hr.salary.rule'].create([{
+            'name': name, 'code': code, 'sequence': seq,
+            'category_id': env.ref(f'hr_payroll_community.{category}').id,
+        } for name, code, seq, category in [
+            ('Salario', 'VE_SALARY_V2', 1, 'BASIC'),
+            ('Bonos', 'VE_BONUS_V2', 2, 'ALW'),
+            ('Cesta Ticket', 'VE_CESTA_TICKET_V2', 3, 'ALW'),
+            ('SSO', 'VE_SSO_DED_V2', 10, 'DED'),
+            ('Neto', 'VE_NET_V2', 20, 'NET'),
+        ]])
+        amounts = {'VE_SALARY_V2': 150.0, 'VE_BONUS_V2': 40.0,
+                   'VE_CESTA_TICKET_V2': 20.0, 'VE_SSO_DED_V2': -6.0,
+                   'VE_NET_V2': 204.0}
+
+        department = env['hr.department'].create({'name': 'Docencia'})
+        job = env['hr.job'].create({'name': 'Docente'})
+        employees = env['hr.employee'].create([{
+            'name': f'Empleado {i:03d}',
+            'identification_id': f'V{10000000 + i}',
+            'department_id': department.id,
+            'job_id': job.id,
+        } for i in range(BATCH_SIZE)])
+        contracts = env['hr.contract'].create([{
+            'name': f'Contrato {employee.name}',
+            'employee_id': employee.id,
+            'wage': 300.0,
+            'date_start': date(2024, 1, 1),
+            'state': 'open',
+        } for employee in employees])
+        cls.payslips = env['hr.payslip'].create([{
+            'name': f'Nómina {contract.employee_id.name}',
+            'employee_id': contract.employee_id.id,
+            'contract_id': contract.id,
+            'date_from': date(2025, 11, 1),
+            'date_to': date(2025, 11, 15),
+            'exchange_rate_used': 236.4601,
+        } for contract in contracts])
+        env['hr.payslip.line'].create([{
+            'slip_id': payslip.id,
+            'employee_id': payslip.employee_id.id,
+            'contract_id': payslip.contract_id.id,
+            'salary_rule_id': rule.id,
+            'name': rule.name,
+            'code': rule.code,
+            'sequence': rule.sequence,
+            'category_id': rule.category_id.id,
+            'amount': amounts[rule.code],
+        } for payslip in cls.payslips for rule in rules])
+        cls.usd = env.ref('base.USD')
+
+    def _render_queries(self, payslips):
+        """Queries issued to render the report of `payslips` from a cold cache."""
+        self.env.flush_all()
+        self.env.invalidate_all()
+        data = {'payslip_ids': payslips.ids, 'currency_id': self.usd.id}
+        count = self.env.cr.sql_log_count
+        html, _ = self.env['ir.actions.report']._render_qweb_html(
+            REPORT, payslips.ids, data=data)
+        self.assertTrue(html)
+        return self.env.cr.sql_log_count - count
+
+    def test_report_values(self):
+        values = self.env['report.ueipab_payroll_enhancements.report_payslip_compact'] \
+            ._get_report_values(self.payslips[:1].ids, {'currency_id': self.usd.id})
+        self.assertEqual(len(values['reports']), 1)
+
+    def test_batch_query_count(self):
+        # load the templates and report action once
+        self._render_queries(self.payslips[:1])
+
+        small = self._render_queries(self.payslips[:10])
+        full = self._render_queries(self.payslips)
+        # constant in the number of payslips, give or take prefetch chunking
+        self.assertLessEqual(
+            full - small, 10,
+            f"10 payslips: {small} queries, {BATCH_SIZE} payslips: {full}")
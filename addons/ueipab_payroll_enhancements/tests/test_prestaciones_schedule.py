@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Column-wise accrual schedule vs the original month-by-month loops.
+
+The legacy loops of _generate_monthly_breakdown (Prestaciones Soc.
+Intereses) and _calculate_accrued_interest (Relación de Liquidación) are
+kept below as test helpers; both reports must give the same figures to the
+cent over a multi-year tenure with changing BCV rates. The monthly
+conversion factors must also match _get_conversion_rate while costing the
+same number of queries whatever the tenure.
+"""
+
+from datetime import date
+
+from dateutil.relativedelta import relativedelta
+
+from odoo.tests import common, tagged
+
+
+def legacy_monthly_breakdown(report, payslip, currency, wizard_rate=1.0):
+    """Original per-month loop of _generate_monthly_breakdown."""
+    contract = payslip.contract_id
+    usd = report.env.ref('base.USD')
+
+    intereses_total = report._get_line_value(payslip, 'LIQUID_INTERESES_V2')
+    integral_daily = report._get_line_value(payslip, 'LIQUID_INTEGRAL_DAILY_V2')
+    deduction_base = report._get_line_value(payslip, 'LIQUID_DAILY_SALARY_V2')
+    service_months = report._get_line_value(payslip, 'LIQUID_SERVICE_MONTHS_V2')
+
+    monthly_income = deduction_base * 30
+    start_date = contract.date_start
+    end_date = payslip.date_to
+    quarterly_deposit = integral_daily * 15
+
+    monthly_data = []
+    current_date = start_date
+    month_num = 0
+    accumulated_prestaciones_usd = 0.0
+    accumulated_interest_converted = 0.0
+    total_days_deposited = 0
+
+    months_count = int(service_months)
+    interest_per_month_usd = (intereses_total / service_months) if months_count > 0 else 0.0
+
+    while current_date <= end_date:
+        month_num += 1
+
+        is_deposit_month = (month_num >= 3 and (month_num - 3) % 3 == 0)
+        deposit_days = 15 if is_deposit_month else 0
+        deposit_amount = quarterly_deposit if is_deposit_month else 0.0
+
+        accumulated_prestaciones_usd += deposit_amount
+        total_days_deposited += deposit_days
+
+        historical_rate = report._get_historical_exchange_rate(current_date, currency)
+
+        month_interest_converted = interest_per_month_usd * wizard_rate
+        accumulated_interest_converted += month_interest_converted
+
+        monthly_data.append({
+            'month_name': current_date.strftime("%b-%y"),
+            'month_date': current_date,
+            'monthly_income': report._convert_currency(monthly_income, usd, currency, current_date),
+            'integral_salary': report._convert_currency(integral_daily, usd, currency, current_date),
+            'deposit_days': deposit_days,
+            'deposit_amount': report._convert_currency(deposit_amount, usd, currency, current_date),
+            'advance': 0.0,
+            'accumulated_prestaciones': report._convert_currency(
+                accumulated_prestaciones_usd, usd, currency, current_date),
+            'exchange_rate': historical_rate,
+            'month_interest': month_interest_converted,
+            'interest_canceled': 0.0,
+            'accumulated_interest': accumulated_interest_converted,
+        })
+
+        current_date = current_date + relativedelta(months=1)
+        if current_date > end_date:
+            break
+
+    total_prestaciones_converted = report._convert_currency(
+        accumulated_prestaciones_usd, usd, currency, end_date)
+    total_interest_converted = intereses_total * wizard_rate if currency.name == 'VEB' else intereses_total
+    if monthly_data:
+        monthly_data[-1]['accumulated_interest'] = total_interest_converted
+
+    return monthly_data, {
+        'total_days': total_days_deposited,
+        'total_prestaciones': total_prestaciones_converted,
+        'total_interest': total_interest_converted,
+        'total_advance': 0.0,
+    }
+
+
+def legacy_accrued_interest(report, payslip, currency):
+    """Original per-month loop of _calculate_accrued_interest (non-USD path)."""
+    service_months = report._get_line_value(payslip, 'LIQUID_SERVICE_MONTHS_V2')
+    intereses_total = report._get_line_value(payslip, 'LIQUID_INTERESES_V2')
+    if service_months <= 0:
+        return 0.0
+
+    start_date = payslip.contract_id.date_start
+    end_date = payslip.date_to
+    interest_per_month = intereses_total / service_months
+
+    accumulated_veb = 0.0
+    current_date = start_date
+    while current_date <= end_date:
+        month_rate = report._get_historical_exchange_rate(current_date, currency)
+        accumulated_veb += interest_per_month * month_rate
+        current_date = current_date + relativedelta(months=1)
+        if current_date > end_date:
+            break
+    return accumulated_veb
+
+
+@tagged('post_install', '-at_install')
+class TestPrestacionesSchedule(common.TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        env = cls.env
+        cls.usd = env.ref('base.USD')
+        cls.veb = env['res.currency'].with_context(active_test=False).search(
+            [('name', '=', 'VEB')], limit=1)
+        if not cls.veb:
+            cls.veb = env['res.currency'].create({'name': 'VEB', 'symbol': 'Bs.'})
+        cls.veb.active = True
+        company = env.company
+        env['res.currency.rate'].search([
+            ('currency_id', '=', cls.veb.id), ('company_id', 'in', [company.id, False]),
+        ]).unlink()
+
+        # Rate changes every few weeks, with an odd-day jump and a long flat
+        # stretch, over a tenure that starts before the first rate
+        rate, day, rates = 4.1234, date(2021, 3, 10), []
+        while day <= date(2025, 8, 31):
+            rates.append({
+                'name': day, 'currency_id': cls.veb.id, 'company_id': company.id,
+                'rate': rate,
+            })
+            rate = round(rate * (1.0 if date(2023, 1, 1) <= day < date(2023, 7, 1) else 1.0731), 4)
+            day += relativedelta(days=23 if day.month % 2 else 41)
+        env['res.currency.rate'].create(rates)
+
+        employee = env['hr.employee'].create({'name': 'Empleado Liquidado'})
+        contract = env['hr.contract'].create({
+            'name': 'Contrato liquidado',
+            'employee_id': employee.id,
+            'wage': 450.0,
+            # month-end start: cumulative stepping keeps the clamped day
+            'date_start': date(2021, 1, 31),
+            'state': 'close',
+        })
+        cls.payslip = env['hr.payslip'].create({
+            'name': 'Liquidación',
+            'employee_id': employee.id,
+            'contract_id': contract.id,
+            'date_from': date(2025, 7, 1),
+            'date_to': date(2025, 7, 15),
+        })
+        category = env.ref('hr_payroll_community.BASIC')
+        values = {
+            'LIQUID_PRESTACIONES_V2': 1873.36,
+            'LIQUID_INTERESES_V2': 412.79,
+            'LIQUID_INTEGRAL_DAILY_V2': 17.3611,
+            'LIQUID_DAILY_SALARY_V2': 15.0,
+            'LIQUID_SERVICE_MONTHS_V2': 53.5,
+        }
+        for seq, (code, amount) in enumerate(values.items(), start=1):
+            rule = env['hr.salary.rule'].create({
+                'name': code, 'code': code, 'sequence': seq, 'category_id': category.id,
+            })
+            env['hr.payslip.line'].create({
+                'slip_id': cls.payslip.id,
+                'employee_id': employee.id,
+                'contract_id': contract.id,
+                'salary_rule_id': rule.id,
+                'name': code, 'code': code, 'sequence': seq,
+                'category_id': category.id,
+                'amount': amount,
+            })
+
+    def assertCents(self, new, old, label):
+        self.assertEqual(round(new, 2), round(old, 2), f"{label}: {new!r} != {old!r}")
+
+    def _check_breakdown(self, currency, wizard_rate):
+        report = self.env['report.ueipab_payroll_enhancements.prestaciones_interest']
+        new = report._generate_monthly_breakdown(self.payslip, currency, wizard_rate)
+        old_rows, old_totals = legacy_monthly_breakdown(report, self.payslip, currency, wizard_rate)
+
+        self.assertEqual(len(new['monthly_data']), len(old_rows))
+        self.assertGreater(len(old_rows), 48)
+        for new_row, old_row in zip(new['monthly_data'], old_rows):
+            self.assertEqual(new_row['month_date'], old_row['month_date'])
+            self.assertEqual(new_row['month_name'], old_row['month_name'])
+            self.assertEqual(new_row['deposit_days'], old_row['deposit_days'])
+            for key in ('monthly_income', 'integral_salary', 'deposit_amount', 'advance',
+                        'accumulated_prestaciones', 'exchange_rate', 'month_interest',
+                        'interest_canceled', 'accumulated_interest'):
+                self.assertCents(new_row[key], old_row[key], f"{old_row['month_name']} {key}")
+        self.assertEqual(new['totals']['total_days'], old_totals['total_days'])
+        for key in ('total_prestaciones', 'total_interest', 'total_advance'):
+            self.assertCents(new['totals'][key], old_totals[key], key)
+
+    def test_breakdown_veb(self):
+        self._check_breakdown(self.veb, 36.7812)
+
+    def test_breakdown_usd(self):
+        self._check_breakdown(self.usd, 1.0)
+
+    def test_liquidacion_accrued_interest(self):
+        report = self.env['report.ueipab_payroll_enhancements.liquidacion_breakdown_report']
+        self.assertCents(
+            report._calculate_accrued_interest(self.payslip, self.veb),
+            legacy_accrued_interest(report, self.payslip, self.veb),
+            'accrued interest')
+
+    def test_conversion_factors_one_read(self):
+        report = self.env['report.ueipab_payroll_enhancements.prestaciones_interest']
+        start = date(2016, 1, 31)
+        counts = []
+        for end in (date(2017, 1, 15), date(2026, 1, 15)):
+            month_dates = report._get_accrual_months(start, end)
+            self.env.invalidate_all()
+            before = self.env.cr.sql_log_count
+            factors = report._get_conversion_factors(month_dates, self.usd, self.veb)
+            counts.append(self.env.cr.sql_log_count - before)
+            for month_date, factor in zip(month_dates, factors):
+                self.assertAlmostEqual(
+                    factor,
+                    self.usd._get_conversion_rate(self.usd, self.veb, self.env.company, month_date),
+                    places=9, msg=str(month_date))
+        # 13 months and 121 months: the same single rate read either way
+        self.assertEqual(counts[0], counts[1])
@@ -257,12 +257,10 @@ class AguinaldosDisbursementWizard(models.TransientModel):
                 exchange_rate = payslips[0].exchange_rate_used
             else:
                 latest_date = max(payslips.mapped('date_to'))
-                rate_record = self.env['res.currency.rate'].search([
-                    ('currency_id', '=', self.currency_id.id),
-                    ('name', '<=', latest_date)
-                ], limit=1, order='name desc')
-                if rate_record:
-                    exchange_rate = rate_record.company_rate
+                rate_value, rate_date = self.env['res.currency.rate']._lookup_rate(
+                    self.currency_id, latest_date, fallback_earliest=False)
+                if rate_date:
+                    exchange_rate = rate_value
 
         # Write title
         worksheet.merge_range('A1:F1', 'RELACION DE PAGO - AGUINALDOS', title_format)
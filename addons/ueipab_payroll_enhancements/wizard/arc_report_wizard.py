@@ -171,7 +171,12 @@ class ArcReportWizard(models.TransientModel):
         """
         self.ensure_one()
 
-        for result in self.result_ids.filtered(lambda r: r.status == 'pending'):
+        pending = self.result_ids.filtered(lambda r: r.status == 'pending')
+        # ARC figures of all pending employees, loaded in one pass
+        arc_model = self.env['report.ueipab_payroll_enhancements.arc_annual_report']
+        year_data = arc_model._get_arc_year_data(pending.employee_id, int(self.year))
+
+        for result in pending:
             employee = result.employee_id
             self.current_employee = employee.name
             result.status = 'sending'
@@ -200,7 +205,8 @@ class ArcReportWizard(models.TransientModel):
                     email_from = tmpl._render_field('email_from', [employee.id])[employee.id]
 
                     # 3. Compute ARC data and build summary table
-                    arc_summary = self._build_arc_summary_html(employee, int(self.year), cert=cert)
+                    arc_summary = self._build_arc_summary_html(
+                        employee, int(self.year), cert=cert, year_data=year_data)
 
                     # 4. Inject ARC summary + acknowledgment button into email body.
                     # Stage 1 notice: no PDF — the signed PDF arrives in Stage 2
@@ -250,10 +256,10 @@ class ArcReportWizard(models.TransientModel):
         }
 
 
-    def _build_arc_summary_html(self, employee, year, cert=None):
+    def _build_arc_summary_html(self, employee, year, cert=None, year_data=None):
         """Build an HTML ARC summary table for inclusion in the Stage 1 email."""
         arc_model = self.env['report.ueipab_payroll_enhancements.arc_annual_report']
-        data = arc_model._compute_employee_arc(employee, year)
+        data = arc_model._compute_employee_arc(employee, year, year_data=year_data)
         months = data.get('months', [])
         totals = data.get('totals', {})
         contract = data.get('contract')
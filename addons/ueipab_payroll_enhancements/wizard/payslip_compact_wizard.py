@@ -85,15 +85,13 @@ class PayslipCompactWizard(models.TransientModel):
             # Lookup rate
             veb_currency = wizard.env['res.currency'].search([('name', '=', 'VEB')], limit=1)
             if veb_currency:
-                rate_record = wizard.env['res.currency.rate'].search([
-                    ('currency_id', '=', veb_currency.id),
-                    ('name', '<=', lookup_date)
-                ], order='name desc', limit=1)
+                rate_value, rate_source = wizard.env['res.currency.rate']._lookup_rate(
+                    veb_currency, lookup_date, fallback_earliest=False)
 
-                if rate_record and rate_record.company_rate:
+                if rate_value:
                     wizard.exchange_rate_display = (
-                        f'Auto: {rate_record.company_rate:.4f} VEB/USD '
-                        f'(Rate of {rate_record.name.strftime("%d/%m/%Y")})'
+                        f'Auto: {rate_value:.4f} VEB/USD '
+                        f'(Rate of {rate_source.strftime("%d/%m/%Y")})'
                     )
                 else:
                     wizard.exchange_rate_display = f'No rate found for {lookup_date.strftime("%d/%m/%Y")}'
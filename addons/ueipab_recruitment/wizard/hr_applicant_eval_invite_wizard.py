@@ -318,10 +318,10 @@ class HrApplicantEvalInviteWizard(models.TransientModel):
                 return False
 
             wa = self.env['ai.agent.whatsapp.service']
-            result = wa.send_message(phone_number=phone, message=msg)
+            result = wa.enqueue_message(phone, msg)
             if result:
                 _logger.info(
-                    "WA eval invite sent: phone=%s applicant=%s",
+                    "WA eval invite queued: phone=%s applicant=%s",
                     phone, self.applicant_id.id,
                 )
                 return True
@@ -13,6 +13,15 @@ Phases:
   5. Write Akdemia2526 Google Sheet tab (130 cols, exact schema match)
   6. Email summary/alert → gustavo.perdomo@ueipab.edu.ve
 
+Delta sync:
+  - akdemia_sync_snapshot.json keeps, per student id, its sheet row and a
+    hash of its 130 cells, plus the hash of the published student cache
+  - Phase 5 rewrites only new/changed rows (one batched range update) and
+    compacts removed students; the tab is fully rewritten on the first run,
+    every FULL_REFRESH_DAYS, or with --full
+  - Phase 2b skips set_param when akdemia.students_json is unchanged
+  - The API itself has no change feed, so Phase 1 still fetches every page
+
 Safety:
   - DRY_RUN=True by default; pass --live to apply real changes
   - Aborts sheet write if < 200 students fetched (partial-data guard)
@@ -23,16 +32,18 @@ Usage:
     python3 akdemia_api_sync.py --live         # apply changes
     python3 akdemia_api_sync.py --skip-sheets  # skip sheet update
     python3 akdemia_api_sync.py --skip-odoo    # skip bounce log sync
+    python3 akdemia_api_sync.py --live --full  # force full sheet rewrite + cache publish
 """
 
 import argparse
+import hashlib
 import json
 import os
 import re
 import smtplib
 import sys
 import xmlrpc.client
-from datetime import datetime
+from datetime import datetime, timedelta
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
@@ -55,6 +66,12 @@ MIN_STUDENTS     = 200  # abort sheet write if below this
 SPREADSHEET_ID   = os.getenv('GSHEET_ID', '1Oi3Zw1OLFPVuHMe9rJ7cXKSD7_itHRF0bL4oBkKBPzA')
 AKDEMIA_TAB      = 'Akdemia2526'
 SHEETS_CREDS     = '/var/www/dev/odoo_api_bridge/gsheet_credentials.json'
+SHEET_COLS       = 130
+DATA_START_ROW   = 4    # rows 1-3: school, academic year, headers
+
+SCRIPT_DIR        = os.path.dirname(os.path.abspath(__file__))
+SNAPSHOT_FILE     = os.path.join(SCRIPT_DIR, 'akdemia_sync_snapshot.json')
+FULL_REFRESH_DAYS = 7   # full sheet rewrite / cache publish at least this often
 
 TARGET_ENV = os.environ.get('TARGET_ENV', 'production')
 ODOO_CONFIGS = {
@@ -217,6 +234,54 @@ def header(title):
     print()
 
 
+# ============================================================================
+# Snapshot store (previous run's sheet rows + published cache)
+# ============================================================================
+
+def load_snapshot() -> dict:
+    try:
+        with open(SNAPSHOT_FILE) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f'  WARNING: unreadable snapshot {SNAPSHOT_FILE} ({e}) — full sync')
+        return {}
+
+
+def save_snapshot(snapshot: dict):
+    tmp = SNAPSHOT_FILE + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(snapshot, f, ensure_ascii=False)
+    os.replace(tmp, SNAPSHOT_FILE)
+
+
+def _content_hash(value) -> str:
+    return hashlib.sha1(
+        json.dumps(value, ensure_ascii=False, sort_keys=True).encode()).hexdigest()
+
+
+def _is_stale(stamp) -> bool:
+    """True if an ISO timestamp is missing or older than FULL_REFRESH_DAYS."""
+    try:
+        return datetime.now() - datetime.fromisoformat(stamp) > timedelta(days=FULL_REFRESH_DAYS)
+    except (TypeError, ValueError):
+        return True
+
+
+def student_keys(entries: list) -> list:
+    """Stable per-entry key: Akdemia student id, else cédula, else name (deduplicated)."""
+    keys, seen = [], {}
+    for entry in entries:
+        s = entry.get('student') or {}
+        base = (_s(s.get('id')) or normalize_cedula(s.get('unique_id'))
+                or f"{_s(s.get('first_name'))} {_s(s.get('last_name'))}".strip().upper())
+        n = seen.get(base, 0)
+        seen[base] = n + 1
+        keys.append(base if n == 0 else f'{base}#{n}')
+    return keys
+
+
 # ============================================================================
 # Phase 1: Fetch students from Akdemia API
 # ============================================================================
@@ -320,18 +385,29 @@ def build_guardian_index(entries: list) -> dict:
     return index
 
 
-def publish_student_cache(index: dict):
+def publish_student_cache(index: dict, snapshot: dict, force: bool = False):
     """Publish the guardian->students index to ir.config_parameter
     'akdemia.students_json' on every reachable env so whichever Odoo hosts
     ueipab_enrollment_journey always has a fresh (<=24h) cache for
-    _akdemia_student_index(use_cache=True). Skipped under DRY_RUN."""
+    _akdemia_student_index(use_cache=True). Skipped under DRY_RUN, and per
+    env when the content hash matches the last publish (snapshot
+    'student_cache'), unless force or older than FULL_REFRESH_DAYS."""
     header('Phase 2b: Publish Student Cache to Odoo')
+    json_str = json.dumps(index, ensure_ascii=False)
+    cache_hash = _content_hash(index)
+    published = snapshot.setdefault('student_cache', {})
+    pending = [env_name for env_name in ODOO_CONFIGS
+               if force or published.get(env_name, {}).get('hash') != cache_hash
+               or _is_stale(published.get(env_name, {}).get('at'))]
+    if not pending:
+        print(f'  akdemia.students_json unchanged ({len(index)} guardians) — nothing to publish')
+        return
     if DRY_RUN:
         print(f'  [DRY_RUN] Would publish akdemia.students_json '
-              f'({len(index)} guardians) to: {", ".join(ODOO_CONFIGS)}')
+              f'({len(index)} guardians) to: {", ".join(pending)}')
         return
-    json_str = json.dumps(index, ensure_ascii=False)
-    for env_name, cfg in ODOO_CONFIGS.items():
+    for env_name in pending:
+        cfg = ODOO_CONFIGS[env_name]
         if not cfg.get('password'):
             print(f'  Skipping {env_name}: no password configured.')
             continue
@@ -349,6 +425,7 @@ def publish_student_cache(index: dict):
                               ['akdemia.students_json', json_str])
             print(f'  OK {env_name}: akdemia.students_json set '
                   f'({len(index)} guardians, {len(json_str)} bytes)')
+            published[env_name] = {'hash': cache_hash, 'at': datetime.now().isoformat()}
         except Exception as e:
             print(f'  WARNING: {env_name} cache publish failed: {e}')
 
@@ -464,9 +541,10 @@ def _sync_mailing_contacts(models, cfg, uid, bounced_email, new_email):
         return 0
     prefix = '[DRY_RUN] ' if DRY_RUN else ''
     try:
-        mc_ids = models.execute_kw(cfg['db'], uid, cfg['password'],
-                                   'mailing.contact', 'search',
-                                   [[('email', 'ilike', bounced_email)]])
+        # Exact match on the normalized email index (no ilike scan)
+        owners = models.execute_kw(cfg['db'], uid, cfg['password'],
+                                   'mail.email.index', 'lookup', [[bounced_email]])
+        mc_ids = [mid for o in owners.values() for mid in o['mailing_contact_ids']]
         if not mc_ids:
             return 0
         records = models.execute_kw(cfg['db'], uid, cfg['password'],
@@ -477,7 +555,7 @@ def _sync_mailing_contacts(models, cfg, uid, bounced_email, new_email):
             if (mc.get('email') or '').strip().lower() in PROTECTED_EMAILS:
                 continue
             mc_emails = [e.strip().lower() for e in (mc.get('email') or '').split(';') if e.strip()]
-            if bounced_email not in mc_emails:
+            if bounced_email.lower() not in mc_emails:
                 continue
             new_field = _append_email(_remove_bounced(mc['email'], bounced_email), new_email)
             print(f'  {prefix}mailing.contact #{mc["id"]}: "{mc["email"]}" → "{new_field}"')
@@ -660,26 +738,115 @@ def build_sheet_rows(entries: list) -> list:
     return rows
 
 
-def update_google_sheet(entries: list):
+def _column_letter(n: int) -> str:
+    letters = ''
+    while n:
+        n, rem = divmod(n - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def plan_sheet_delta(previous, keys: list, data_rows: list, head_rows: list):
+    """Diff this run's rows against the previous snapshot.
+
+    Surviving students keep their sheet row; new students (and students
+    whose row fell past the new end) take the rows freed by removed ones,
+    so the data stays contiguous. previous=None plans a full write in API
+    order.
+
+    Returns (writes, blanks, state): writes = {sheet row: values} to send,
+    blanks = trailing sheet rows to empty, state = new snapshot 'sheet' entry.
+    """
+    old = (previous or {}).get('students', {})
+    limit = DATA_START_ROW + len(data_rows)
+    hashes = [_content_hash(row) for row in data_rows]
+    head_hash = _content_hash(head_rows)
+
+    writes = {}
+    if (previous or {}).get('head_hash') != head_hash:
+        for offset, row in enumerate(head_rows):
+            writes[1 + offset] = row
+
+    positions, occupied = {}, set()
+    for key in keys:
+        pos = old.get(key, [0])[0]
+        if DATA_START_ROW <= pos < limit and pos not in occupied:
+            positions[key] = pos
+            occupied.add(pos)
+    free = iter(sorted(set(range(DATA_START_ROW, limit)) - occupied))
+
+    for key, row, row_hash in zip(keys, data_rows, hashes):
+        if key not in positions:
+            positions[key] = next(free)
+            writes[positions[key]] = row
+        elif old[key][1] != row_hash:
+            writes[positions[key]] = row
+
+    old_limit = (previous or {}).get('row_limit', limit)
+    blanks = list(range(limit, old_limit))
+    state = {
+        'head_hash': head_hash,
+        'row_limit': limit,
+        'full_write_at': (previous or {}).get('full_write_at'),
+        'students': {key: [positions[key], h] for key, h in zip(keys, hashes)},
+    }
+    return writes, blanks, state
+
+
+def _batch_ranges(rows: dict) -> list:
+    """{sheet row: values} → Worksheet.batch_update payload, one range per contiguous run."""
+    last_col = _column_letter(SHEET_COLS)
+    payload, run = [], []
+    for n in sorted(rows) + [None]:
+        if run and (n is None or n != run[-1] + 1):
+            payload.append({
+                'range': f'A{run[0]}:{last_col}{run[-1]}',
+                'values': [rows[r] for r in run],
+            })
+            run = []
+        if n is not None:
+            run.append(n)
+    return payload
+
+
+def update_google_sheet(entries: list, snapshot: dict, force_full: bool = False):
     header('Phase 5: Update Akdemia2526 Google Sheet')
     prefix = '[DRY_RUN] ' if DRY_RUN else ''
 
     data_rows = build_sheet_rows(entries)
     academic_year = _detect_academic_year()
 
-    all_rows = [
+    head_rows = [
         ['Colegio', 'UNIDAD EDUCATIVA INSTITUTO ANDRES BELLO'] + [''] * 128,
         ['Año escolar', academic_year] + [''] * 128,
         SHEET_HEADERS,
-    ] + data_rows
+    ]
+    all_rows = head_rows + data_rows
 
     total_rows = len(all_rows)
     print(f'  Academic year: {academic_year}')
     print(f'  Data rows: {len(data_rows)} students')
-    print(f'  Total rows to write: {total_rows} (2 metadata + 1 header + {len(data_rows)} data)')
+
+    previous = snapshot.get('sheet')
+    full = force_full or not previous or _is_stale(previous.get('full_write_at'))
+    writes, blanks, state = plan_sheet_delta(
+        None if full else previous, student_keys(entries), data_rows, head_rows)
+
+    if full:
+        print(f'  Full rewrite: {total_rows} rows (2 metadata + 1 header + {len(data_rows)} data)')
+    else:
+        print(f'  Delta: {len(writes)} row(s) to write, {len(blanks)} trailing row(s) to clear')
 
     if DRY_RUN:
-        print(f'  {prefix}Would clear "{AKDEMIA_TAB}" and write {total_rows} rows × 130 cols')
+        if full:
+            print(f'  {prefix}Would clear "{AKDEMIA_TAB}" and write {total_rows} rows × 130 cols')
+        else:
+            print(f'  {prefix}Would update {len(writes) + len(blanks)} row(s) in "{AKDEMIA_TAB}"')
+        return
+
+    if not full and not writes and not blanks:
+        print('  ✅ Akdemia2526 already up to date — no writes')
+        snapshot['sheet'] = state
         return
 
     import gspread
@@ -694,19 +861,33 @@ def update_google_sheet(entries: list):
         ws = spreadsheet.worksheet(AKDEMIA_TAB)
     except gspread.exceptions.WorksheetNotFound:
         ws = spreadsheet.add_worksheet(title=AKDEMIA_TAB, rows=str(total_rows + 10), cols='130')
+        if not full:
+            # Tab vanished since the last run: the snapshot is meaningless
+            writes, blanks, state = plan_sheet_delta(
+                None, student_keys(entries), data_rows, head_rows)
+            full = True
 
-    ws.clear()
     if ws.row_count < total_rows:
         ws.resize(rows=total_rows + 5)
 
-    chunk_size = 100
-    for start in range(0, total_rows, chunk_size):
-        end = min(start + chunk_size, total_rows)
-        ws.update(all_rows[start:end], f'A{start + 1}', value_input_option='USER_ENTERED')
-        if end < total_rows:
-            print(f'  Written rows {start + 1}–{end} of {total_rows}...')
+    if full:
+        ws.clear()
+        chunk_size = 100
+        for start in range(0, total_rows, chunk_size):
+            end = min(start + chunk_size, total_rows)
+            ws.update(all_rows[start:end], f'A{start + 1}', value_input_option='USER_ENTERED')
+            if end < total_rows:
+                print(f'  Written rows {start + 1}–{end} of {total_rows}...')
+        state['full_write_at'] = datetime.now().isoformat()
+        print(f'  ✅ Akdemia2526 updated: {total_rows} rows written')
+    else:
+        rows = dict(writes)
+        rows.update({n: [''] * SHEET_COLS for n in blanks})
+        payload = _batch_ranges(rows)
+        ws.batch_update(payload, value_input_option='USER_ENTERED')
+        print(f'  ✅ Akdemia2526 updated: {len(rows)} row(s) in {len(payload)} range(s), one request')
 
-    print(f'  ✅ Akdemia2526 updated: {total_rows} rows written')
+    snapshot['sheet'] = state
 
 
 def _detect_academic_year() -> str:
@@ -804,6 +985,8 @@ def main():
     parser.add_argument('--live', action='store_true', help='Apply real changes (disable DRY_RUN)')
     parser.add_argument('--skip-sheets', action='store_true', help='Skip Phase 5 (sheet update)')
     parser.add_argument('--skip-odoo', action='store_true', help='Skip Phases 3-4 (bounce log sync)')
+    parser.add_argument('--full', action='store_true',
+                        help='Ignore the snapshot: rewrite the whole sheet and republish the cache')
     args = parser.parse_args()
 
     global DRY_RUN
@@ -819,10 +1002,12 @@ def main():
     print(f'  Target Odoo:  {TARGET_ENV}')
     print(f'  Skip sheets:  {args.skip_sheets}')
     print(f'  Skip Odoo:    {args.skip_odoo}')
+    print(f'  Full sync:    {args.full}')
     print()
 
     entries = []
     changes_count = 0
+    snapshot = {} if args.full else load_snapshot()
 
     # Phase 1: Fetch
     try:
@@ -840,9 +1025,11 @@ def main():
     # Phase 2b: Guardian->students index cache for ueipab_enrollment_journey
     try:
         student_index = build_guardian_index(entries)
-        publish_student_cache(student_index)
+        publish_student_cache(student_index, snapshot, force=args.full)
     except Exception as e:
         print(f'WARNING: Student cache publish error: {e}')
+    if not DRY_RUN:
+        save_snapshot(snapshot)
 
     # Phases 3-4: Odoo bounce log sync
     if not args.skip_odoo:
@@ -862,11 +1049,13 @@ def main():
     # Phase 5: Sheet update
     if not args.skip_sheets:
         try:
-            update_google_sheet(entries)
+            update_google_sheet(entries, snapshot, force_full=args.full)
         except Exception as e:
             print(f'ERROR in Phase 5: {e}')
             send_error_alert(str(e), 'Phase 5: Write Akdemia2526 sheet')
             sys.exit(1)
+        if not DRY_RUN:
+            save_snapshot(snapshot)
     else:
         print('\n  Skipping sheet update (--skip-sheets).')
 
@@ -52,9 +52,10 @@ import os
 import re
 import secrets
 import subprocess
-import xmlrpc.client
 from datetime import date, datetime, timedelta
 
+from odoo_rpc import OdooClient
+
 # ============================================================================
 # Configuration
 # ============================================================================
@@ -155,7 +156,7 @@ def prune_state(state, days=14):
 # Odoo XML-RPC
 # ============================================================================
 
-_odoo_conn = None
+_odoo_client = None
 
 
 def _load_prod_config():
@@ -164,42 +165,22 @@ def _load_prod_config():
 
 
 def odoo():
-    global _odoo_conn
-    if _odoo_conn:
-        return _odoo_conn
-    cfg = _load_prod_config()
-    url = cfg['url']
-    db  = cfg['db']
-    user = cfg['user']
-    api_key = cfg['api_key']
-
-    common = xmlrpc.client.ServerProxy(f"{url}/xmlrpc/2/common")
-    uid = common.authenticate(db, user, api_key, {})
-    if not uid:
-        raise RuntimeError("Odoo XML-RPC authentication failed")
-    models = xmlrpc.client.ServerProxy(f"{url}/xmlrpc/2/object", allow_none=True)
-    _odoo_conn = (db, uid, api_key, models)
-    logger.info("Odoo connected (uid=%d, db=%s)", uid, db)
-    return _odoo_conn
+    global _odoo_client
+    if _odoo_client is None:
+        _odoo_client = OdooClient.from_config(_load_prod_config())
+    return _odoo_client
 
 
 def odoo_execute(model, method, args, kwargs=None):
-    db, uid, pwd, m = odoo()
-    return m.execute_kw(db, uid, pwd, model, method, args, kwargs or {})
+    return odoo().execute(model, method, *args, **(kwargs or {}))
 
 
 def odoo_search_read(model, domain, fields, limit=0, order=''):
-    kwargs = {'fields': fields}
-    if limit:
-        kwargs['limit'] = limit
-    if order:
-        kwargs['order'] = order
-    return odoo_execute(model, 'search_read', [domain], kwargs)
+    return odoo().search_read(model, domain, fields, limit=limit, order=order)
 
 
 def odoo_get_param(key, default=''):
-    rows = odoo_search_read('ir.config_parameter', [('key', '=', key)], ['value'], limit=1)
-    return rows[0]['value'] if rows else default
+    return odoo().get_param(key, default)
 
 
 _web_base_url = None
@@ -215,7 +196,7 @@ def _get_or_create_fix_secret() -> str:
         val = odoo_get_param('attendance.fix_secret', '')
         if not val:
             val = secrets.token_hex(32)
-            odoo_execute('ir.config_parameter', 'set_param', ['attendance.fix_secret', val])
+            odoo().set_param('attendance.fix_secret', val)
             logger.info("Created new attendance.fix_secret in ir.config_parameter")
         _fix_secret_cache = val
         return val
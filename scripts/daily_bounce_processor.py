@@ -17,21 +17,31 @@ Post-processing:
   - Updates Freescout conversations with tier prefix, bounced email as customer,
     internal note, and status change (active or closed)
 
+Batch processing:
+  - All bounced addresses are gathered from Freescout first, then existing
+    mail.bounce.log rows, matching res.partner / mailing.contact rows and tag
+    names are resolved in a few bulk queries (exact match on the normalized
+    mail.email.index of ueipab_bounce_log)
+  - CLEAN/FLAG/LOG is decided in memory; email removals, chatter notes and
+    bounce logs are applied afterwards in grouped calls
+
 Usage:
     python3 /opt/odoo-dev/scripts/daily_bounce_processor.py
 
 Author: Claude Code Assistant
 Date: 2026-02-03
 Updated: 2026-02-06 (Freescout post-processing + Odoo bounce log creation)
+Updated: 2026-10-18 (batch lookups and grouped writes via odoo_rpc)
 """
 
 import csv
 import json
 import os
 import re
-import xmlrpc.client
 from datetime import datetime, timedelta
 
+from odoo_rpc import OdooClient
+
 # ============================================================================
 # Configuration
 # ============================================================================
@@ -149,12 +159,20 @@ TEST_BOUNCE_DATA = [
 class BounceProcessor:
 
     def __init__(self):
-        self.uid = None
-        self.models = None
+        self.odoo = None                 # odoo_rpc.OdooClient
         self.state = {}
         self.freescout_conn = None       # Persistent Freescout MySQL connection
         self.freescout_admin_id = None   # Freescout admin user ID for notes
         self.freescout_updates = {}      # conv_id -> update info for post-processing
+        # Batch lookups, resolved once in _prefetch_odoo_data()
+        self.existing_logs = {}          # bounced email -> latest mail.bounce.log {id, state}
+        self.partners_by_email = {}      # normalized email -> [res.partner rows]
+        self.contacts_by_email = {}      # normalized email -> [mailing.contact rows]
+        self.tag_names = {}              # res.partner.category id -> name
+        # Grouped writes, applied in _flush_odoo_writes()
+        self.pending_email_writes = {}   # (model, record id) -> (new email, bounced email)
+        self.pending_notes = []          # (model, record id, mail.message vals)
+        self.pending_bounce_logs = []    # (vals, results entry)
         self.results = {
             'processed': [],
             'partners_cleaned': [],
@@ -211,9 +229,16 @@ class BounceProcessor:
             print("ERROR: Cannot connect to Odoo. Aborting.")
             return
 
+        if not self._prefetch_odoo_data(bounces):
+            print("ERROR: Cannot resolve bounced emails. Aborting.")
+            self._close_freescout_connection()
+            return
+
         for bounce in bounces:
             self.process_bounce(bounce)
 
+        self._flush_odoo_writes()
+
         # Freescout post-processing (MySQL writes)
         if FREESCOUT_POSTPROCESS and self.freescout_updates:
             self._apply_freescout_postprocessing()
@@ -462,15 +487,8 @@ class BounceProcessor:
 
     def connect_odoo(self):
         try:
-            common = xmlrpc.client.ServerProxy(f'{ODOO_URL}/xmlrpc/2/common')
-            self.uid = common.authenticate(ODOO_DB, ODOO_USER, ODOO_PASSWORD, {})
-
-            if not self.uid:
-                print("ERROR: Odoo authentication failed.")
-                return False
-
-            self.models = xmlrpc.client.ServerProxy(f'{ODOO_URL}/xmlrpc/2/object')
-            print(f"Connected to Odoo as user ID: {self.uid}\n")
+            self.odoo = OdooClient.from_config(ODOO_CONFIGS[TARGET_ENV])
+            print(f"Connected to Odoo as user ID: {self.odoo.uid}\n")
             return True
 
         except Exception as e:
@@ -479,38 +497,80 @@ class BounceProcessor:
             traceback.print_exc()
             return False
 
-    # ---- Tag checking -----------------------------------------------------
+    # ---- Batch lookups (Odoo) ---------------------------------------------
 
-    def _partner_has_representante_tag(self, partner_id):
-        """Check if a partner has any of the Representante tags."""
-        partner = self.models.execute_kw(
-            ODOO_DB, self.uid, ODOO_PASSWORD,
-            'res.partner', 'read',
-            [[partner_id]],
-            {'fields': ['category_id']}
-        )
-        if partner:
-            return bool(set(partner[0].get('category_id', [])) & set(REPRESENTANTE_TAG_IDS))
-        return False
+    @staticmethod
+    def split_emails(email_field):
+        """Normalized (stripped, lowercased) addresses of a ';'-separated field."""
+        return [e.strip().lower() for e in (email_field or '').split(';') if e.strip()]
+
+    def _prefetch_odoo_data(self, bounces):
+        """Resolve everything process_bounce() reads from Odoo in bulk.
+
+        Addresses are matched exactly through the mail.email.index
+        (ueipab_bounce_log), so no ilike scans and no substring false hits.
+        Returns False if the addresses could not be resolved.
+        """
+        emails = list(dict.fromkeys(b['bounced_email'].strip().lower() for b in bounces))
+        print(f"Resolving {len(emails)} email(s) in Odoo...")
+
+        try:
+            logs = self.odoo.search_read_in(
+                'mail.bounce.log', 'bounced_email',
+                [b['bounced_email'] for b in bounces], ['id', 'state'])
+            for email, rows in logs.items():
+                if rows:
+                    self.existing_logs[email] = max(rows, key=lambda r: r['id'])
+        except Exception as e:
+            print(f"  WARNING: Could not check existing bounce logs: {e}")
+
+        try:
+            owners = self.odoo.email_lookup(emails)
+            partners = self.odoo.read_map(
+                'res.partner',
+                {pid for o in owners.values() for pid in o['partner_ids']},
+                ['id', 'name', 'email', 'category_id'])
+            contacts = self.odoo.read_map(
+                'mailing.contact',
+                {mid for o in owners.values() for mid in o['mailing_contact_ids']},
+                ['id', 'name', 'email'])
+        except Exception as e:
+            # Treating every address as NOT FOUND would log bogus bounces
+            print(f"ERROR: Could not resolve bounced emails in Odoo: {e}")
+            return False
+
+        # Rows are shared between addresses: a field cleaned for one bounce
+        # is seen by the next bounce of the same record.
+        for email in emails:
+            found = owners.get(email) or {}
+            self.partners_by_email[email] = [
+                partners[pid] for pid in found.get('partner_ids', []) if pid in partners]
+            self.contacts_by_email[email] = [
+                contacts[mid] for mid in found.get('mailing_contact_ids', []) if mid in contacts]
+
+        tag_ids = {tag_id for p in partners.values() for tag_id in p.get('category_id', [])}
+        if tag_ids:
+            try:
+                tags = self.odoo.read('res.partner.category', list(tag_ids), ['name'])
+                self.tag_names = {t['id']: t['name'] for t in tags}
+            except Exception as e:
+                print(f"  WARNING: Could not read partner tags: {e}")
+
+        print(f"  Existing bounce logs: {len(self.existing_logs)}, "
+              f"partner matches: {sum(1 for r in self.partners_by_email.values() if r)}, "
+              f"mailing.contact matches: {sum(1 for r in self.contacts_by_email.values() if r)}\n")
+        return True
 
     def _get_partner_tags(self, tag_ids):
         """Get tag names from IDs."""
-        if not tag_ids:
-            return []
-        tags = self.models.execute_kw(
-            ODOO_DB, self.uid, ODOO_PASSWORD,
-            'res.partner.category', 'read',
-            [tag_ids],
-            {'fields': ['name']}
-        )
-        return [t['name'] for t in tags]
+        return [self.tag_names[t] for t in (tag_ids or []) if t in self.tag_names]
 
     # ---- Bounce log creation (Odoo) --------------------------------------
 
     def _create_bounce_log_record(self, bounced_email, reason, reason_text,
                                   conv_id, tier, partner_id=None,
                                   mailing_contact_id=None):
-        """Create a mail.bounce.log record in Odoo via XML-RPC."""
+        """Queue a mail.bounce.log record; created in bulk by _flush_odoo_writes()."""
         if not CREATE_BOUNCE_LOG:
             return None
 
@@ -530,32 +590,15 @@ class BounceProcessor:
         print(f"     {prefix}Creating mail.bounce.log: tier={tier}, "
               f"partner={partner_id or 'N/A'}, mc={mailing_contact_id or 'N/A'}")
 
+        entry = {
+            'bounced_email': bounced_email, 'tier': tier,
+            'conv_id': conv_id, 'record_id': None,
+        }
         if DRY_RUN:
-            self.results['bounce_logs_created'].append({
-                'bounced_email': bounced_email, 'tier': tier,
-                'conv_id': conv_id, 'record_id': None,
-            })
-            return None
-
-        try:
-            record_id = self.models.execute_kw(
-                ODOO_DB, self.uid, ODOO_PASSWORD,
-                'mail.bounce.log', 'create',
-                [vals]
-            )
-            print(f"     Created mail.bounce.log #{record_id}")
-            self.results['bounce_logs_created'].append({
-                'bounced_email': bounced_email, 'tier': tier,
-                'conv_id': conv_id, 'record_id': record_id,
-            })
-            return record_id
-        except Exception as e:
-            print(f"     WARNING: Could not create bounce log: {e}")
-            self.results['errors'].append({
-                'email': bounced_email, 'model': 'mail.bounce.log',
-                'error': str(e),
-            })
-            return None
+            self.results['bounce_logs_created'].append(entry)
+        else:
+            self.pending_bounce_logs.append((vals, entry))
+        return None
 
     # ---- Freescout update accumulation ------------------------------------
 
@@ -619,25 +662,6 @@ class BounceProcessor:
 
     # ---- Per-bounce processing (3-tier) -----------------------------------
 
-    def _check_existing_bounce_log(self, email):
-        """Check if a bounce log already exists for this email in Odoo.
-
-        Returns: dict with 'exists' bool, 'state' str, 'id' int, or None.
-        """
-        try:
-            bl_ids = self.models.execute_kw(
-                ODOO_DB, self.uid, ODOO_PASSWORD,
-                'mail.bounce.log', 'search_read',
-                [[('bounced_email', '=', email)]],
-                {'fields': ['id', 'state'], 'limit': 1,
-                 'order': 'id desc'}
-            )
-            if bl_ids:
-                return bl_ids[0]
-        except Exception as e:
-            print(f"  WARNING: Could not check existing bounce logs: {e}")
-        return None
-
     def process_bounce(self, bounce):
         email = bounce['bounced_email']
         conv_id = bounce['freescout_conversation_id']
@@ -653,7 +677,7 @@ class BounceProcessor:
         self.results['processed'].append(bounce)
 
         # ── Cross-check: skip if bounce log already exists in Odoo ──
-        existing_bl = self._check_existing_bounce_log(email)
+        existing_bl = self.existing_logs.get(email)
         if existing_bl:
             bl_state = existing_bl['state']
             bl_id = existing_bl['id']
@@ -670,25 +694,17 @@ class BounceProcessor:
             self.results['skipped_existing'] = self.results.get('skipped_existing', 0) + 1
             return
 
-        # Search for the email in res.partner
-        partner_ids = self._search_partners_by_email(email)
-
-        if partner_ids:
-            partners = self.models.execute_kw(
-                ODOO_DB, self.uid, ODOO_PASSWORD,
-                'res.partner', 'read',
-                [partner_ids],
-                {'fields': ['id', 'name', 'email', 'category_id']}
-            )
+        # Exact matches from the batch email index, re-checked against the
+        # fields as cleaned earlier in this run
+        key = email.strip().lower()
+        partners = [p for p in self.partners_by_email.get(key, [])
+                    if key in self.split_emails(p.get('email'))]
 
+        if partners:
             # Separate into Representante vs non-Representante
             rep_partners = []
             non_rep_partners = []
             for p in partners:
-                # Verify email actually matches (ilike can be too broad)
-                emails_in_field = [e.strip().lower() for e in (p.get('email') or '').split(';') if e.strip()]
-                if email.lower() not in emails_in_field:
-                    continue
                 if set(p.get('category_id', [])) & set(REPRESENTANTE_TAG_IDS):
                     rep_partners.append(p)
                 else:
@@ -704,7 +720,7 @@ class BounceProcessor:
 
                 # Also clean mailing.contact if any Representante partner was cleaned
                 if rep_partners:
-                    self._search_and_clean_mailing_contacts(email, reason, reason_text, conv_id)
+                    self._clean_mailing_contacts(email, reason, reason_text, conv_id)
             else:
                 # Temporary failure: FLAG even Representante partners
                 for partner in rep_partners:
@@ -718,13 +734,10 @@ class BounceProcessor:
                 self._flag_partner(partner, email, reason, reason_text, conv_id, tag_names,
                                    flag_reason='non-representante')
 
-            if not rep_partners and not non_rep_partners:
-                # Email found via ilike but didn't actually match any partner
-                self._handle_not_found(email, conv_id)
-
         else:
             # Check mailing.contact only (no partner found)
-            mc_found = self._search_mailing_contacts_by_email(email)
+            mc_found = [mc for mc in self.contacts_by_email.get(key, [])
+                        if key in self.split_emails(mc.get('email'))]
             if mc_found:
                 # Email exists in mailing.contact but no partner -> FLAG
                 self._flag_mailing_contact_only(email, reason, reason_text, conv_id, mc_found)
@@ -734,38 +747,6 @@ class BounceProcessor:
 
         print()
 
-    def _search_partners_by_email(self, email):
-        """Search res.partner by email (ilike for case-insensitive)."""
-        try:
-            return self.models.execute_kw(
-                ODOO_DB, self.uid, ODOO_PASSWORD,
-                'res.partner', 'search',
-                [[['email', 'ilike', email]]]
-            )
-        except Exception as e:
-            print(f"  -> ERROR searching partners: {e}")
-            self.results['errors'].append({'email': email, 'model': 'res.partner', 'error': str(e)})
-            return []
-
-    def _search_mailing_contacts_by_email(self, email):
-        """Search mailing.contact by email."""
-        try:
-            contact_ids = self.models.execute_kw(
-                ODOO_DB, self.uid, ODOO_PASSWORD,
-                'mailing.contact', 'search',
-                [[['email', 'ilike', email]]]
-            )
-            if contact_ids:
-                return self.models.execute_kw(
-                    ODOO_DB, self.uid, ODOO_PASSWORD,
-                    'mailing.contact', 'read',
-                    [contact_ids],
-                    {'fields': ['id', 'name', 'email']}
-                )
-        except Exception as e:
-            print(f"  -> ERROR searching mailing contacts: {e}")
-        return []
-
     # ---- TIER 1: CLEAN (Representante) ------------------------------------
 
     def _clean_partner(self, partner, email, reason, reason_text, conv_id, tag_names):
@@ -779,17 +760,15 @@ class BounceProcessor:
         print(f"     Before: {current_email}")
         print(f"     After:  {new_email or '(empty)'}")
 
+        # Later bounces of the same run must see the cleaned field
+        partner['email'] = new_email
         if not DRY_RUN:
-            self.models.execute_kw(
-                ODOO_DB, self.uid, ODOO_PASSWORD,
-                'res.partner', 'write',
-                [[partner['id']], {'email': new_email}]
-            )
-            self._post_chatter_note(
+            self.pending_email_writes[('res.partner', partner['id'])] = (new_email, email)
+            self.pending_notes.append(('res.partner', partner['id'], self._chatter_note_vals(
                 'res.partner', partner['id'],
                 email, reason, reason_text,
                 current_email, new_email, conv_id
-            )
+            )))
 
         # Create bounce log record
         log_id = self._create_bounce_log_record(
@@ -815,58 +794,33 @@ class BounceProcessor:
             'tags': tag_names,
         })
 
-    def _search_and_clean_mailing_contacts(self, email, reason, reason_text, conv_id):
+    def _clean_mailing_contacts(self, email, reason, reason_text, conv_id):
         """Clean mailing.contact records for a Representante bounce."""
-        try:
-            contact_ids = self.models.execute_kw(
-                ODOO_DB, self.uid, ODOO_PASSWORD,
-                'mailing.contact', 'search',
-                [[['email', 'ilike', email]]]
-            )
-
-            if not contact_ids:
-                return
-
-            contacts = self.models.execute_kw(
-                ODOO_DB, self.uid, ODOO_PASSWORD,
-                'mailing.contact', 'read',
-                [contact_ids],
-                {'fields': ['id', 'name', 'email']}
-            )
+        for contact in self.contacts_by_email.get(email.strip().lower(), []):
+            current_email = contact.get('email', '') or ''
+            if email.lower() not in self.split_emails(current_email):
+                continue
 
-            for contact in contacts:
-                current_email = contact.get('email', '') or ''
-                emails_in_field = [e.strip().lower() for e in current_email.split(';') if e.strip()]
-                if email.lower() not in emails_in_field:
-                    continue
-
-                new_email = self.remove_bounced_email(current_email, email)
-
-                prefix = "[DRY_RUN] " if DRY_RUN else ""
-                print(f"  -> {prefix}CLEAN mailing.contact #{contact['id']} ({contact['name']})")
-                print(f"     Before: {current_email}")
-                print(f"     After:  {new_email or '(empty)'}")
-
-                if not DRY_RUN:
-                    self.models.execute_kw(
-                        ODOO_DB, self.uid, ODOO_PASSWORD,
-                        'mailing.contact', 'write',
-                        [[contact['id']], {'email': new_email}]
-                    )
-
-                self.results['mailing_contacts_cleaned'].append({
-                    'contact_id': contact['id'],
-                    'contact_name': contact['name'],
-                    'email': email,
-                    'old_email_field': current_email,
-                    'new_email_field': new_email,
-                    'reason': reason,
-                    'conversation_id': conv_id,
-                })
+            new_email = self.remove_bounced_email(current_email, email)
+            contact['email'] = new_email
 
-        except Exception as e:
-            print(f"  -> ERROR cleaning mailing contacts: {e}")
-            self.results['errors'].append({'email': email, 'model': 'mailing.contact', 'error': str(e)})
+            prefix = "[DRY_RUN] " if DRY_RUN else ""
+            print(f"  -> {prefix}CLEAN mailing.contact #{contact['id']} ({contact['name']})")
+            print(f"     Before: {current_email}")
+            print(f"     After:  {new_email or '(empty)'}")
+
+            if not DRY_RUN:
+                self.pending_email_writes[('mailing.contact', contact['id'])] = (new_email, email)
+
+            self.results['mailing_contacts_cleaned'].append({
+                'contact_id': contact['id'],
+                'contact_name': contact['name'],
+                'email': email,
+                'old_email_field': current_email,
+                'new_email_field': new_email,
+                'reason': reason,
+                'conversation_id': conv_id,
+            })
 
     # ---- TIER 2: FLAG (non-Representante) ---------------------------------
 
@@ -911,9 +865,6 @@ class BounceProcessor:
         """Flag a bounce found only in mailing.contact (no partner)."""
         prefix = "[DRY_RUN] " if DRY_RUN else ""
         for mc in contacts:
-            emails_in_field = [e.strip().lower() for e in (mc.get('email') or '').split(';') if e.strip()]
-            if email.lower() not in emails_in_field:
-                continue
             print(f"  -> {prefix}FLAG mailing.contact #{mc['id']} ({mc['name']})")
             print(f"     No linked partner - flagged for review")
 
@@ -978,9 +929,9 @@ class BounceProcessor:
 
     # ---- Chatter note -----------------------------------------------------
 
-    def _post_chatter_note(self, model, record_id, bounced_email, reason,
+    def _chatter_note_vals(self, model, record_id, bounced_email, reason,
                            reason_text, old_email, new_email, conv_id):
-        """Post an internal note on the record's chatter for audit trail."""
+        """mail.message vals of the internal audit note for a cleaned record."""
         reason_labels = {
             'mailbox_full': 'Buzon lleno',
             'invalid_address': 'Direccion invalida',
@@ -1002,33 +953,100 @@ class BounceProcessor:
             f"<b>Fecha:</b> {now}"
         )
 
-        try:
-            self.models.execute_kw(
-                ODOO_DB, self.uid, ODOO_PASSWORD,
-                'mail.message', 'create',
-                [{
-                    'body': body,
-                    'message_type': 'comment',
-                    'subtype_id': self._get_note_subtype_id(),
-                    'model': model,
-                    'res_id': record_id,
-                }]
-            )
-        except Exception as e:
-            print(f"     WARNING: Could not post chatter note: {e}")
+        return {
+            'body': body,
+            'message_type': 'comment',
+            'model': model,
+            'res_id': record_id,
+        }
 
     def _get_note_subtype_id(self):
         """Cache and return the ID of mail.mt_note subtype."""
         if not hasattr(self, '_note_subtype_id'):
-            ids = self.models.execute_kw(
-                ODOO_DB, self.uid, ODOO_PASSWORD,
-                'ir.model.data', 'search_read',
-                [[['module', '=', 'mail'], ['name', '=', 'mt_note']]],
-                {'fields': ['res_id'], 'limit': 1}
-            )
+            ids = self.odoo.search_read(
+                'ir.model.data',
+                [['module', '=', 'mail'], ['name', '=', 'mt_note']],
+                ['res_id'], limit=1)
             self._note_subtype_id = ids[0]['res_id'] if ids else False
         return self._note_subtype_id
 
+    # ---- Grouped Odoo writes ----------------------------------------------
+
+    def _flush_odoo_writes(self):
+        """Apply the queued email removals, chatter notes and bounce logs.
+
+        Records left with the same email value share one write (most cleaned
+        partners end up empty); notes and bounce logs go in one create each.
+        """
+        if DRY_RUN:
+            return
+
+        failed = set()
+        for model in ('res.partner', 'mailing.contact'):
+            pending = {rid: vals for (m, rid), vals in self.pending_email_writes.items()
+                       if m == model}
+            if not pending:
+                continue
+            try:
+                calls = self.odoo.write_many(
+                    model, {rid: {'email': new_email} for rid, (new_email, _) in pending.items()})
+                print(f"Updated {len(pending)} {model} record(s) in {calls} call(s)")
+            except Exception as e:
+                print(f"ERROR updating {model}: {e}")
+                for rid, (_, bounced_email) in pending.items():
+                    failed.add((model, rid))
+                    self.results['errors'].append(
+                        {'email': bounced_email, 'model': model, 'error': str(e)})
+
+        # Audit notes only for records actually cleaned
+        notes = [vals for model, rid, vals in self.pending_notes if (model, rid) not in failed]
+        if notes:
+            subtype_id = self._get_note_subtype_id()
+            for vals in notes:
+                vals['subtype_id'] = subtype_id
+            try:
+                self.odoo.create('mail.message', notes)
+                print(f"Posted {len(notes)} chatter note(s)")
+            except Exception as e:
+                print(f"WARNING: Could not post chatter notes: {e}")
+
+        if self.pending_bounce_logs:
+            self._create_pending_bounce_logs()
+
+    def _create_pending_bounce_logs(self):
+        """Create queued mail.bounce.log records, then link them to the Freescout updates."""
+        vals_list = [vals for vals, _ in self.pending_bounce_logs]
+        try:
+            record_ids = self.odoo.create('mail.bounce.log', vals_list)
+        except Exception as e:
+            # One invalid record fails the whole batch: retry one by one
+            print(f"WARNING: Bulk bounce log creation failed ({e}), retrying per record")
+            record_ids = []
+            for vals in vals_list:
+                try:
+                    record_ids.append(self.odoo.create('mail.bounce.log', vals))
+                except Exception as e:
+                    print(f"     WARNING: Could not create bounce log: {e}")
+                    self.results['errors'].append({
+                        'email': vals['bounced_email'], 'model': 'mail.bounce.log',
+                        'error': str(e),
+                    })
+                    record_ids.append(None)
+
+        linked = set()
+        for (vals, entry), record_id in zip(self.pending_bounce_logs, record_ids):
+            if not record_id:
+                continue
+            entry['record_id'] = record_id
+            self.results['bounce_logs_created'].append(entry)
+            # Each Freescout update keeps the first bounce log of its conversation
+            conv_id = entry['conv_id']
+            update = self.freescout_updates.get(conv_id)
+            if update and update['bounce_log_id'] is None and conv_id not in linked:
+                update['bounce_log_id'] = record_id
+                linked.add(conv_id)
+        print(f"Created {len([r for r in record_ids if r])} mail.bounce.log record(s)")
+
     # ---- Freescout post-processing (MySQL writes) -------------------------
 
     def _apply_freescout_postprocessing(self):
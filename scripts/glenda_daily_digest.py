@@ -23,12 +23,13 @@ import logging
 import os
 import re
 import sys
-import xmlrpc.client
 import pymysql
 import pymysql.cursors
 from collections import Counter, defaultdict
 from datetime import date, datetime, timedelta
 
+from odoo_rpc import OdooClient
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s [%(levelname)s] %(message)s',
@@ -92,27 +93,28 @@ VET_OFFSET = -4  # Venezuela Eastern Time = UTC-4
 
 # ── Odoo connection ───────────────────────────────────────────────────────────
 
+_clients = {}
+
+
 def connect(env_name):
-    cfg = ODOO_CONFIGS[env_name]
-    if not cfg['password']:
-        raise RuntimeError(f"ODOO_PASSWORD not set for {env_name}")
-    common = xmlrpc.client.ServerProxy(f"{cfg['url']}/xmlrpc/2/common")
-    uid    = common.authenticate(cfg['db'], cfg['user'], cfg['password'], {})
-    if not uid:
-        raise RuntimeError(f"Authentication failed for {env_name}")
-    models = xmlrpc.client.ServerProxy(f"{cfg['url']}/xmlrpc/2/object", allow_none=True)
-    return cfg['db'], uid, cfg['password'], models
+    """One OdooClient per environment, shared by every fetch in the run."""
+    if env_name not in _clients:
+        cfg = ODOO_CONFIGS[env_name]
+        if not cfg['password']:
+            raise RuntimeError(f"ODOO_PASSWORD not set for {env_name}")
+        _clients[env_name] = OdooClient.from_config(cfg)
+    return _clients[env_name]
 
 
-def rpc(models, db, uid, pw, model, method, args=None, kwargs=None):
-    return models.execute_kw(db, uid, pw, model, method, args or [], kwargs or {})
+def rpc(odoo, model, method, args=None, kwargs=None):
+    return odoo.execute(model, method, *(args or []), **(kwargs or {}))
 
 
 # ── Data collection ───────────────────────────────────────────────────────────
 
 def fetch_data(env_name, day):
     """Fetch all relevant data for the given day from Odoo."""
-    db, uid, pw, models = connect(env_name)
+    odoo = connect(env_name)
 
     # Date range in UTC (Odoo stores UTC; VET = UTC-4)
     start_utc = datetime(day.year, day.month, day.day, 4, 0, 0)   # 00:00 VET
@@ -134,7 +136,7 @@ def fetch_data(env_name, day):
         'create_date', 'last_message_date', 'resolved_date',
         'channel', 'telegram_chat_id',
     ]
-    convs = rpc(models, db, uid, pw, 'ai.agent.conversation', 'search_read',
+    convs = rpc(odoo, 'ai.agent.conversation', 'search_read',
                 [conv_domain], {'fields': conv_fields, 'limit': 500})
 
     if not convs:
@@ -146,7 +148,7 @@ def fetch_data(env_name, day):
     # Messages for those conversations
     msg_fields = ['conversation_id', 'direction', 'body',
                   'ai_input_tokens', 'ai_output_tokens', 'create_date']
-    msgs = rpc(models, db, uid, pw, 'ai.agent.message', 'search_read',
+    msgs = rpc(odoo, 'ai.agent.message', 'search_read',
                [[('conversation_id', 'in', conv_ids)]],
                {'fields': msg_fields, 'limit': 5000})
 
@@ -706,11 +708,11 @@ BONUS_MIN_CONVS        = 3
 BONUS_MIN_FEEDBACK     = 1
 
 
-def fetch_calibration_data(db, uid, pw, models, start_str, end_str):
+def fetch_calibration_data(odoo, start_str, end_str):
     """Fetch calibration programme scoreboard + yesterday's activity."""
 
     # All enrolled participants
-    acks = rpc(models, db, uid, pw, 'hr.notice.acknowledgment', 'search_read',
+    acks = rpc(odoo, 'hr.notice.acknowledgment', 'search_read',
                [[('notice_key', '=', CALIBRATION_NOTICE_KEY)]],
                {'fields': ['id', 'employee_id', 'wa_number', 'state'], 'limit': 100})
     if not acks:
@@ -737,7 +739,7 @@ def fetch_calibration_data(db, uid, pw, models, start_str, end_str):
         }
 
     # All general_inquiry conversations — match by phone digits
-    all_convs = rpc(models, db, uid, pw, 'ai.agent.conversation', 'search_read',
+    all_convs = rpc(odoo, 'ai.agent.conversation', 'search_read',
                     [[('skill_id.code', '=', 'general_inquiry')]],
                     {'fields': ['phone', 'create_date', 'state'], 'limit': 2000})
     for conv in all_convs:
@@ -749,7 +751,7 @@ def fetch_calibration_data(db, uid, pw, models, start_str, end_str):
             participants[d]['conv_yesterday'] += 1
 
     # All feedback records
-    all_fb = rpc(models, db, uid, pw, 'ai.agent.feedback', 'search_read',
+    all_fb = rpc(odoo, 'ai.agent.feedback', 'search_read',
                  [[]],
                  {'fields': ['employee_id', 'category', 'suggestion', 'state', 'date'], 'limit': 500})
 
@@ -1090,10 +1092,10 @@ def build_freescout_section(fs_data):
 # ── Email sending ─────────────────────────────────────────────────────────────
 
 def send_email(env_name, subject, html_body):
-    db, uid, pw, models = connect(env_name)
+    odoo = connect(env_name)
     # Create as 'outgoing' — Odoo's mail scheduler picks it up within minutes.
     # Calling send() via XML-RPC has session/cache issues; queuing is safer.
-    mail_id = rpc(models, db, uid, pw, 'mail.mail', 'create', [[{
+    mail_id = rpc(odoo, 'mail.mail', 'create', [[{
         'subject':    subject,
         'email_from': FROM_EMAIL,
         'email_to':   TO_EMAIL,
@@ -1145,9 +1147,8 @@ def main():
     # Calibration data
     calib = None
     try:
-        db, uid, pw, models_conn = connect(args.env)
         calib = fetch_calibration_data(
-            db, uid, pw, models_conn,
+            connect(args.env),
             day_start_utc.strftime('%Y-%m-%d %H:%M:%S'),
             day_end_utc.strftime('%Y-%m-%d %H:%M:%S'),
         )
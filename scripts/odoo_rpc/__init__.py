@@ -0,0 +1,20 @@
+"""
+Shared Odoo RPC client for the automation scripts.
+
+    import sys, os
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # if not run from scripts/
+    from odoo_rpc import OdooClient
+
+    odoo = OdooClient(url, db, user, password)          # JSON-RPC (default)
+    odoo = OdooClient(url, db, user, password, protocol='xmlrpc')
+    odoo = OdooClient.from_config(ODOO_CONFIGS[TARGET_ENV])
+
+    partners = odoo.search_read('res.partner', [('email', '!=', False)], ['name'])
+    by_email = odoo.search_read_in('res.partner', 'email', emails, ['id', 'name'])
+    odoo.write_many('res.partner', {pid: {'active': False} for pid in ids})
+
+See client.py for the batching helpers and the exit report.
+"""
+from .client import OdooClient, RPCError
+
+__all__ = ['OdooClient', 'RPCError']
@@ -0,0 +1,312 @@
+"""
+OdooClient — one authenticated connection per script run.
+
+Why not a bare xmlrpc.client.ServerProxy:
+  - every call goes through one requests.Session, so the TLS connection to
+    odoo.ueipab.edu.ve is opened once and kept alive for the whole run
+  - JSON-RPC (/jsonrpc) is the default: smaller payloads than XML-RPC and
+    None marshals fine (no 'cannot marshal None' on action_post)
+  - the helpers batch the patterns the scripts used to loop over:
+        read(ids)             → chunks of BATCH_SIZE ids per call
+        search_read_in(...)   → one ('field', 'in', values) call per chunk,
+                                 rows grouped back per value
+        write_many(...)       → one write per distinct vals dict
+        email_lookup(...)     → exact address → partners / mailing contacts
+                                 (mail.email.index) instead of ilike scans
+        create([vals, ...])   → one create for the whole list
+  - per model.method call counts and latency are logged at exit, so a cron
+    log shows how many round-trips the run cost
+
+Errors raised by the server come back as RPCError, a subclass of
+xmlrpc.client.Fault, so existing `except xmlrpc.client.Fault` handlers keep
+working with either protocol.
+"""
+
+import atexit
+import itertools
+import json
+import logging
+import time
+import xmlrpc.client
+from collections import defaultdict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger('odoo_rpc')
+
+BATCH_SIZE = 500        # ids / values per read, search_read_in and write call
+DEFAULT_TIMEOUT = 120   # seconds per round-trip
+
+
+class RPCError(xmlrpc.client.Fault):
+    """Server-side error from Odoo (either protocol)."""
+
+    def __init__(self, fault_code, fault_string, data=None):
+        super().__init__(fault_code, fault_string)
+        self.data = data or {}
+
+
+def _chunks(seq, size):
+    it = iter(seq)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class _SessionTransport(xmlrpc.client.Transport):
+    """XML-RPC transport over a shared requests.Session (keep-alive, pooling)."""
+
+    def __init__(self, session, scheme, timeout):
+        super().__init__()
+        self._session = session
+        self._scheme = scheme
+        self._timeout = timeout
+
+    def request(self, host, handler, request_body, verbose=False):
+        url = f"{self._scheme}://{host}{handler}"
+        resp = self._session.post(
+            url, data=request_body, timeout=self._timeout,
+            headers={'Content-Type': 'text/xml'})
+        if resp.status_code != 200:
+            raise xmlrpc.client.ProtocolError(
+                url, resp.status_code, resp.reason, dict(resp.headers))
+        parser, unmarshaller = self.getparser()
+        parser.feed(resp.content)
+        parser.close()
+        return unmarshaller.close()
+
+
+class OdooClient:
+    """Authenticated Odoo connection with batching helpers and call stats."""
+
+    def __init__(self, url, db, user, password, protocol='jsonrpc',
+                 timeout=DEFAULT_TIMEOUT, batch_size=BATCH_SIZE, report_at_exit=True):
+        if protocol not in ('jsonrpc', 'xmlrpc'):
+            raise ValueError(f"Unknown protocol: {protocol}")
+        self.url = url.rstrip('/')
+        self.db = db
+        self.user = user
+        self.password = password
+        self.protocol = protocol
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self._uid = None
+        self._request_id = itertools.count(1)
+        self._params = {}
+        # (model, method) -> [calls, total seconds, max seconds]
+        self.stats = defaultdict(lambda: [0, 0.0, 0.0])
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        if protocol == 'xmlrpc':
+            transport = _SessionTransport(
+                self.session, self.url.split('://', 1)[0], timeout)
+            self._common = xmlrpc.client.ServerProxy(
+                f"{self.url}/xmlrpc/2/common", transport=transport, allow_none=True)
+            self._object = xmlrpc.client.ServerProxy(
+                f"{self.url}/xmlrpc/2/object", transport=transport, allow_none=True)
+
+        if report_at_exit:
+            atexit.register(self.report)
+
+    @classmethod
+    def from_config(cls, cfg, **kwargs):
+        """Build from a script config dict: url, db, user and password (or api_key)."""
+        return cls(cfg['url'], cfg['db'], cfg['user'],
+                   cfg.get('password') or cfg.get('api_key') or '', **kwargs)
+
+    # ── Transport ─────────────────────────────────────────────────────────────
+
+    def _jsonrpc(self, service, method, args):
+        payload = {
+            'jsonrpc': '2.0',
+            'method': 'call',
+            'params': {'service': service, 'method': method, 'args': args},
+            'id': next(self._request_id),
+        }
+        resp = self.session.post(f"{self.url}/jsonrpc", json=payload, timeout=self.timeout)
+        resp.raise_for_status()
+        body = resp.json()
+        if body.get('error'):
+            error = body['error']
+            data = error.get('data') or {}
+            raise RPCError(error.get('code', 0),
+                           data.get('message') or error.get('message', ''), data)
+        return body.get('result')
+
+    def _call(self, service, method, args, label):
+        started = time.monotonic()
+        try:
+            if self.protocol == 'jsonrpc':
+                return self._jsonrpc(service, method, args)
+            proxy = self._common if service == 'common' else self._object
+            return getattr(proxy, method)(*args)
+        finally:
+            elapsed = time.monotonic() - started
+            stat = self.stats[label]
+            stat[0] += 1
+            stat[1] += elapsed
+            stat[2] = max(stat[2], elapsed)
+
+    @property
+    def uid(self):
+        if self._uid is None:
+            uid = self._call('common', 'authenticate',
+                             [self.db, self.user, self.password, {}],
+                             ('common', 'authenticate'))
+            if not uid:
+                raise RuntimeError(f"Odoo authentication failed ({self.user} @ {self.db})")
+            self._uid = uid
+            logger.info("Odoo connected (uid=%d, db=%s, %s)", uid, self.db, self.protocol)
+        return self._uid
+
+    def execute(self, model, method, *args, **kwargs):
+        """Plain execute_kw: execute('res.partner', 'write', [ids], {'x': 1})."""
+        return self._call(
+            'object', 'execute_kw',
+            [self.db, self.uid, self.password, model, method, list(args), kwargs],
+            (model, method))
+
+    # ── Batched helpers ───────────────────────────────────────────────────────
+
+    def search(self, model, domain, limit=0, order='', offset=0):
+        kwargs = {}
+        if limit:
+            kwargs['limit'] = limit
+        if order:
+            kwargs['order'] = order
+        if offset:
+            kwargs['offset'] = offset
+        return self.execute(model, 'search', domain, **kwargs)
+
+    def search_count(self, model, domain):
+        return self.execute(model, 'search_count', domain)
+
+    def search_read(self, model, domain, fields=None, limit=0, order='', offset=0):
+        kwargs = {'fields': fields or []}
+        if limit:
+            kwargs['limit'] = limit
+        if order:
+            kwargs['order'] = order
+        if offset:
+            kwargs['offset'] = offset
+        return self.execute(model, 'search_read', domain, **kwargs)
+
+    def read(self, model, ids, fields=None):
+        """Read any number of ids in chunks; rows come back in the order of ids."""
+        ids = list(dict.fromkeys(i for i in ids if i))
+        rows = {}
+        for chunk in _chunks(ids, self.batch_size):
+            for row in self.execute(model, 'read', chunk, fields=fields or []):
+                rows[row['id']] = row
+        return [rows[i] for i in ids if i in rows]
+
+    def read_map(self, model, ids, fields=None):
+        """{id: row} for read(model, ids, fields)."""
+        return {row['id']: row for row in self.read(model, ids, fields)}
+
+    def search_read_in(self, model, field, values, fields=None, domain=None):
+        """Replace a per-value search_read loop with one call per chunk.
+
+        Returns {value: [rows]} for every value of `values` (an empty list when
+        nothing matched). Many2one values are keyed by id, x2many rows are
+        listed under each of their ids. `field` is added to `fields` if missing.
+        """
+        values = list(dict.fromkeys(v for v in values if v not in (None, False, '')))
+        grouped = {v: [] for v in values}
+        if fields and field not in fields:
+            fields = list(fields) + [field]
+        for chunk in _chunks(values, self.batch_size):
+            rows = self.search_read(
+                model, list(domain or []) + [(field, 'in', chunk)], fields)
+            for row in rows:
+                raw = row.get(field)
+                if isinstance(raw, list):
+                    # many2one → [id, name]; x2many → [id, id, ...]
+                    keys = raw[:1] if len(raw) == 2 and isinstance(raw[1], str) else raw
+                else:
+                    keys = [raw]
+                for key in keys:
+                    if key in grouped:
+                        grouped[key].append(row)
+        return grouped
+
+    def create(self, model, vals):
+        """Create one record (dict → id) or many in a single call (list → ids)."""
+        if isinstance(vals, dict):
+            return self.execute(model, 'create', vals)
+        if not vals:
+            return []
+        ids = []
+        for chunk in _chunks(vals, self.batch_size):
+            ids.extend(self.execute(model, 'create', chunk))
+        return ids
+
+    def write(self, model, ids, vals):
+        ids = [ids] if isinstance(ids, int) else list(ids)
+        if not ids:
+            return True
+        return self.execute(model, 'write', ids, vals)
+
+    def write_many(self, model, updates):
+        """Apply {id: vals} (or [(ids, vals), ...]) with one write per distinct vals.
+
+        Returns the number of write round-trips issued.
+        """
+        items = updates.items() if isinstance(updates, dict) else updates
+        groups = {}
+        for ids, vals in items:
+            ids = [ids] if isinstance(ids, int) else list(ids)
+            key = json.dumps(vals, sort_keys=True, default=str)
+            groups.setdefault(key, (vals, []))[1].extend(ids)
+        calls = 0
+        for vals, ids in groups.values():
+            for chunk in _chunks(dict.fromkeys(ids), self.batch_size):
+                self.execute(model, 'write', chunk, vals)
+                calls += 1
+        return calls
+
+    def email_lookup(self, emails, include_archived=False):
+        """Exact owners of each address via the mail.email.index (ueipab_bounce_log).
+
+        Returns {normalized email: {'partner_ids': [...], 'mailing_contact_ids': [...]}}
+        with an entry for every address; multi-email values are split.
+        """
+        result = {}
+        for chunk in _chunks(dict.fromkeys(e for e in emails if e), self.batch_size):
+            result.update(self.execute('mail.email.index', 'lookup', chunk,
+                                       include_archived=include_archived))
+        return result
+
+    def get_param(self, key, default=''):
+        """ir.config_parameter value, cached for the rest of the run."""
+        if key not in self._params:
+            rows = self.search_read('ir.config_parameter', [('key', '=', key)], ['value'], limit=1)
+            self._params[key] = rows[0]['value'] if rows else None
+        value = self._params[key]
+        return default if value is None else value
+
+    def set_param(self, key, value):
+        self.execute('ir.config_parameter', 'set_param', key, value)
+        self._params[key] = value
+
+    # ── Report ────────────────────────────────────────────────────────────────
+
+    def report(self):
+        """Log round-trip counts and latency per model.method."""
+        if not self.stats:
+            return
+        total_calls = sum(s[0] for s in self.stats.values())
+        total_secs = sum(s[1] for s in self.stats.values())
+        logger.info("Odoo RPC: %d round-trips, %.1fs total (%s)",
+                    total_calls, total_secs, self.protocol)
+        for (model, method), (calls, secs, worst) in sorted(
+                self.stats.items(), key=lambda item: -item[1][1]):
+            logger.info("  %-40s %5d calls  avg %6.0f ms  max %6.0f ms",
+                        f"{model}.{method}", calls, secs / calls * 1000, worst * 1000)
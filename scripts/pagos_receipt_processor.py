@@ -39,6 +39,9 @@ from datetime import datetime, timedelta
 
 import requests
 
+from odoo_rpc import OdooClient
+from sheet_reader import SheetReader, SheetTable
+
 # ============================================================================
 # Configuration
 # ============================================================================
@@ -194,36 +197,21 @@ def fs_update_subject(conv_id, new_subject, admin_user_id=1):
 # Odoo XML-RPC
 # ============================================================================
 
-_odoo_conn = None
+_odoo_client = None
 
 def odoo():
-    global _odoo_conn
-    if _odoo_conn:
-        return _odoo_conn
-    cfg = ODOO_CONFIGS[TARGET_ENV]
-    common = xmlrpc.client.ServerProxy(f"{cfg['url']}/xmlrpc/2/common")
-    uid = common.authenticate(cfg['db'], cfg['user'], cfg['password'], {})
-    if not uid:
-        raise RuntimeError("Odoo authentication failed")
-    models = xmlrpc.client.ServerProxy(f"{cfg['url']}/xmlrpc/2/object", allow_none=True)
-    _odoo_conn = (cfg['db'], uid, cfg['password'], models)
-    logger.info("Odoo connected (uid=%d, db=%s)", uid, cfg['db'])
-    return _odoo_conn
+    global _odoo_client
+    if _odoo_client is None:
+        _odoo_client = OdooClient.from_config(ODOO_CONFIGS[TARGET_ENV])
+    return _odoo_client
 
 
 def odoo_search_read(model, domain, fields, limit=0, order=''):
-    db, uid, pwd, m = odoo()
-    kwargs = {'fields': fields}
-    if limit:
-        kwargs['limit'] = limit
-    if order:
-        kwargs['order'] = order
-    return m.execute_kw(db, uid, pwd, model, 'search_read', [domain], kwargs)
+    return odoo().search_read(model, domain, fields, limit=limit, order=order)
 
 
 def odoo_get_param(key, default=''):
-    rows = odoo_search_read('ir.config_parameter', [('key', '=', key)], ['value'], limit=1)
-    return rows[0]['value'] if rows else default
+    return odoo().get_param(key, default)
 
 
 _wa_cfg_cache = None
@@ -268,47 +256,33 @@ def notify_ceo_wa(msg):
 
 
 def odoo_find_partner_by_email(email):
-    """Find res.partner by email. Uses ilike (substring) to handle multi-email fields
-    where Odoo stores 'email1;email2' in a single field."""
+    """Find res.partner by email. Exact match on any address of multi-email fields
+    ('email1;email2') through the normalized mail.email.index."""
     if not email:
         return None
+    owners = odoo().email_lookup([email])
+    partner_ids = [pid for o in owners.values() for pid in o['partner_ids']]
+    if not partner_ids:
+        return None
     rows = odoo_search_read('res.partner',
-        [('email', 'ilike', email.strip()), ('customer_rank', '>', 0)],
+        [('id', 'in', partner_ids), ('customer_rank', '>', 0)],
         ['id', 'name', 'email', 'vat', 'child_ids'], limit=1)
     return rows[0] if rows else None
 
 
 def _load_customers_sheet():
-    """Load Customers sheet email→name dict. Cached per process run."""
+    """Load the Customers sheet (B2:J) as a SheetTable. Cached per process run;
+    across runs sheet_reader only re-downloads it when the spreadsheet changed."""
     global _sheets_cache
     if _sheets_cache is not None:
         return _sheets_cache
     try:
-        from google.oauth2.service_account import Credentials
-        from googleapiclient.discovery import build
-        creds = Credentials.from_service_account_file(
-            SHEETS_CREDS_PATH,
-            scopes=['https://www.googleapis.com/auth/spreadsheets.readonly'])
-        svc = build('sheets', 'v4', credentials=creds)
-        resp = svc.spreadsheets().values().get(
-            spreadsheetId=SHEETS_SPREADSHEET_ID,
-            range='Customers!B2:J',
-        ).execute()
-        rows = resp.get('values', [])
-        cache = {}
-        for row in rows:
-            name  = row[0].strip()  if len(row) > 0 else ''
-            email = row[8].strip().lower() if len(row) > 8 else ''
-            if email and name:
-                for addr in email.split(';'):
-                    addr = addr.strip()
-                    if addr:
-                        cache[addr] = name
-        _sheets_cache = cache
-        logger.info("Customers sheet loaded: %d entries", len(cache))
+        _sheets_cache = SheetReader(SHEETS_CREDS_PATH).read(
+            SHEETS_SPREADSHEET_ID, 'Customers!B2:J')
+        logger.info("Customers sheet loaded: %d rows", len(_sheets_cache))
     except Exception as e:
         logger.warning("Failed to load Customers sheet: %s", e)
-        _sheets_cache = {}
+        _sheets_cache = SheetTable([])
     return _sheets_cache
 
 
@@ -316,7 +290,13 @@ def sheets_lookup_by_email(email):
     """Return parent name from Customers sheet for given email, or None."""
     if not email:
         return None
-    return _load_customers_sheet().get(email.strip().lower())
+    table = _load_customers_sheet()
+    # Column J (index 8) may list several ';'-separated emails; last named row wins
+    for pos in reversed(table.find_email(email, 8)):
+        name = table.cell(pos, 0).strip()
+        if name:
+            return name
+    return None
 
 
 def odoo_find_partner_by_name(name):
@@ -342,11 +322,8 @@ def upsert_freescout_task(conv_id, status, subject='', sender_email='',
                           extracted=None, payment_odoo_id=None, notes=''):
     """Create or update ai.agent.freescout.task in Odoo for visibility/re-trigger."""
     try:
-        db, uid, pwd, m_obj = odoo()
-
-        existing = m_obj.execute_kw(db, uid, pwd,
-            'ai.agent.freescout.task', 'search',
-            [[('fs_conv_id', '=', conv_id)]], {'limit': 1})
+        existing = odoo_search_read('ai.agent.freescout.task',
+            [('fs_conv_id', '=', conv_id)], ['retry_count'], limit=1)
 
         vals = {
             'fs_conv_id':        conv_id,
@@ -369,15 +346,10 @@ def upsert_freescout_task(conv_id, status, subject='', sender_email='',
 
         if existing:
             # Increment retry_count
-            current = m_obj.execute_kw(db, uid, pwd,
-                'ai.agent.freescout.task', 'read',
-                [existing, ['retry_count']])[0]
-            vals['retry_count'] = current['retry_count'] + 1
-            m_obj.execute_kw(db, uid, pwd,
-                'ai.agent.freescout.task', 'write', [existing, vals])
+            vals['retry_count'] = existing[0]['retry_count'] + 1
+            odoo().write('ai.agent.freescout.task', [existing[0]['id']], vals)
         else:
-            m_obj.execute_kw(db, uid, pwd,
-                'ai.agent.freescout.task', 'create', [vals])
+            odoo().create('ai.agent.freescout.task', vals)
 
         logger.info("  Bridge: upserted FS#%d → %s", conv_id, status)
     except Exception as e:
@@ -480,7 +452,6 @@ def odoo_check_duplicate(partner_id, referencia):
 
 def odoo_create_draft_payment(partner_id, receipt, journal_id, matched_invoice, conv_subject=''):
     """Create a draft account.payment. Returns (payment_id, odoo_url) or (None, None)."""
-    db, uid, pwd, m = odoo()
     monto  = receipt.get('monto') or 0.0
     moneda = (receipt.get('moneda') or 'VES').upper()
     ref    = receipt.get('referencia') or ''
@@ -534,20 +505,19 @@ def odoo_create_draft_payment(partner_id, receipt, journal_id, matched_invoice,
         return -1, 'https://odoo.ueipab.edu.ve/web#dry-run'
 
     try:
-        payment_id = m.execute_kw(db, uid, pwd, 'account.payment', 'create', [vals])
+        payment_id = odoo().create('account.payment', vals)
     except Exception as e:
         logger.error("  Failed to create payment: %s", e)
         return None, None
 
     try:
-        m.execute_kw(db, uid, pwd, 'account.payment', 'action_post', [[payment_id]])
+        odoo().execute('account.payment', 'action_post', [payment_id])
     except xmlrpc.client.Fault as e:
         # action_post() may return a dict with None values that Odoo's XML-RPC
         # server can't serialize (allow_none=False server-side). The post itself
         # usually succeeds — verify state before treating as failure.
         if 'cannot marshal None' in str(e):
-            rows = m.execute_kw(db, uid, pwd, 'account.payment', 'read',
-                                [[payment_id]], {'fields': ['state']})
+            rows = odoo().read('account.payment', [payment_id], ['state'])
             if rows and rows[0].get('state') == 'posted':
                 logger.info("  action_post serialization warning (payment IS posted)")
             else:
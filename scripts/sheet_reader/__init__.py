@@ -0,0 +1,17 @@
+"""
+Shared Google Sheets reader for the automation scripts.
+
+    from sheet_reader import SheetReader
+
+    reader = SheetReader(SHEETS_CREDS_PATH)
+    table = reader.read(SPREADSHEET_ID, 'Customers!B2:J')
+    for pos in table.find_email('ana@x.com', 8):
+        print(table.cell(pos, 0))
+
+    SHEETS_FIXTURE_DIR=sheet_reader/tests/fixtures python3 script.py   # offline replay
+
+See reader.py for the revision-checked SQLite cache and the replay mode.
+"""
+from .reader import SheetReader, SheetTable, normalize_cedula, normalize_email
+
+__all__ = ['SheetReader', 'SheetTable', 'normalize_cedula', 'normalize_email']
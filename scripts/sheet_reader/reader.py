@@ -0,0 +1,246 @@
+"""
+SheetReader — cached, revision-checked Google Sheets reads.
+
+Every read goes through a small SQLite store (SHEETS_CACHE_PATH, default
+scripts/sheet_cache.sqlite) keyed by (spreadsheet id, A1 range):
+
+  1. Drive files.get(fields='version') — a metadata call of a few bytes;
+     the spreadsheet's version increments on every edit
+  2. same version as the cached copy → values come from SQLite, no download
+  3. otherwise values().get() downloads the range and the cache is replaced
+
+The version is per spreadsheet, so an edit in any tab re-fetches the tabs
+read afterwards; untouched spreadsheets cost one metadata call per run.
+With max_age (seconds) even that call is skipped while the copy is fresh.
+
+The version check is an optimization only: if Drive cannot be reached (API
+not enabled for the project, missing scope, outage) the range is read with a
+plain values().get() as before, and if that fails too the cached copy, however
+old, is served rather than an empty table.
+
+Replay mode (no network, no credentials): set SHEETS_FIXTURE_DIR, or pass
+fixture_dir=, and reads are served from <dir>/<spreadsheet id>__<range>.json
+(a JSON list of rows; unsafe filename characters in the range become '_').
+SHEETS_RECORD_DIR writes those files from live reads, to capture fixtures.
+"""
+
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+from collections import defaultdict
+
+logger = logging.getLogger('sheet_reader')
+
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sheet_cache.sqlite')
+SCOPES = [
+    'https://www.googleapis.com/auth/spreadsheets.readonly',
+    'https://www.googleapis.com/auth/drive.metadata.readonly',
+]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sheet_cache (
+    spreadsheet_id TEXT NOT NULL,
+    a1_range       TEXT NOT NULL,
+    revision       TEXT NOT NULL,
+    fetched_at     REAL NOT NULL,
+    values_json    TEXT NOT NULL,
+    PRIMARY KEY (spreadsheet_id, a1_range)
+)
+"""
+
+
+def normalize_email(value):
+    return (value or '').strip().lower()
+
+
+def normalize_cedula(value):
+    """Digits only: 'V-12.345.678' → '12345678'."""
+    return re.sub(r'\D', '', str(value or ''))
+
+
+def _fixture_name(spreadsheet_id, a1_range):
+    return f"{spreadsheet_id}__{re.sub(r'[^A-Za-z0-9_.-]', '_', a1_range)}.json"
+
+
+class SheetTable:
+    """Values of one range, column-oriented, with lazily built lookup indexes.
+
+    Columns are addressed by position (0-based within the range) or, when
+    the table has a header, by header name. Rows are kept as padded lists.
+    """
+
+    def __init__(self, values, header=None):
+        width = max([len(header or [])] + [len(r) for r in values]) if values or header else 0
+        self.header = list(header or [])
+        self.rows = [list(r) + [''] * (width - len(r)) for r in values]
+        self.columns = [list(col) for col in zip(*self.rows)] if self.rows else [[] for _ in range(width)]
+        self._indexes = {}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def col(self, column):
+        """Position of a column given by position or header name."""
+        return column if isinstance(column, int) else self.header.index(column)
+
+    def column(self, column):
+        return self.columns[self.col(column)]
+
+    def cell(self, row, column):
+        return self.rows[row][self.col(column)]
+
+    def record(self, row):
+        """Row as {header name: value} (positions as keys without a header)."""
+        names = self.header or range(len(self.rows[row]))
+        return dict(zip(names, self.rows[row]))
+
+    def index(self, column, kind=None):
+        """{normalized value: [row positions]} for a column, built once.
+
+        kind='email' splits ';'-separated lists and lowercases; kind='cedula'
+        keeps digits only; otherwise values are stripped. A column beyond the
+        table width (the API drops trailing empty cells) has an empty index.
+        """
+        key = (self.col(column), kind)
+        if key not in self._indexes:
+            index = defaultdict(list)
+            values = self.columns[key[0]] if key[0] < len(self.columns) else []
+            for pos, raw in enumerate(values):
+                if kind == 'email':
+                    values = {normalize_email(v) for v in str(raw).split(';')}
+                elif kind == 'cedula':
+                    values = {normalize_cedula(raw)}
+                else:
+                    values = {str(raw).strip()}
+                for value in values:
+                    if value and value != 'nan':
+                        index[value].append(pos)
+            self._indexes[key] = dict(index)
+        return self._indexes[key]
+
+    def find(self, value, *columns, kind=None):
+        """Row positions whose value in any of `columns` matches, in sheet order."""
+        positions = set()
+        for column in columns:
+            positions.update(self.index(column, kind).get(value, ()))
+        return sorted(positions)
+
+    def find_email(self, email, *columns):
+        return self.find(normalize_email(email), *columns, kind='email')
+
+    def find_cedula(self, cedula, *columns):
+        return self.find(normalize_cedula(cedula), *columns, kind='cedula')
+
+
+class SheetReader:
+    """Read spreadsheet ranges through the revision-checked SQLite cache."""
+
+    def __init__(self, creds_path=None, cache_path=None, fixture_dir=None, record_dir=None):
+        self.creds_path = creds_path
+        self.cache_path = cache_path or os.environ.get('SHEETS_CACHE_PATH') or DEFAULT_CACHE_PATH
+        self.fixture_dir = fixture_dir or os.environ.get('SHEETS_FIXTURE_DIR')
+        self.record_dir = record_dir or os.environ.get('SHEETS_RECORD_DIR')
+        self._sheets = None
+        self._drive = None
+        self._revisions = {}   # spreadsheet id -> version, checked once per reader
+        self._conn = None
+
+    # ── Google clients (lazy: replay and cache hits never authenticate) ──────
+
+    def _services(self):
+        if self._sheets is None:
+            from google.oauth2.service_account import Credentials
+            from googleapiclient.discovery import build
+            creds = Credentials.from_service_account_file(self.creds_path, scopes=SCOPES)
+            self._sheets = build('sheets', 'v4', credentials=creds, cache_discovery=False)
+            self._drive = build('drive', 'v3', credentials=creds, cache_discovery=False)
+        return self._sheets, self._drive
+
+    def revision(self, spreadsheet_id):
+        """Drive version of the spreadsheet, or None when it cannot be read."""
+        if spreadsheet_id not in self._revisions:
+            try:
+                _, drive = self._services()
+                meta = drive.files().get(
+                    fileId=spreadsheet_id, fields='version', supportsAllDrives=True).execute()
+                self._revisions[spreadsheet_id] = str(meta['version'])
+            except Exception as e:
+                # Not retried for this reader: one warning, then plain reads
+                logger.warning("Sheets version check failed for %s, reading without cache: %s",
+                               spreadsheet_id, e)
+                self._revisions[spreadsheet_id] = None
+        return self._revisions[spreadsheet_id]
+
+    # ── Cache ────────────────────────────────────────────────────────────────
+
+    def _db(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.cache_path)
+            self._conn.execute(_SCHEMA)
+        return self._conn
+
+    def _cached(self, spreadsheet_id, a1_range):
+        with self._db() as db:
+            return db.execute(
+                "SELECT revision, fetched_at, values_json FROM sheet_cache "
+                "WHERE spreadsheet_id = ? AND a1_range = ?",
+                (spreadsheet_id, a1_range)).fetchone()
+
+    def _store(self, spreadsheet_id, a1_range, revision, values):
+        with self._db() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO sheet_cache VALUES (?, ?, ?, ?, ?)",
+                (spreadsheet_id, a1_range, revision, time.time(),
+                 json.dumps(values, ensure_ascii=False)))
+
+    # ── Reads ────────────────────────────────────────────────────────────────
+
+    def values(self, spreadsheet_id, a1_range, max_age=0):
+        """Raw rows (list of lists) of a range."""
+        if self.fixture_dir:
+            path = os.path.join(self.fixture_dir, _fixture_name(spreadsheet_id, a1_range))
+            with open(path) as f:
+                return json.load(f)
+
+        cached = self._cached(spreadsheet_id, a1_range)
+        if cached and max_age and time.time() - cached[1] < max_age:
+            return json.loads(cached[2])
+
+        revision = self.revision(spreadsheet_id)
+        if cached and revision is not None and cached[0] == revision:
+            logger.debug("Sheets cache hit: %s (version %s)", a1_range, revision)
+            return json.loads(cached[2])
+
+        try:
+            sheets, _ = self._services()
+            values = sheets.spreadsheets().values().get(
+                spreadsheetId=spreadsheet_id, range=a1_range).execute().get('values', [])
+        except Exception as e:
+            if not cached:
+                raise
+            logger.warning("Sheets read failed for %s, serving cached copy from %s: %s",
+                           a1_range, time.strftime('%Y-%m-%d %H:%M', time.localtime(cached[1])), e)
+            return json.loads(cached[2])
+        # An unknown version is stored as '' so the next successful check re-fetches
+        self._store(spreadsheet_id, a1_range, revision or '', values)
+        logger.info("Sheets fetched: %s (%d rows, version %s)", a1_range, len(values), revision)
+
+        if self.record_dir:
+            os.makedirs(self.record_dir, exist_ok=True)
+            with open(os.path.join(self.record_dir, _fixture_name(spreadsheet_id, a1_range)), 'w') as f:
+                json.dump(values, f, ensure_ascii=False)
+        return values
+
+    def read(self, spreadsheet_id, a1_range, header_row=False, max_age=0):
+        """SheetTable of a range; header_row=True takes its first row as column names."""
+        values = self.values(spreadsheet_id, a1_range, max_age=max_age)
+        if header_row and values:
+            return SheetTable(values[1:], header=values[0])
+        return SheetTable(values)
@@ -0,0 +1,147 @@
+"""
+Offline tests for sheet_reader: fixture replay and the cache fallbacks.
+
+    cd scripts && python3 -m unittest discover -s sheet_reader/tests -t .
+
+The fixture under fixtures/ is a recorded Customers!B2:J range with made-up
+rows (capture real ones with SHEETS_RECORD_DIR).
+"""
+
+import importlib
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+sys.path.insert(0, SCRIPTS_DIR)
+
+from sheet_reader import SheetReader, SheetTable  # noqa: E402
+
+SPREADSHEET_ID = '1Oi3Zw1OLFPVuHMe9rJ7cXKSD7_itHRF0bL4oBkKBPzA'
+
+try:
+    import requests  # noqa: F401 — pagos_receipt_processor needs it at import
+    HAS_REQUESTS = True
+except ImportError:
+    HAS_REQUESTS = False
+
+
+class _Request:
+    def __init__(self, result=None, error=None):
+        self.result, self.error = result, error
+
+    def execute(self):
+        if self.error:
+            raise self.error
+        return self.result
+
+
+class _FakeSheets:
+    """spreadsheets().values().get() returning fixed rows, counting calls."""
+
+    def __init__(self, rows, error=None):
+        self.rows, self.error, self.calls = rows, error, 0
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    def get(self, spreadsheetId, range):
+        self.calls += 1
+        return _Request({'values': self.rows}, self.error)
+
+
+class _FakeDrive:
+    def __init__(self, version=None, error=None):
+        self.version, self.error = version, error
+
+    def files(self):
+        return self
+
+    def get(self, **kwargs):
+        return _Request({'version': self.version}, self.error)
+
+
+class TestReplay(unittest.TestCase):
+
+    def test_read_from_fixture(self):
+        table = SheetReader(fixture_dir=FIXTURE_DIR).read(SPREADSHEET_ID, 'Customers!B2:J')
+        self.assertEqual(len(table), 6)
+        self.assertEqual(table.find_email(' Ana.Perez@Example.com ', 8), [0])
+        self.assertEqual(table.find_email('luis.gomez@example.org', 8), [1])
+        self.assertEqual(table.find_cedula('12345678', 1), [0])
+        self.assertEqual(table.find_email('nadie@example.com', 8), [])
+
+    def test_column_beyond_table_width(self):
+        # trailing empty cells are dropped: no row reaches column I
+        table = SheetTable([['Ana Pérez', 'V-12345678'], ['Luis Gómez']])
+        self.assertEqual(table.find_email('ana.perez@example.com', 8), [])
+        self.assertEqual(table.find_cedula('12345678', 1, 8), [0])
+        self.assertEqual(SheetTable([]).find_email('ana.perez@example.com', 8), [])
+
+    @unittest.skipUnless(HAS_REQUESTS, "pagos_receipt_processor needs requests")
+    def test_sheets_lookup_by_email(self):
+        with mock.patch.dict(os.environ, {'SHEETS_FIXTURE_DIR': FIXTURE_DIR}):
+            pagos = importlib.import_module('pagos_receipt_processor')
+            pagos._sheets_cache = None
+            try:
+                self.assertEqual(pagos.sheets_lookup_by_email('ANA.PEREZ@example.com'), 'Ana Pérez')
+                # second address of a ';'-separated cell
+                self.assertEqual(pagos.sheets_lookup_by_email('luis@example.com'), 'Luis Gómez')
+                # a row without a name is skipped; the last named row wins
+                self.assertIsNone(pagos.sheets_lookup_by_email('sin.nombre@example.com'))
+                self.assertEqual(pagos.sheets_lookup_by_email('compartido@example.com'), 'Pedro Díaz')
+                self.assertIsNone(pagos.sheets_lookup_by_email('nadie@example.com'))
+            finally:
+                pagos._sheets_cache = None
+
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache_path = os.path.join(tmp.name, 'cache.sqlite')
+
+    def _reader(self, sheets, drive):
+        reader = SheetReader(cache_path=self.cache_path)
+        reader._sheets, reader._drive = sheets, drive
+        return reader
+
+    def test_same_version_served_from_cache(self):
+        sheets = _FakeSheets([['a']])
+        self._reader(sheets, _FakeDrive('7')).values(SPREADSHEET_ID, 'A1:B')
+        self.assertEqual(self._reader(sheets, _FakeDrive('7')).values(SPREADSHEET_ID, 'A1:B'), [['a']])
+        self.assertEqual(sheets.calls, 1)
+        self._reader(sheets, _FakeDrive('8')).values(SPREADSHEET_ID, 'A1:B')
+        self.assertEqual(sheets.calls, 2)
+
+    def test_version_check_failure_reads_plainly(self):
+        sheets = _FakeSheets([['b']])
+        self._reader(sheets, _FakeDrive('7')).values(SPREADSHEET_ID, 'A1:B')
+        reader = self._reader(sheets, _FakeDrive(error=RuntimeError('Drive API disabled')))
+        self.assertEqual(reader.values(SPREADSHEET_ID, 'A1:B'), [['b']])
+        self.assertEqual(sheets.calls, 2)
+        # the copy stored without a version is not mistaken for a current one
+        self._reader(sheets, _FakeDrive('7')).values(SPREADSHEET_ID, 'A1:B')
+        self.assertEqual(sheets.calls, 3)
+
+    def test_read_failure_serves_cached_copy(self):
+        self._reader(_FakeSheets([['c']]), _FakeDrive('7')).values(SPREADSHEET_ID, 'A1:B')
+        reader = self._reader(_FakeSheets([], error=RuntimeError('503')),
+                              _FakeDrive(error=RuntimeError('503')))
+        self.assertEqual(reader.values(SPREADSHEET_ID, 'A1:B'), [['c']])
+
+    def test_read_failure_without_cache_raises(self):
+        reader = self._reader(_FakeSheets([], error=RuntimeError('503')), _FakeDrive('7'))
+        with self.assertRaises(RuntimeError):
+            reader.values(SPREADSHEET_ID, 'A1:B')
+
+
+if __name__ == '__main__':
+    unittest.main()